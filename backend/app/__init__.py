@@ -3,13 +3,15 @@ Bank Statement Registration API package.
 """
 
 from .config import get_settings
-from .database import get_db_connection
-from .auth import verify_ldap_credentials, create_access_token, get_current_user
+from .database import get_db_connection, get_db
+from .auth import verify_ldap_credentials, authenticate_user, create_access_token, get_current_user
 
 __all__ = [
     'get_settings',
     'get_db_connection',
+    'get_db',
     'verify_ldap_credentials',
+    'authenticate_user',
     'create_access_token',
     'get_current_user'
 ]
\ No newline at end of file
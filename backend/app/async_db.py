@@ -0,0 +1,164 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, Request
+from .config import get_settings
+from .database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+# Every blocking DB call runs on this bounded executor, never on the event loop
+_executor = ThreadPoolExecutor(
+    max_workers=settings.db_max_concurrency,
+    thread_name_prefix="db"
+)
+
+# One set of limiters per event loop, so test clients that spin up their own loops work
+_limiters = weakref.WeakKeyDictionary()
+
+def _limiter(kind: str = "calls") -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    limiters = _limiters.get(loop)
+    if limiters is None:
+        limiters = {
+            "calls": asyncio.Semaphore(settings.db_max_concurrency),
+            "streams": asyncio.Semaphore(settings.db_max_streams),
+        }
+        _limiters[loop] = limiters
+    return limiters[kind]
+
+class ClientDisconnected(HTTPException):
+    def __init__(self):
+        super().__init__(status_code=499, detail="Client closed request")
+
+class _Lease:
+    """Tracks the connection a worker thread is using so it can be cancelled."""
+
+    def __init__(self):
+        self.conn = None
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+        conn = self.conn
+        if conn is not None:
+            conn.cancel()
+
+def _call(lease: _Lease, fn, args, kwargs):
+    if lease.cancelled:
+        raise ClientDisconnected()
+    conn = get_db_connection()
+    lease.conn = conn
+    try:
+        return fn(conn, *args, **kwargs)
+    finally:
+        lease.conn = None
+        conn.close()
+
+def _execute(conn, query: str, params):
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    return cursor
+
+def _release(cursor, conn):
+    try:
+        if cursor is not None:
+            cursor.close()
+    finally:
+        conn.close()
+
+class AsyncDB:
+    """
+    Async facade over the connection pool.
+
+    `await db.run(fn, *args)` leases a pooled connection on the DB executor
+    and calls `fn(conn, *args)` there. At most `db_max_concurrency` calls run
+    at once; when bound to a request, a running statement is cancelled as
+    soon as the client disconnects.
+    """
+
+    def __init__(self, request: Request = None):
+        self.request = request
+
+    async def run(self, fn, *args, **kwargs):
+        async with _limiter():
+            loop = asyncio.get_running_loop()
+            lease = _Lease()
+            # Carry the request's context (e.g. per-request metrics) into the worker
+            context = contextvars.copy_context()
+            future = loop.run_in_executor(
+                _executor, context.run, functools.partial(_call, lease, fn, args, kwargs)
+            )
+            watcher = asyncio.ensure_future(self._wait_for_disconnect())
+            try:
+                done, _ = await asyncio.wait(
+                    {future, watcher}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if future in done:
+                    return future.result()
+                logger.info("Client disconnected, cancelling database call")
+                lease.cancel()
+                await self._drain(future)
+                raise ClientDisconnected()
+            except asyncio.CancelledError:
+                lease.cancel()
+                await self._drain(future)
+                raise
+            finally:
+                watcher.cancel()
+
+    async def stream(self, query: str, params=(), batch_size: int = None):
+        """
+        Execute `query` and yield its rows in `fetchmany` batches, so the
+        result set is never materialised in memory. The connection and the
+        concurrency slot are held until the generator is exhausted or closed,
+        at the client's pace, so streams first take one of `db_max_streams`
+        slots: however many slow downloads are open, the other slots stay
+        free for ordinary calls.
+        """
+        batch_size = batch_size or settings.db_fetch_batch_size
+        async with _limiter("streams"), _limiter():
+            loop = asyncio.get_running_loop()
+            conn = await loop.run_in_executor(_executor, get_db_connection)
+            cursor = None
+            finished = False
+            try:
+                cursor = await loop.run_in_executor(
+                    _executor, contextvars.copy_context().run, _execute, conn, query, params
+                )
+                while True:
+                    rows = await loop.run_in_executor(
+                        _executor, cursor.fetchmany, batch_size
+                    )
+                    if not rows:
+                        finished = True
+                        return
+                    yield rows
+            finally:
+                if not finished:
+                    conn.cancel()
+                # Don't await here: a cancelled stream may not await again
+                _executor.submit(_release, cursor, conn)
+
+    @staticmethod
+    async def _drain(future):
+        # Hold the concurrency slot until the worker thread has really let go
+        try:
+            await asyncio.shield(future)
+        except BaseException:
+            pass
+
+    async def _wait_for_disconnect(self):
+        if self.request is None:
+            await asyncio.Event().wait()
+        while not await self.request.is_disconnected():
+            await asyncio.sleep(settings.db_disconnect_poll_interval)
+
+def get_async_db(request: Request) -> AsyncDB:
+    """FastAPI dependency binding the async DB layer to the current request."""
+    return AsyncDB(request)
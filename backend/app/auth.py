@@ -1,162 +1,456 @@
-from ldap3 import Server, Connection, ALL, SUBTREE, LEVEL, ASYNC
+from ldap3 import Server, Connection, ALL, SUBTREE, SYNC, MOCK_SYNC, OFFLINE_AD_2012_R2
+from ldap3.core.exceptions import LDAPException, LDAPBindError
+from ldap3.utils.conv import escape_filter_chars
+from contextlib import contextmanager
 from fastapi import HTTPException, Depends
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
+from typing import Optional
+from . import bus, metrics
+from .cache import TTLCache
 from .config import get_settings
 from .models import ADUser, RegistrationResponse
 import logging
+import queue
+import threading
+import time
+import uuid
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 settings = get_settings()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-def verify_ldap_credentials(username: str, password: str):
-    try:
-        logger.debug(f"Attempting LDAP authentication for user: {username}")
-        server = Server(settings.ldap_server, get_info=ALL)
-        
-        # Try direct bind first with UPN
-        upn = f"{username}@bk.local"
-        logger.debug(f"Attempting direct bind with UPN: {upn}")
-        
+class LDAPConnectionPool:
+    """
+    Bounded pool of connections bound with the service account, reused for
+    directory searches instead of opening and binding one per call.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _open(self):
+        with _timed("service_bind"):
+            return _service_connection()
+
+    def _checkout(self):
         try:
-            conn = Connection(server, user=upn, password=password)
-            if conn.bind():
-                logger.debug("Direct bind successful")
-                return True
-        except Exception as e:
-            logger.debug(f"Direct bind failed: {str(e)}")
-        
-        # If direct bind fails, try CN-based bind
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if not create:
+            return self._idle.get(timeout=settings.ldap_pool_timeout)
         try:
-            cn_dn = f"CN={username},{settings.ldap_base_dn}"
-            logger.debug(f"Attempting CN-based bind with DN: {cn_dn}")
-            
-            conn = Connection(server, user=cn_dn, password=password)
-            if conn.bind():
-                logger.debug("CN-based bind successful")
-                return True
-        except Exception as e:
-            logger.debug(f"CN-based bind failed: {str(e)}")
-        
-        # If both methods fail, try searching for the user
-        search_connection = Connection(server, auto_bind=True)
-        search_filter = f"(|(sAMAccountName={username})(userPrincipalName={username}@bk.local))"
-        
-        search_connection.search(
+            return self._open()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def _discard(self, conn):
+        with self._lock:
+            self._created -= 1
+        try:
+            conn.unbind()
+        except Exception:
+            pass
+
+    @contextmanager
+    def connection(self):
+        conn = self._checkout()
+        if conn.closed or not conn.bound:
+            # The server dropped an idle connection; rebind it before use
+            try:
+                with _timed("service_rebind"):
+                    conn.open()
+                    conn.bind(read_server_info=False)
+            except Exception:
+                self._discard(conn)
+                raise
+        try:
+            yield conn
+        except LDAPException:
+            self._discard(conn)
+            raise
+        except BaseException:
+            self._idle.put(conn)
+            raise
+        else:
+            self._idle.put(conn)
+
+_server = None
+_server_lock = threading.Lock()
+
+def get_ldap_server() -> Server:
+    """
+    One long-lived Server per process. Its root DSE and schema are read on
+    the first service bind and then reused by every connection.
+    """
+    global _server
+    if _server is None:
+        with _server_lock:
+            if _server is None:
+                if settings.ldap_strategy == "mock":
+                    # ldap3 offline mock; schema comes from the bundled AD definition
+                    _server = Server(settings.ldap_server or "mock", get_info=OFFLINE_AD_2012_R2)
+                else:
+                    _server = Server(
+                        settings.ldap_server,
+                        get_info=ALL,
+                        connect_timeout=settings.ldap_connect_timeout
+                    )
+    return _server
+
+def _new_connection(**kwargs) -> Connection:
+    strategy = MOCK_SYNC if settings.ldap_strategy == "mock" else SYNC
+    return Connection(
+        get_ldap_server(),
+        client_strategy=strategy,
+        receive_timeout=settings.ldap_receive_timeout,
+        **kwargs
+    )
+
+def _service_connection() -> Connection:
+    conn = _new_connection(
+        user=_principal(settings.ldap_username),
+        password=settings.ldap_password
+    )
+    # Only the very first bind in the process reads the root DSE and schema
+    if not conn.bind(read_server_info=get_ldap_server().info is None):
+        raise LDAPBindError(f"Service account bind failed: {conn.result}")
+    return conn
+
+def _principal(username: str) -> str:
+    """Bindable name for an account: UPN unless it already carries a domain."""
+    if "@" in username or "\\" in username or "=" in username:
+        return username
+    return f"{username}@{settings.ldap_upn_suffix}"
+
+@contextmanager
+def _timed(phase: str):
+    """Time an LDAP phase; the caller may set timing["outcome"], exceptions count as "error"."""
+    started = time.perf_counter()
+    timing = {"outcome": "ok"}
+    try:
+        yield timing
+    except BaseException:
+        timing["outcome"] = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.observe_ldap(phase, elapsed, timing["outcome"])
+        logger.debug("LDAP %s took %.1f ms", phase, elapsed * 1000)
+
+_search_pool = LDAPConnectionPool(settings.ldap_pool_size)
+
+def enabled_users_filter() -> str:
+    if settings.ldap_strategy == "mock":
+        # The offline mock cannot evaluate the bitwise matching rule below
+        return '(&(objectClass=user)(objectCategory=person)(!(userAccountControl=514)))'
+    return '(&(objectClass=user)(objectCategory=person)(!(userAccountControl:1.2.840.113556.1.4.803:=2)))'
+
+def _bind_as(user: str, password: str):
+    """Bind with user credentials on a throwaway connection; returns (bound, result)."""
+    conn = _new_connection(user=user, password=password)
+    # Server info is already cached on the shared Server; don't re-read it per login
+    bound = conn.bind(read_server_info=False)
+    result = conn.result or {}
+    try:
+        conn.unbind()
+    except Exception:
+        pass
+    return bound, result
+
+def _find_user(username: str):
+    """(DN, sAMAccountName) of the account `username` logs in as, or None."""
+    # DOMAIN\user logins name the account after the backslash
+    account = username.rsplit("\\", 1)[-1]
+    with _search_pool.connection() as conn, _timed("dn_search"):
+        conn.search(
             search_base=settings.ldap_base_dn,
-            search_filter=search_filter,
+            search_filter=f"(|(sAMAccountName={escape_filter_chars(account)})"
+                          f"(userPrincipalName={escape_filter_chars(_principal(username))}))",
             search_scope=SUBTREE,
-            attributes=['distinguishedName']
+            attributes=['sAMAccountName'],
+            size_limit=1
         )
-        
-        if not search_connection.entries:
-            logger.error(f"User {username} not found in LDAP")
-            return False
-            
-        user_dn = search_connection.entries[0].distinguishedName.value
-        logger.debug(f"Found user DN: {user_dn}")
-        
-        # Try binding with found DN
-        user_connection = Connection(server, user=user_dn, password=password)
-        if user_connection.bind():
-            logger.debug("LDAP authentication successful")
-            return True
-            
-        logger.error("LDAP bind failed - invalid credentials")
-        return False
-        
+        if not conn.entries:
+            return None
+        entry = conn.entries[0]
+        return entry.entry_dn, entry.sAMAccountName.value if hasattr(entry, 'sAMAccountName') else None
+
+# Each strategy returns None if it can't try the name, or (bound, result,
+# sAMAccountName) where the account name is None if the bind didn't reveal it
+
+def _bind_upn(username: str, password: str):
+    bound, result = _bind_as(_principal(username), password)
+    # A bare or DOMAIN\user name binds as <sAMAccountName>@suffix; an explicit
+    # UPN's prefix need not be the sAMAccountName, nor a DN's CN
+    if "@" in username or "=" in username:
+        return bound, result, None
+    return bound, result, username.rsplit("\\", 1)[-1]
+
+def _bind_cn(username: str, password: str):
+    return (*_bind_as(f"CN={username},{settings.ldap_base_dn}", password), None)
+
+def _bind_search(username: str, password: str):
+    found = _find_user(username)
+    if not found:
+        logger.info("User not found in LDAP", extra={"username": username})
+        return None
+    logger.debug("Found user DN", extra={"username": username})
+    return (*_bind_as(found[0], password), found[1])
+
+BIND_STRATEGIES = {
+    "upn": _bind_upn,
+    "search": _bind_search,
+    "cn": _bind_cn,
+}
+
+def _password_rejected(result: dict) -> bool:
+    # AD reports "data 52e" when the account exists but the password is wrong;
+    # trying other name formats would only add failed attempts to the lockout count
+    return "data 52e" in (result.get("message") or "")
+
+def verify_ldap_credentials(username: str, password: str) -> Optional[str]:
+    """Bind as `username`; returns the canonical username (see canonical_username), or None."""
+    if not password:
+        # An empty password would be an unauthenticated bind that "succeeds"
+        return None
+    logger.debug("Attempting LDAP authentication", extra={"username": username})
+    for name in settings.ldap_bind_strategies.split(","):
+        name = name.strip()
+        strategy = BIND_STRATEGIES.get(name)
+        if strategy is None:
+            continue
+        try:
+            with _timed(f"{name}_bind") as timing:
+                outcome = strategy(username, password)
+                if outcome is None:
+                    timing["outcome"] = "not_found"
+                elif not outcome[0]:
+                    timing["outcome"] = "rejected"
+        except Exception as e:
+            logger.debug("%s bind failed: %s", name, e)
+            continue
+        if outcome is None:
+            continue
+        bound, result, account = outcome
+        if bound:
+            logger.debug("%s bind successful", name)
+            return account.lower() if account else canonical_username(username)
+        if _password_rejected(result):
+            break
+
+    logger.warning("LDAP bind failed - invalid credentials", extra={"username": username})
+    return None
+
+def canonical_username(username: str) -> str:
+    """
+    The lowercased sAMAccountName behind a login name, whatever case or form
+    (UPN, DOMAIN\\user) it was typed in. Tokens are issued to this name, and
+    directory sync revokes by it. Logins only come here when the bind
+    itself didn't tell us the account, i.e. a UPN or CN bind.
+    """
+    try:
+        found = _find_user(username)
     except Exception as e:
-        logger.error(f"LDAP Error: {str(e)}")
-        return False
+        logger.warning("Account lookup after login failed: %s", e)
+        found = None
+    if found and found[1]:
+        return found[1].lower()
+    return username.rsplit("\\", 1)[-1].split("@")[0].lower()
+
+def authenticate_user(username: str, password: str) -> Optional[str]:
+    """Check credentials against AD; returns the canonical username, or None."""
+    return verify_ldap_credentials(username, password)
+
+# Tokens whose signature and claims were already checked, keyed by the raw
+# token and expiring exactly at the token's own exp
+_verified_tokens = TTLCache(settings.token_cache_size, ttl=0)
+
+# Denylist: revoked token ids until they would have expired anyway, and
+# users whose tokens issued before a given moment are no longer accepted
+_revoked_tokens = {}
+_revoked_users = {}
+_revocation_lock = threading.Lock()
+
+_INVALID_CREDENTIALS = "Invalid authentication credentials"
 
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(hours=8)
-    to_encode.update({"exp": expire})
+    # Sub-second iat so a token minted right after a user revocation stays valid
+    to_encode.update({"exp": expire, "iat": time.time(), "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, settings.jwt_secret, algorithm="HS256")
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
+def _verify_token(token: str):
+    """Full HS256 verification; returns (username, jti, issued_at, exp)."""
     try:
         payload = jwt.decode(token, settings.jwt_secret, algorithms=["HS256"])
-        username: str = payload.get("sub")
-        if username is None:
-            raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-        return username
     except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+        raise HTTPException(status_code=401, detail=_INVALID_CREDENTIALS)
+    username: str = payload.get("sub")
+    if username is None:
+        raise HTTPException(status_code=401, detail=_INVALID_CREDENTIALS)
+    return username, payload.get("jti"), float(payload.get("iat") or 0), payload.get("exp")
+
+def _is_revoked(username: str, jti, issued_at: float) -> bool:
+    if jti is not None and jti in _revoked_tokens:
+        return True
+    revoked_at = _revoked_users.get(username.lower())
+    return revoked_at is not None and issued_at < revoked_at
+
+def authenticate_token(token: str) -> str:
+    claims = _verified_tokens.get(token)
+    if claims is None:
+        started = time.perf_counter()
+        claims = _verify_token(token)
+        metrics.observe_token(False, time.perf_counter() - started)
+        if claims[3] is not None:
+            _verified_tokens.set(token, claims, expires_at=float(claims[3]))
+    else:
+        metrics.observe_token(True)
+    username, jti, issued_at, _ = claims
+    if _is_revoked(username, jti, issued_at):
+        raise HTTPException(status_code=401, detail=_INVALID_CREDENTIALS)
+    return username
+
+def _deny_token(jti: str, until: float):
+    now = time.time()
+    with _revocation_lock:
+        for old_jti in [old for old, expiry in _revoked_tokens.items() if expiry <= now]:
+            del _revoked_tokens[old_jti]
+        _revoked_tokens[jti] = until
 
-def get_ad_users(search_term: str = None):
+def _deny_user(username: str, issued_before: float):
+    # Keyed like token subjects, see canonical_username()
+    username = username.lower()
+    with _revocation_lock:
+        _revoked_users[username] = max(_revoked_users.get(username, 0), issued_before)
+
+def revoke_token(token: str):
+    """Log a single token out; it stays denied until its own exp."""
+    username, jti, issued_at, exp = _verify_token(token)
+    if jti is not None:
+        until = float(exp or time.time())
+        _deny_token(jti, until)
+        bus.publish("revocations", {"jti": jti, "until": until})
+    else:
+        # Tokens minted before jti existed can only be cut off per user
+        _deny_user(username, issued_at + 1)
+        bus.publish("revocations", {"username": username, "issued_before": issued_at + 1})
+    _verified_tokens.invalidate(token)
+
+def revoke_user(username: str):
+    """Reject every token issued to `username` up to now, e.g. when the account is disabled."""
+    issued_before = time.time()
+    _deny_user(username, issued_before)
+    bus.publish("revocations", {"username": username, "issued_before": issued_before})
+
+def _on_revocation(message: dict):
+    # Revoked on another worker
+    if "jti" in message:
+        _deny_token(message["jti"], message["until"])
+    else:
+        _deny_user(message["username"], message["issued_before"])
+
+bus.subscribe("revocations", _on_revocation)
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    return authenticate_token(token)
+
+AD_USER_ATTRIBUTES = ['sAMAccountName', 'displayName', 'mail', 'department']
+
+def ldap_search_connection():
+    """Context manager leasing a pooled service-account connection."""
+    return _search_pool.connection()
+
+def entry_to_ad_user(entry):
+    """Map a directory entry to an ADUser; None for entries without a username."""
     try:
-        logger.debug(f"Starting AD users fetch with search term: {search_term}")
-        settings = get_settings()
-        server = Server(settings.ldap_server, get_info=ALL)
-        
-        # Use the authenticated user's credentials for searching
-        conn = Connection(server, auto_bind=True)
-        logger.debug("LDAP connection established")
-        
+        username = entry.sAMAccountName.value if hasattr(entry, 'sAMAccountName') else None
+        if not username:
+            return None
+
+        display_name = entry.displayName.value if hasattr(entry, 'displayName') else username
+        email = entry.mail.value if hasattr(entry, 'mail') else None
+        department = entry.department.value if hasattr(entry, 'department') else None
+
+        return ADUser(
+            username=username,
+            display_name=display_name or username,
+            email=email,
+            department=department
+        )
+    except Exception as e:
+        logger.error("Error processing user entry: %s", e)
+        return None
+
+def get_ad_users(search_term: str = None, limit: int = 0):
+    """Live directory search; interactive lookups go through app.directory instead."""
+    try:
+        logger.debug("Starting AD users fetch", extra={"search_term": search_term})
         # Build search filter for enabled users
         if search_term:
-            search_filter = f'(&(objectClass=user)(objectCategory=person)(!(userAccountControl:1.2.840.113556.1.4.803:=2))(|(sAMAccountName=*{search_term}*)(displayName=*{search_term}*)))'
+            term = escape_filter_chars(search_term)
+            search_filter = f'(&{enabled_users_filter()}(|(sAMAccountName=*{term}*)(displayName=*{term}*)))'
         else:
-            search_filter = '(&(objectClass=user)(objectCategory=person)(!(userAccountControl:1.2.840.113556.1.4.803:=2)))'
-        
-        logger.debug(f"Using search filter: {search_filter}")
-        
-        # Perform the search
-        conn.search(
-            search_base=settings.ldap_base_dn,
-            search_filter=search_filter,
-            search_scope=SUBTREE,
-            attributes=['sAMAccountName', 'displayName', 'mail', 'department']
-        )
-        
-        logger.debug(f"Found {len(conn.entries)} users")
-        
-        users = []
-        for entry in conn.entries:
-            try:
-                username = entry.sAMAccountName.value if hasattr(entry, 'sAMAccountName') else None
-                if not username:
-                    continue
-                    
-                display_name = entry.displayName.value if hasattr(entry, 'displayName') else username
-                email = entry.mail.value if hasattr(entry, 'mail') else None
-                department = entry.department.value if hasattr(entry, 'department') else None
-                
-                user = ADUser(
-                    username=username,
-                    display_name=display_name,
-                    email=email,
-                    department=department
-                )
-                users.append(user)
-                logger.debug(f"Added user: {username}")
-            except Exception as e:
-                logger.error(f"Error processing user entry: {str(e)}")
-                continue
+            search_filter = enabled_users_filter()
+        # Perform the search on a pooled service-account connection
+        with _search_pool.connection() as conn, _timed("user_search"):
+            conn.search(
+                search_base=settings.ldap_base_dn,
+                search_filter=search_filter,
+                search_scope=SUBTREE,
+                attributes=AD_USER_ATTRIBUTES,
+                size_limit=limit
+            )
+            entries = conn.entries
         
-        logger.debug(f"Successfully processed {len(users)} users")
+        users = [user for user in map(entry_to_ad_user, entries) if user]
+        logger.debug("Found %d users", len(users))
         return users
         
     except Exception as e:
-        logger.error(f"Error in get_ad_users: {str(e)}")
+        logger.error("Error in get_ad_users: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+def get_ad_user(username: str):
+    """Exact, case-insensitive sAMAccountName lookup of one enabled user; None if there is none."""
+    search_filter = f'(&{enabled_users_filter()}(sAMAccountName={escape_filter_chars(username)}))'
+    try:
+        with _search_pool.connection() as conn, _timed("user_lookup"):
+            conn.search(
+                search_base=settings.ldap_base_dn,
+                search_filter=search_filter,
+                search_scope=SUBTREE,
+                attributes=AD_USER_ATTRIBUTES,
+                size_limit=1
+            )
+            entries = conn.entries
+    except Exception as e:
+        logger.error("Error in get_ad_user: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+    users = [user for user in map(entry_to_ad_user, entries) if user]
+    return users[0] if users else None
+
 def register_user_to_db(user_data):
     try:
-        logger.debug(f"Registering user to DB: {user_data}")
-        settings = get_settings()
-        server = Server(settings.ldap_server, get_info=ALL)
-        
-        # Connect to LDAP
-        conn = Connection(server, auto_bind=True)
+        logger.debug("Registering user to DB", extra={"username": user_data.username})
+        conn = _service_connection()
         logger.debug("LDAP connection established")
         
         # Prepare user attributes
@@ -179,10 +473,10 @@ def register_user_to_db(user_data):
         )
         
         if not conn.result['description'] == 'success':
-            logger.error(f"Failed to add user to LDAP: {conn.result['description']}")
+            logger.error("Failed to add user to LDAP: %s", conn.result['description'])
             raise HTTPException(status_code=500, detail="Failed to register user")
         
-        logger.info(f"User registered successfully: {user_data.username}")
+        logger.info("User registered successfully", extra={"username": user_data.username})
         
         # Fetch the newly created user row
         search_filter = f"(sAMAccountName={user_data.username})"
@@ -194,7 +488,7 @@ def register_user_to_db(user_data):
         )
         
         if not conn.entries:
-            logger.error(f"User {user_data.username} not found after registration")
+            logger.error("User not found after registration", extra={"username": user_data.username})
             raise HTTPException(status_code=500, detail="User not found after registration")
         
         updated_row = conn.entries[0]
@@ -211,5 +505,5 @@ def register_user_to_db(user_data):
         )
         
     except Exception as e:
-        logger.error(f"Error in register_user_to_db: {str(e)}")
+        logger.error("Error in register_user_to_db: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
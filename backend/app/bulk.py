@@ -0,0 +1,188 @@
+"""
+Set-based bulk registration.
+
+Rows are processed in chunks: each chunk is validated, de-duplicated
+against earlier rows of the same batch and against the database with
+chunked IN lookups, then inserted with a single executemany.
+"""
+
+import uuid
+import logging
+from collections import Counter
+from datetime import datetime
+from .config import get_settings
+from . import events, registration_cache
+from .stats import bump, registration_deltas
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+# SQL Server accepts at most 2100 parameters per statement
+LOOKUP_CHUNK_SIZE = 1000
+
+REQUIRED_FIELDS = {
+    "account_number": 20,
+    "full_name": 100,
+    "phone_number": 20,
+}
+
+OPTIONAL_FIELDS = {
+    "email": 100,
+    "id_number": 50,
+}
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def _clean(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+def validate_row(row: dict):
+    """Normalise one row; returns (values, error message or None)."""
+    values = {name: _clean(row.get(name)) for name in [*REQUIRED_FIELDS, *OPTIONAL_FIELDS]}
+    errors = []
+    for name, max_length in REQUIRED_FIELDS.items():
+        if not values[name]:
+            errors.append(f"{name.replace('_', ' ').capitalize()} is required")
+        elif len(values[name]) > max_length:
+            errors.append(f"{name.replace('_', ' ').capitalize()} is longer than {max_length} characters")
+    for name, max_length in OPTIONAL_FIELDS.items():
+        if values[name] and len(values[name]) > max_length:
+            errors.append(f"{name.replace('_', ' ').capitalize()} is longer than {max_length} characters")
+    return values, ", ".join(errors) or None
+
+def _result(row_number: int, account_number, status: str, registration_id=None, detail=None) -> dict:
+    return {
+        "row": row_number,
+        "account_number": account_number or "",
+        "status": status,
+        "id": registration_id,
+        "detail": detail,
+    }
+
+def _existing_accounts(cursor, account_numbers):
+    existing = set()
+    for chunk in _chunks(account_numbers, LOOKUP_CHUNK_SIZE):
+        placeholders = ", ".join("?" * len(chunk))
+        cursor.execute(
+            f"SELECT account_number FROM registrations WHERE account_number IN ({placeholders})",
+            tuple(chunk)
+        )
+        existing.update(row[0] for row in cursor.fetchall())
+    return existing
+
+INSERT_SQL = """
+    INSERT INTO registrations (id, account_number, full_name, phone_number, email, id_number, registration_date, created_at, issued_by, is_issued)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0)
+"""
+
+def _insert(conn, cursor, params, user: str, now: datetime):
+    """Insert a chunk in one executemany; fall back to row by row if it collides."""
+    try:
+        if hasattr(cursor, "fast_executemany"):
+            cursor.fast_executemany = True
+        cursor.executemany(INSERT_SQL, params)
+        deltas = Counter()
+        for key, delta in registration_deltas(now, user, False).items():
+            deltas[key] = delta * len(params)
+        bump(cursor, deltas)
+        conn.commit()
+        return {}
+    except Exception as e:
+        # Most likely a concurrent writer registered one of these accounts
+        logger.warning("Bulk insert chunk failed, retrying row by row: %s", e)
+        conn.rollback()
+
+    failures = {}
+    for values in params:
+        try:
+            cursor.execute(INSERT_SQL, values)
+            bump(cursor, registration_deltas(now, user, False))
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            failures[values[0]] = str(e)
+    return failures
+
+def register_chunk(conn, rows, user: str, seen: set, chunk_size: int = None):
+    """
+    Register `rows`, a list of (row_number, dict) pairs, as pending
+    registrations issued by `user`. `seen` carries account numbers across
+    calls so duplicates are detected over a whole upload. Returns one
+    result dict per row.
+    """
+    chunk_size = chunk_size or settings.bulk_insert_chunk_size
+    results = []
+    cursor = conn.cursor()
+    try:
+        for chunk in _chunks(rows, chunk_size):
+            candidates = []
+            for row_number, row in chunk:
+                values, error = validate_row(row)
+                account_number = values["account_number"]
+                if error:
+                    results.append(_result(row_number, account_number, "error", detail=error))
+                elif account_number in seen:
+                    results.append(_result(row_number, account_number, "duplicate",
+                                           detail="Duplicate account number in upload"))
+                else:
+                    seen.add(account_number)
+                    candidates.append((row_number, values))
+
+            existing = _existing_accounts(cursor, [values["account_number"] for _, values in candidates])
+            now = datetime.now()
+            params = []
+            pending = []
+            for row_number, values in candidates:
+                if values["account_number"] in existing:
+                    results.append(_result(row_number, values["account_number"], "duplicate",
+                                           detail="Account is already registered"))
+                    continue
+                registration_id = str(uuid.uuid4())
+                params.append((
+                    registration_id, values["account_number"], values["full_name"],
+                    values["phone_number"], values["email"], values["id_number"],
+                    now, now, user
+                ))
+                pending.append((row_number, values["account_number"], registration_id))
+
+            if params:
+                failures = _insert(conn, cursor, params, user, now)
+                registration_cache.mark_registered(
+                    account_number for _, account_number, registration_id in pending
+                    if registration_id not in failures
+                )
+                created = len(pending) - len(failures)
+                if created:
+                    registration_cache.bump_version()
+                    # One event per chunk; listeners only need the counts
+                    events.publish("registrations", {
+                        "count": created,
+                        "stats": events.stats_delta({
+                            key: delta * created for key, delta in registration_deltas(now, user, False).items()
+                        }),
+                    })
+                for row_number, account_number, registration_id in pending:
+                    if registration_id in failures:
+                        results.append(_result(row_number, account_number, "error",
+                                               detail=failures[registration_id]))
+                    else:
+                        results.append(_result(row_number, account_number, "created",
+                                               registration_id=registration_id))
+        results.sort(key=lambda result: result["row"])
+        return results
+    finally:
+        cursor.close()
+
+def summarize(results) -> dict:
+    created = sum(1 for result in results if result["status"] == "created")
+    return {
+        "success": created,
+        "failed": len(results) - created,
+        "results": results,
+    }
@@ -0,0 +1,151 @@
+"""
+Invalidation bus between the worker processes of one deployment.
+
+With WORKERS > 1 every process keeps its own caches: verify results and the
+Bloom filter, token revocations, upload jobs, SSE subscribers. A write lands
+on one worker; `publish(topic, payload)` tells the others so they can drop
+or update what they hold.
+
+There is no broker. Each worker binds a Unix datagram socket named after
+its pid in the deployment's bus directory, and publishing sends one
+datagram to every other socket there. Sockets left behind by dead workers
+refuse the datagram and are removed. Delivery is best effort and takes
+well under a millisecond on an idle host; a send that would block for more
+than BUS_SEND_TIMEOUT seconds is dropped and counted in bus_messages_total,
+so a stalled worker can never hold up a request on another. Anything that
+must never be stale across workers (the ETag versions, see app/versions.py)
+is shared through a file instead.
+
+Handlers run on the bus's receiver thread, one message at a time.
+Payloads are JSON; keep them well under the socket buffer size.
+
+With a single worker `start()` is never called and `publish()` does nothing.
+"""
+
+import os
+import socket
+import threading
+import logging
+import orjson
+from . import metrics
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+_BUFFER_SIZE = 4 * 1024 * 1024
+_STOP = b""
+
+_handlers = {}
+_directory = None
+_path = None
+_receiver = None
+_sender = None
+_thread = None
+
+_counts = {"sent": 0, "received": 0, "dropped": 0}
+_counts_lock = threading.Lock()
+
+def subscribe(topic: str, handler):
+    """Call handler(payload) for every message other workers publish on `topic`."""
+    _handlers.setdefault(topic, []).append(handler)
+
+def _count(kind: str, n: int = 1):
+    with _counts_lock:
+        _counts[kind] += n
+
+def publish(topic: str, payload):
+    """Send `payload` to every other worker; returns at once if the bus isn't running."""
+    sender = _sender
+    if sender is None:
+        return
+    message = orjson.dumps([topic, payload])
+    try:
+        names = os.listdir(_directory)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(_directory, name)
+        if path == _path or not name.endswith(".sock"):
+            continue
+        try:
+            sender.sendto(message, path)
+            _count("sent")
+        except (ConnectionRefusedError, FileNotFoundError):
+            # Its worker is gone
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+        except OSError as e:
+            _count("dropped")
+            logger.warning("Bus message %r to %s dropped: %s", topic, name, e)
+
+def _receive():
+    while True:
+        try:
+            message = _receiver.recv(_BUFFER_SIZE)
+        except OSError:
+            return
+        if message == _STOP:
+            return
+        _count("received")
+        try:
+            topic, payload = orjson.loads(message)
+            for handler in _handlers.get(topic, ()):
+                handler(payload)
+        except Exception as e:
+            logger.error("Bus message handler failed: %s", e)
+
+def start(directory: str):
+    """Join the bus in `directory`; called once per worker at startup."""
+    global _directory, _path, _receiver, _sender, _thread
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{os.getpid()}.sock")
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+    receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    receiver.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, _BUFFER_SIZE)
+    receiver.bind(path)
+    sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sender.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, _BUFFER_SIZE)
+    sender.settimeout(settings.bus_send_timeout)
+
+    _directory, _path, _receiver, _sender = directory, path, receiver, sender
+    _thread = threading.Thread(target=_receive, name="worker-bus", daemon=True)
+    _thread.start()
+    logger.info("Joined the worker bus as %s", path)
+
+def stop():
+    global _sender, _receiver, _thread
+    if _sender is None:
+        return
+    sender, _sender = _sender, None
+    try:
+        # Wakes the receiver thread
+        sender.sendto(_STOP, _path)
+    except OSError:
+        pass
+    if _thread is not None:
+        _thread.join(timeout=1)
+    try:
+        os.unlink(_path)
+    except OSError:
+        pass
+    sender.close()
+    _receiver.close()
+    _receiver = _thread = None
+
+def _collect_bus_metrics():
+    with _counts_lock:
+        counts = dict(_counts)
+    return [
+        ("bus_messages_total", "Worker bus messages by direction", "counter",
+         ("direction",), {(kind,): value for kind, value in counts.items()}),
+    ]
+
+metrics.register_collector(_collect_bus_metrics)
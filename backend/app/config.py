@@ -1,21 +1,127 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Worker processes serving the app on this host, see app/workers.py
+WORKERS = max(1, int(os.getenv("WORKERS", "1")))
+
+def _per_worker(name: str, total_name: str, default: int) -> int:
+    """`name` if set, else the host-wide `total_name` split across the workers, else `default`."""
+    if os.getenv(name):
+        return int(os.getenv(name))
+    if os.getenv(total_name):
+        return max(1, -(-int(os.getenv(total_name)) // WORKERS))
+    return default
+
+_DB_POOL_MAX_SIZE = _per_worker("DB_POOL_MAX_SIZE", "DB_POOL_TOTAL_MAX_SIZE", 10)
+
 class Settings(BaseSettings):
     db_driver: str = os.getenv("DRIVER")
     db_server: str = os.getenv("DB_SERVER")
     db_name: str = os.getenv("DB_NAME")
     db_username: str = os.getenv("DB_USERNAME")
     db_password: str = os.getenv("DB_PASSWORD")
+    # "mssql" for SQL Server via pyodbc, "sqlite" for the local stand-in
+    db_backend: str = os.getenv("DB_BACKEND", "mssql")
+    sqlite_path: str = os.getenv("SQLITE_PATH", "free_statement.db")
+    # Pool sizes are per worker process; the *_TOTAL_* forms budget the whole host
+    db_pool_min_size: int = min(_per_worker("DB_POOL_MIN_SIZE", "DB_POOL_TOTAL_MIN_SIZE", 2), _DB_POOL_MAX_SIZE)
+    db_pool_max_size: int = _DB_POOL_MAX_SIZE
+    db_pool_timeout: float = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+    db_pool_max_lifetime: float = float(os.getenv("DB_POOL_MAX_LIFETIME", "1800"))
+    db_pool_ping_after: float = float(os.getenv("DB_POOL_PING_AFTER", "30"))
+    # Upper bound on DB calls running at once; defaults to the pool size
+    db_max_concurrency: int = int(os.getenv("DB_MAX_CONCURRENCY", str(_DB_POOL_MAX_SIZE)))
+    # How many of those may be streams paced by the client (exports, NDJSON listings)
+    db_max_streams: int = int(os.getenv("DB_MAX_STREAMS", str(max(1, _DB_POOL_MAX_SIZE // 4))))
+    db_disconnect_poll_interval: float = float(os.getenv("DB_DISCONNECT_POLL_INTERVAL", "0.25"))
+    db_fetch_batch_size: int = int(os.getenv("DB_FETCH_BATCH_SIZE", "500"))
+    migration_lock_timeout: float = float(os.getenv("MIGRATION_LOCK_TIMEOUT", "300"))
+    workers: int = WORKERS
+    # Lock files, bus sockets and shared counters for multi-worker mode
+    runtime_dir: str = os.getenv("RUNTIME_DIR", os.path.join(tempfile.gettempdir(), "free-statement"))
+    bus_send_timeout: float = float(os.getenv("BUS_SEND_TIMEOUT", "0.05"))
+    registrations_page_size: int = int(os.getenv("REGISTRATIONS_PAGE_SIZE", "100"))
+    registrations_max_page_size: int = int(os.getenv("REGISTRATIONS_MAX_PAGE_SIZE", "1000"))
+    # Prefix searches matching more rows than this page through the date index instead of sorting
+    registrations_sort_limit: int = int(os.getenv("REGISTRATIONS_SORT_LIMIT", "20000"))
+    # Totals above this many matching rows are reported as a lower bound
+    registrations_count_limit: int = int(os.getenv("REGISTRATIONS_COUNT_LIMIT", "10000"))
+    bulk_insert_chunk_size: int = int(os.getenv("BULK_INSERT_CHUNK_SIZE", "1000"))
+    bulk_max_rows: int = int(os.getenv("BULK_MAX_ROWS", "50000"))
+    issue_batch_max_size: int = int(os.getenv("ISSUE_BATCH_MAX_SIZE", "5000"))
+    # Upper bound on how long changes made outside the API take to show
+    reference_data_ttl: float = float(os.getenv("REFERENCE_DATA_TTL", "300"))
+    events_heartbeat_interval: float = float(os.getenv("EVENTS_HEARTBEAT_INTERVAL", "15"))
+    events_retry_interval: float = float(os.getenv("EVENTS_RETRY_INTERVAL", "3"))
+    # Events kept for clients reconnecting with Last-Event-ID
+    events_history_size: int = int(os.getenv("EVENTS_HISTORY_SIZE", "1000"))
+    events_subscriber_buffer: int = int(os.getenv("EVENTS_SUBSCRIBER_BUFFER", "256"))
+    events_max_subscribers: int = int(os.getenv("EVENTS_MAX_SUBSCRIBERS", "500"))
+    upload_max_reported_errors: int = int(os.getenv("UPLOAD_MAX_REPORTED_ERRORS", "100"))
+    upload_job_ttl: float = float(os.getenv("UPLOAD_JOB_TTL", "3600"))
+    verify_cache_size: int = int(os.getenv("VERIFY_CACHE_SIZE", "50000"))
+    verify_cache_ttl: float = float(os.getenv("VERIFY_CACHE_TTL", "300"))
+    verify_bloom_capacity: int = int(os.getenv("VERIFY_BLOOM_CAPACITY", "5000000"))
+    verify_bloom_error_rate: float = float(os.getenv("VERIFY_BLOOM_ERROR_RATE", "0.001"))
+    # Seconds between checks for registrations the Bloom filter hasn't seen (multi-worker)
+    verify_bloom_refresh_interval: float = float(os.getenv("VERIFY_BLOOM_REFRESH_INTERVAL", "1"))
+    # How far before the last check those registrations' registration_date may be
+    verify_bloom_refresh_overlap: float = float(os.getenv("VERIFY_BLOOM_REFRESH_OVERLAP", "300"))
+    # Full reload, for rows written outside the API; 0 turns it off
+    verify_bloom_rebuild_interval: float = float(os.getenv("VERIFY_BLOOM_REBUILD_INTERVAL", "3600"))
+    # "stub", or a provider class as "package.module:Class"
+    core_banking_provider: str = os.getenv("CORE_BANKING_PROVIDER", "stub")
+    core_banking_timeout: float = float(os.getenv("CORE_BANKING_TIMEOUT", "2"))
+    core_banking_batch_window: float = float(os.getenv("CORE_BANKING_BATCH_WINDOW", "0.005"))
+    core_banking_batch_size: int = int(os.getenv("CORE_BANKING_BATCH_SIZE", "50"))
+    core_banking_max_concurrency: int = int(os.getenv("CORE_BANKING_MAX_CONCURRENCY", "4"))
+    core_banking_cache_size: int = int(os.getenv("CORE_BANKING_CACHE_SIZE", "50000"))
+    core_banking_cache_ttl: float = float(os.getenv("CORE_BANKING_CACHE_TTL", "600"))
+    core_banking_negative_ttl: float = float(os.getenv("CORE_BANKING_NEGATIVE_TTL", "60"))
+    core_banking_failure_threshold: int = int(os.getenv("CORE_BANKING_FAILURE_THRESHOLD", "5"))
+    core_banking_reset_timeout: float = float(os.getenv("CORE_BANKING_RESET_TIMEOUT", "30"))
+    core_banking_stub_latency: float = float(os.getenv("CORE_BANKING_STUB_LATENCY", "0"))
     ldap_server: str = os.getenv("LDAP_SERVER")
     ldap_base_dn: str = os.getenv("LDAP_BASE_DN")
     ldap_username: str = os.getenv("LDAP_USERNAME", "crmadmin")
     ldap_password: str = os.getenv("LDAP_PASSWORD", "admin123")
+    # "sync" talks to ldap_server, "mock" uses ldap3's offline MOCK_SYNC strategy
+    ldap_strategy: str = os.getenv("LDAP_STRATEGY", "sync")
+    ldap_upn_suffix: str = os.getenv("LDAP_UPN_SUFFIX", "bk.local")
+    # Tried in order until one binds; UPN succeeds for ordinary AD accounts
+    ldap_bind_strategies: str = os.getenv("LDAP_BIND_STRATEGIES", "upn,search,cn")
+    ldap_pool_size: int = int(os.getenv("LDAP_POOL_SIZE", "4"))
+    ldap_pool_timeout: float = float(os.getenv("LDAP_POOL_TIMEOUT", "5"))
+    ldap_connect_timeout: float = float(os.getenv("LDAP_CONNECT_TIMEOUT", "5"))
+    ldap_receive_timeout: float = float(os.getenv("LDAP_RECEIVE_TIMEOUT", "10"))
+    ad_index_enabled: bool = os.getenv("AD_INDEX_ENABLED", "true").lower() == "true"
+    ad_sync_interval: float = float(os.getenv("AD_SYNC_INTERVAL", "60"))
+    ad_full_sync_interval: float = float(os.getenv("AD_FULL_SYNC_INTERVAL", "3600"))
+    ad_sync_overlap: float = float(os.getenv("AD_SYNC_OVERLAP", "300"))
+    ad_sync_page_size: int = int(os.getenv("AD_SYNC_PAGE_SIZE", "500"))
+    ad_search_max_results: int = int(os.getenv("AD_SEARCH_MAX_RESULTS", "50"))
+    ad_user_cache_ttl: float = float(os.getenv("AD_USER_CACHE_TTL", "300"))
+    issuer_bulk_max_size: int = int(os.getenv("ISSUER_BULK_MAX_SIZE", "1000"))
+    idempotency_key_ttl: int = int(os.getenv("IDEMPOTENCY_KEY_TTL", "86400"))
+    # Seconds between purges of expired keys
+    idempotency_purge_interval: float = float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL", "3600"))
+    log_level: str = os.getenv("LOG_LEVEL", "INFO")
+    # Per-logger overrides, e.g. "app.auth=DEBUG,uvicorn.access=WARNING"
+    log_levels: str = os.getenv("LOG_LEVELS", "")
+    log_format: str = os.getenv("LOG_FORMAT", "json")
+    log_queue_size: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    log_rate_limit: float = float(os.getenv("LOG_RATE_LIMIT", "20"))
+    log_rate_limit_level: str = os.getenv("LOG_RATE_LIMIT_LEVEL", "INFO")
+    log_debug_sample_rate: float = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0"))
+    log_redact_fields: str = os.getenv("LOG_REDACT_FIELDS", "username,password,token,account_number,search_term")
+    metrics_enabled: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
     jwt_secret: str = os.getenv("JWT_SECRET")
+    token_cache_size: int = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
     
     @property
     def db_connection_string(self) -> str:
@@ -23,4 +129,4 @@ class Settings(BaseSettings):
 
 @lru_cache()
 def get_settings():
-    return Settings()
\ No newline at end of file
+    return Settings()
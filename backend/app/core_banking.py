@@ -0,0 +1,236 @@
+"""
+Account details from the core-banking system, for verifying accounts
+that are not registered yet.
+
+The upstream is slow and rate-limited, so every lookup goes through
+`AccountLookup`:
+
+- results are cached for CORE_BANKING_CACHE_TTL seconds, accounts the
+  upstream doesn't know for CORE_BANKING_NEGATIVE_TTL;
+- concurrent lookups of one account share a single upstream request;
+- lookups arriving within CORE_BANKING_BATCH_WINDOW seconds of each other
+  go upstream together, up to CORE_BANKING_BATCH_SIZE accounts per call;
+- each call gets CORE_BANKING_TIMEOUT seconds, counted from when it was
+  queued, and at most CORE_BANKING_MAX_CONCURRENCY calls run at once;
+- after CORE_BANKING_FAILURE_THRESHOLD failed calls in a row the circuit
+  opens: lookups fail fast for CORE_BANKING_RESET_TIMEOUT seconds, then a
+  single trial call decides whether it closes again.
+
+A lookup that can't be answered comes back as "unavailable" instead of
+raising, so verify responds within the batch window plus the timeout
+whatever state the upstream is in.
+
+Providers subclass `AccountProvider`. CORE_BANKING_PROVIDER picks one from
+PROVIDERS by name, or names a class as "package.module:Class".
+"""
+
+import abc
+import asyncio
+import importlib
+import time
+import weakref
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+from . import metrics
+from .cache import TTLCache
+from .config import get_settings
+from .models import AccountDetails
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+FOUND = "found"
+NOT_FOUND = "not_found"
+UNAVAILABLE = "unavailable"
+
+_MISSING = object()
+
+class AccountProvider(abc.ABC):
+    @abc.abstractmethod
+    def fetch_accounts(self, account_numbers: List[str]) -> Dict[str, AccountDetails]:
+        """
+        Look up several accounts in one upstream call. Blocking; runs on
+        the lookup's own thread pool. Accounts that don't exist are left out
+        of the result; a failed call raises.
+        """
+
+class StubAccountProvider(AccountProvider):
+    """Local stand-in: every all-digit account number exists, with fixed demo details."""
+
+    def fetch_accounts(self, account_numbers: List[str]) -> Dict[str, AccountDetails]:
+        if settings.core_banking_stub_latency:
+            # Lets the batching and timeouts be exercised without an upstream
+            time.sleep(settings.core_banking_stub_latency)
+        return {
+            account_number: AccountDetails(full_name="John Doe", phone_number="0788123456")
+            for account_number in account_numbers if account_number.isdigit()
+        }
+
+PROVIDERS = {
+    "stub": StubAccountProvider,
+}
+
+def load_provider(name: str) -> AccountProvider:
+    if name in PROVIDERS:
+        return PROVIDERS[name]()
+    module_name, _, class_name = name.partition(":")
+    if not class_name:
+        raise ValueError(f"Unknown core-banking provider {name!r}; use one of {sorted(PROVIDERS)} or module:Class")
+    # A subclass missing fetch_accounts fails here with TypeError, not on the first lookup
+    provider = getattr(importlib.import_module(module_name), class_name)()
+    if not isinstance(provider, AccountProvider):
+        raise TypeError(f"Core-banking provider {name!r} is not an AccountProvider")
+    return provider
+
+class CircuitBreaker:
+    """Closed, open or half-open; only used from the event loop, so no locking."""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+            # Let one call through to see whether the upstream is back
+            self.state = "half_open"
+            return True
+        return False
+
+    def record_success(self):
+        if self.state != "closed":
+            logger.info("Core-banking circuit closed")
+        self.state = "closed"
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                logger.warning("Core-banking circuit opened after %d failed calls", self.failures)
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+class _LoopState:
+    """Lookups waiting on one event loop: queued for the next batch, or in flight."""
+
+    __slots__ = ("inflight", "pending", "timer")
+
+    def __init__(self):
+        self.inflight = {}
+        self.pending = []
+        self.timer = None
+
+class AccountLookup:
+    def __init__(self, provider: AccountProvider):
+        self.provider = provider
+        self.cache = TTLCache(settings.core_banking_cache_size, settings.core_banking_cache_ttl)
+        self.breaker = CircuitBreaker(settings.core_banking_failure_threshold, settings.core_banking_reset_timeout)
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.core_banking_max_concurrency,
+            thread_name_prefix="core-banking"
+        )
+        # One state per event loop, so test clients that spin up their own loops work
+        self._states = weakref.WeakKeyDictionary()
+
+    async def lookup(self, account_number: str):
+        """Return (status, details): FOUND with details, or NOT_FOUND / UNAVAILABLE with None."""
+        details = self.cache.get(account_number, _MISSING)
+        if details is not _MISSING:
+            metrics.observe_core_banking_lookup("cache")
+            return (FOUND, details) if details is not None else (NOT_FOUND, None)
+
+        loop = asyncio.get_running_loop()
+        state = self._states.get(loop)
+        if state is None:
+            state = self._states[loop] = _LoopState()
+
+        future = state.inflight.get(account_number)
+        if future is not None:
+            metrics.observe_core_banking_lookup("coalesced")
+        else:
+            metrics.observe_core_banking_lookup("upstream")
+            future = state.inflight[account_number] = loop.create_future()
+            state.pending.append(account_number)
+            if len(state.pending) >= settings.core_banking_batch_size:
+                self._flush(state)
+            elif state.timer is None:
+                state.timer = loop.call_later(settings.core_banking_batch_window, self._flush, state)
+        # Shielded: a caller that goes away must not cancel the others' result
+        return await asyncio.shield(future)
+
+    def _flush(self, state: _LoopState):
+        if state.timer is not None:
+            state.timer.cancel()
+            state.timer = None
+        batch, state.pending = state.pending, []
+        if batch:
+            asyncio.ensure_future(self._fetch(state, batch))
+
+    def _call(self, batch, deadline: float):
+        # Calls that sat in the queue past their deadline have no one waiting
+        if time.monotonic() >= deadline:
+            raise asyncio.TimeoutError()
+        return self.provider.fetch_accounts(batch)
+
+    async def _fetch(self, state: _LoopState, batch):
+        results = {}
+        outcome = "rejected"
+        started = time.monotonic()
+        try:
+            if self.breaker.allow():
+                loop = asyncio.get_running_loop()
+                deadline = started + settings.core_banking_timeout
+                try:
+                    found = await asyncio.wait_for(
+                        loop.run_in_executor(self._executor, self._call, batch, deadline),
+                        settings.core_banking_timeout
+                    )
+                except asyncio.TimeoutError:
+                    outcome = "timeout"
+                    self.breaker.record_failure()
+                except Exception as e:
+                    outcome = "error"
+                    self.breaker.record_failure()
+                    logger.warning("Core-banking lookup of %d accounts failed: %s", len(batch), e)
+                else:
+                    outcome = "ok"
+                    self.breaker.record_success()
+                    negative_expiry = time.time() + settings.core_banking_negative_ttl
+                    for account_number in batch:
+                        details = found.get(account_number)
+                        if details is None:
+                            self.cache.set(account_number, None, expires_at=negative_expiry)
+                            results[account_number] = (NOT_FOUND, None)
+                        else:
+                            self.cache.set(account_number, details)
+                            results[account_number] = (FOUND, details)
+        finally:
+            metrics.observe_core_banking_call(outcome, len(batch), time.monotonic() - started)
+            for account_number in batch:
+                future = state.inflight.pop(account_number, None)
+                if future is not None and not future.done():
+                    future.set_result(results.get(account_number, (UNAVAILABLE, None)))
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+account_lookup = AccountLookup(load_provider(settings.core_banking_provider))
+
+_BREAKER_STATES = ("closed", "half_open", "open")
+
+def _collect_core_banking_metrics():
+    return [
+        ("core_banking_circuit_state", "Core-banking circuit breaker state (1 for the current one)", "gauge",
+         ("state",), {(state,): int(account_lookup.breaker.state == state) for state in _BREAKER_STATES}),
+        ("core_banking_cache_entries", "Cached core-banking account lookups", "gauge", (),
+         {(): len(account_lookup.cache)}),
+    ]
+
+metrics.register_collector(_collect_core_banking_metrics)
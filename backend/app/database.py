@@ -1,42 +1,316 @@
-import pyodbc
+import sqlite3
+import threading
+import time
+import logging
+from datetime import datetime
+from . import metrics
 from .config import get_settings
 
+logger = logging.getLogger(__name__)
+
 settings = get_settings()
 
+# Let the SQLite stand-in hand back datetimes like pyodbc does
+sqlite3.register_converter("DATETIME", lambda value: datetime.fromisoformat(value.decode()))
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be leased within the acquire timeout."""
+
+class PooledConnection:
+    """
+    Thin wrapper around a DB-API connection leased from a ConnectionPool.
+
+    Everything is delegated to the raw connection except close(), which
+    hands the connection back to the pool instead of tearing it down, so
+    existing `conn.close()` calls keep working unchanged.
+    """
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.leased = False
+        self._cursor = None
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def cursor(self):
+        cursor = self._raw.cursor()
+        # Remember the active cursor so cancel() can reach it from another thread
+        self._cursor = cursor
+        if metrics.enabled:
+            return metrics.InstrumentedCursor(cursor)
+        return cursor
+
+    def cancel(self):
+        """Abort whatever statement is running on this connection, from any thread."""
+        if hasattr(self._raw, "interrupt"):
+            self._raw.interrupt()
+            return
+        cursor = self._cursor
+        if cursor is not None:
+            try:
+                cursor.cancel()
+            except Exception as e:
+                logger.debug("Error cancelling cursor: %s", e)
+
+    @property
+    def raw(self):
+        return self._raw
+
+    def expired(self, max_lifetime: float) -> bool:
+        return max_lifetime > 0 and time.monotonic() - self.created_at > max_lifetime
+
+    def close(self):
+        if self.leased:
+            self._pool.release(self)
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of DB-API connections.
+
+    Connections that sat idle for more than `ping_after` seconds are
+    health-checked on checkout, and every connection is recycled once it is
+    older than `max_lifetime` seconds. Callers block for at most `timeout`
+    seconds when all `max_size` connections are leased.
+    """
+
+    def __init__(self, connect, min_size: int = 1, max_size: int = 10,
+                 timeout: float = 5.0, max_lifetime: float = 1800.0,
+                 ping_after: float = 30.0, health_check: str = "SELECT 1"):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError("Invalid pool size bounds")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.ping_after = ping_after
+        self.health_check = health_check
+        self._idle = []
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        for _ in range(min_size):
+            self._idle.append(self._open())
+
+    def _timed_connect(self):
+        started = time.perf_counter()
+        raw = self._connect()
+        metrics.observe_connect(time.perf_counter() - started)
+        return raw
+
+    def _open(self) -> PooledConnection:
+        conn = PooledConnection(self, self._timed_connect())
+        with self._cond:
+            self._size += 1
+        return conn
+
+    def _discard(self, conn: PooledConnection):
+        try:
+            conn.raw.close()
+        except Exception as e:
+            logger.debug("Error closing pooled connection: %s", e)
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def _healthy(self, conn: PooledConnection) -> bool:
+        if conn.expired(self.max_lifetime):
+            return False
+        # Connections returned moments ago are trusted without a round trip
+        if time.monotonic() - conn.last_used < self.ping_after:
+            return True
+        try:
+            cursor = conn.raw.cursor()
+            try:
+                cursor.execute(self.health_check)
+                cursor.fetchone()
+            finally:
+                cursor.close()
+            return True
+        except Exception as e:
+            logger.warning("Pooled connection failed health check: %s", e)
+            return False
+
+    def acquire(self, timeout: float = None) -> PooledConnection:
+        timeout = self.timeout if timeout is None else timeout
+        started = time.perf_counter()
+        deadline = time.monotonic() + timeout
+        while True:
+            conn = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolTimeout("Connection pool is closed")
+                    if self._idle:
+                        conn = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        # Reserve the slot before connecting outside the lock
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(
+                            f"Timed out after {timeout}s waiting for a database connection"
+                        )
+                    self._cond.wait(remaining)
+
+            if conn is None:
+                try:
+                    conn = PooledConnection(self, self._timed_connect())
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._healthy(conn):
+                self._discard(conn)
+                continue
+
+            conn.leased = True
+            metrics.observe_acquire(time.perf_counter() - started)
+            return conn
+
+    def release(self, conn: PooledConnection):
+        conn.leased = False
+        conn._cursor = None
+        conn.last_used = time.monotonic()
+        try:
+            # Never hand an open transaction to the next caller
+            conn.raw.rollback()
+        except Exception:
+            self._discard(conn)
+            return
+        if self._closed or conn.expired(self.max_lifetime):
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "max_size": self.max_size,
+            }
+
+def _connect_mssql():
+    # Imported lazily so the SQLite stand-in works without an ODBC driver manager
+    import pyodbc
+    return pyodbc.connect(settings.db_connection_string)
+
+def _connect_sqlite(path: str = None):
+    conn = sqlite3.connect(
+        path or settings.sqlite_path,
+        detect_types=sqlite3.PARSE_DECLTYPES,
+        check_same_thread=False,
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
+
+def sqlite_pool(path: str, **kwargs) -> ConnectionPool:
+    """Build a pool over a SQLite database, used as a local stand-in for SQL Server."""
+    return ConnectionPool(lambda: _connect_sqlite(path), **kwargs)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                connect = _connect_sqlite if is_sqlite() else _connect_mssql
+                _pool = ConnectionPool(
+                    connect,
+                    min_size=settings.db_pool_min_size,
+                    max_size=settings.db_pool_max_size,
+                    timeout=settings.db_pool_timeout,
+                    max_lifetime=settings.db_pool_max_lifetime,
+                    ping_after=settings.db_pool_ping_after,
+                )
+    return _pool
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+def _collect_pool_metrics():
+    pool = _pool
+    if pool is None:
+        return []
+    stats = pool.stats()
+    return [
+        ("db_pool_connections", "Pooled database connections by state", "gauge", ("state",),
+         {("idle",): stats["idle"], ("in_use",): stats["in_use"]}),
+        ("db_pool_max_connections", "Configured pool size", "gauge", (), {(): stats["max_size"]}),
+    ]
+
+metrics.register_collector(_collect_pool_metrics)
+
+def is_sqlite() -> bool:
+    return settings.db_backend == "sqlite"
+
+def limit_clause() -> str:
+    """Row-limit suffix for an ORDER BY query; the limit is bound as a parameter."""
+    if is_sqlite():
+        return " LIMIT ?"
+    return " OFFSET 0 ROWS FETCH NEXT ? ROWS ONLY"
+
+def datetime_param() -> str:
+    """
+    Placeholder for comparing a DATETIME column against a value read back
+    from it. SQL Server would otherwise widen the column to DATETIME2 and
+    miss rows whose 1/300s ticks don't round-trip exactly.
+    """
+    if is_sqlite():
+        return "?"
+    return "CAST(? AS DATETIME)"
+
 def get_db_connection():
     try:
-        conn = pyodbc.connect(settings.db_connection_string)
-        return conn
+        return get_pool().acquire()
     except Exception as e:
-        print(f"Error connecting to database: {e}")
+        logger.error("Error connecting to database: %s", e)
         raise
 
+def get_db():
+    """FastAPI dependency that leases a pooled connection for one request."""
+    conn = get_db_connection()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
 def init_db():
+    """Bring the schema up to date, see app/migrations.py."""
+    from .migrations import migrate
     conn = get_db_connection()
-    cursor = conn.cursor()
-    
     try:
-        # Create registrations table
-        cursor.execute("""
-            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='registrations' AND xtype='U')
-            CREATE TABLE registrations (
-                id VARCHAR(36) PRIMARY KEY,
-                account_number VARCHAR(20) NOT NULL UNIQUE,
-                full_name VARCHAR(100) NOT NULL,
-                phone_number VARCHAR(20) NOT NULL,
-                email VARCHAR(100),
-                id_number VARCHAR(50),
-                registration_date DATETIME NOT NULL,
-                created_at DATETIME NOT NULL DEFAULT GETDATE(),
-                issued_by VARCHAR(100) NOT NULL
-            )
-        """)
-        
-        conn.commit()
+        applied = migrate(conn)
+        if applied:
+            logger.info("Applied schema migrations %s", applied)
     except Exception as e:
-        print(f"Error initializing database: {e}")
-        conn.rollback()
+        logger.error("Error initializing database: %s", e)
         raise
     finally:
-        cursor.close()
-        conn.close()
\ No newline at end of file
+        conn.close()
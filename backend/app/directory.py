@@ -0,0 +1,317 @@
+"""
+In-memory index of Active Directory users for the issuer picker.
+
+A background thread pulls every enabled user with a paged LDAP search,
+then refreshes incrementally on `whenChanged`, with a periodic full
+resync to drop deleted accounts. Searches are answered from an immutable
+snapshot using a prefix index and a trigram index, so a keystroke costs
+no LDAP round trip. When a sync fails, the last good snapshot keeps
+serving.
+"""
+
+import bisect
+import threading
+import time
+import logging
+from datetime import timedelta
+from ldap3 import SUBTREE
+from ldap3.utils.conv import escape_filter_chars
+from .auth import (
+    AD_USER_ATTRIBUTES, enabled_users_filter, entry_to_ad_user,
+    get_ad_user, get_ad_users, ldap_search_connection, revoke_user
+)
+from .cache import TTLCache
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+ACCOUNT_DISABLE = 0x2
+
+def _trigrams(text: str):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class DirectorySnapshot:
+    """Immutable view of the directory with the indexes built over it."""
+
+    def __init__(self, users: dict):
+        self.users = users
+        self.built_at = time.time()
+        # sAMAccountName is case-insensitive
+        self.by_username = {username.lower(): user for username, user in users.items()}
+        # What a blank search lists, sorted once rather than per keystroke
+        self._listing = [users[username] for username in sorted(users)]
+        self._trigrams = {}
+        prefixes = []
+        for username, user in users.items():
+            keys = {username.lower(), (user.display_name or "").lower()}
+            keys.update((user.display_name or "").lower().split())
+            for key in keys:
+                if not key:
+                    continue
+                prefixes.append((key, username))
+                for trigram in _trigrams(key):
+                    self._trigrams.setdefault(trigram, set()).add(username)
+        prefixes.sort()
+        self._prefix_keys = [key for key, _ in prefixes]
+        self._prefix_users = [username for _, username in prefixes]
+
+    def _prefix_matches(self, term: str):
+        start = bisect.bisect_left(self._prefix_keys, term)
+        for position in range(start, len(self._prefix_keys)):
+            if not self._prefix_keys[position].startswith(term):
+                break
+            yield self._prefix_users[position]
+
+    def _substring_matches(self, term: str):
+        if len(term) < 3:
+            return []
+        candidates = None
+        for trigram in _trigrams(term):
+            usernames = self._trigrams.get(trigram)
+            if not usernames:
+                return []
+            candidates = usernames if candidates is None else candidates & usernames
+        # Trigrams only narrow the field; confirm the real substring match
+        return sorted(
+            username for username in candidates
+            if term in username.lower() or term in (self.users[username].display_name or "").lower()
+        )
+
+    def search(self, term: str, limit: int):
+        term = (term or "").strip().lower()
+        if not term:
+            return self._listing[:limit]
+
+        results = []
+        seen = set()
+        # Prefix hits rank first, then the rest of the *term* substring matches
+        for username in list(self._prefix_matches(term)) + self._substring_matches(term):
+            if username in seen:
+                continue
+            seen.add(username)
+            results.append(self.users[username])
+            if len(results) >= limit:
+                break
+        return results
+
+class DirectoryIndex:
+    def __init__(self):
+        self._snapshot = None
+        self._high_water = None
+        self._last_full_sync = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_error = None
+        self.last_success = None
+
+    @property
+    def ready(self) -> bool:
+        return self._snapshot is not None
+
+    def search(self, term: str, limit: int = None):
+        limit = limit or settings.ad_search_max_results
+        snapshot = self._snapshot
+        if snapshot is None:
+            return None
+        return snapshot.search(term, limit)
+
+    def find(self, username: str):
+        """The enabled user with this exact username, or None if unknown or not loaded yet."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return None
+        return snapshot.by_username.get(username.lower())
+
+    def _paged_entries(self, search_filter: str, attributes):
+        with ldap_search_connection() as conn:
+            return list(conn.extend.standard.paged_search(
+                search_base=settings.ldap_base_dn,
+                search_filter=search_filter,
+                search_scope=SUBTREE,
+                attributes=attributes,
+                paged_size=settings.ad_sync_page_size,
+                generator=True
+            ))
+
+    def _track_high_water(self, response):
+        for item in response:
+            changed = item.get("attributes", {}).get("whenChanged")
+            if isinstance(changed, list):
+                changed = changed[0] if changed else None
+            if changed and not isinstance(changed, str) and (
+                self._high_water is None or changed > self._high_water
+            ):
+                self._high_water = changed
+
+    def full_sync(self):
+        started = time.perf_counter()
+        response = self._paged_entries(enabled_users_filter(), AD_USER_ATTRIBUTES + ['whenChanged'])
+        users = {}
+        for item in response:
+            if item.get("type") != "searchResEntry":
+                continue
+            user = _response_to_ad_user(item)
+            if user:
+                users[user.username] = user
+        self._track_high_water(response)
+        self._snapshot = DirectorySnapshot(users)
+        self._last_full_sync = time.time()
+        logger.info(
+            "Directory full sync loaded %d users in %.0f ms",
+            len(users), (time.perf_counter() - started) * 1000
+        )
+
+    def incremental_sync(self):
+        if self._high_water is None or self._snapshot is None:
+            return self.full_sync()
+        # Overlap the window: whenChanged is per-DC and not strictly ordered
+        since = self._high_water - timedelta(seconds=settings.ad_sync_overlap)
+        search_filter = (
+            "(&(objectClass=user)(objectCategory=person)"
+            f"(whenChanged>={since.strftime('%Y%m%d%H%M%S')}.0Z))"
+        )
+        response = self._paged_entries(
+            search_filter, AD_USER_ATTRIBUTES + ['whenChanged', 'userAccountControl']
+        )
+        changes = [item for item in response if item.get("type") == "searchResEntry"]
+        if not changes:
+            return
+        users = dict(self._snapshot.users)
+        for item in changes:
+            attributes = item.get("attributes", {})
+            username = attributes.get("sAMAccountName")
+            if not username:
+                continue
+            if int(attributes.get("userAccountControl") or 0) & ACCOUNT_DISABLE:
+                if users.pop(username, None) is not None:
+                    # Cut the account off now rather than when its token expires
+                    revoke_user(username)
+                continue
+            user = _response_to_ad_user(item)
+            if user:
+                users[user.username] = user
+        self._track_high_water(changes)
+        if users == self._snapshot.users:
+            # Only the overlap window came back; nothing to rebuild
+            return
+        self._snapshot = DirectorySnapshot(users)
+        logger.info("Directory incremental sync applied %d changes", len(changes))
+
+    def sync(self):
+        try:
+            if time.time() - self._last_full_sync >= settings.ad_full_sync_interval:
+                self.full_sync()
+            else:
+                self.incremental_sync()
+            self.last_success = time.time()
+            self.last_error = None
+        except Exception as e:
+            # Keep serving the last good snapshot
+            self.last_error = str(e)
+            logger.error("Directory sync failed: %s", e)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.sync()
+            self._stop.wait(settings.ad_sync_interval)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="directory-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def status(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            "ready": snapshot is not None,
+            "users": len(snapshot.users) if snapshot else 0,
+            "snapshot_built_at": snapshot.built_at if snapshot else None,
+            "last_success": self.last_success,
+            "last_error": self.last_error,
+        }
+
+class _ResponseEntry:
+    """Adapts a raw paged-search response item to the Entry attributes entry_to_ad_user reads."""
+
+    class _Value:
+        def __init__(self, value):
+            self.value = value[0] if isinstance(value, list) and len(value) == 1 else (value or None)
+
+    def __init__(self, attributes: dict):
+        for name in AD_USER_ATTRIBUTES:
+            if attributes.get(name) not in (None, []):
+                setattr(self, name, self._Value(attributes[name]))
+
+def _response_to_ad_user(item):
+    return entry_to_ad_user(_ResponseEntry(item.get("attributes", {})))
+
+directory_index = DirectoryIndex()
+
+def search_users(search_term: str = None, limit: int = None):
+    """Answer from the in-memory index; fall back to a capped live search before the first sync."""
+    limit = limit or settings.ad_search_max_results
+    users = directory_index.search(search_term, limit)
+    if users is None:
+        users = get_ad_users(search_term, limit=limit)
+    return users
+
+# Users the index didn't know yet, found by a live lookup
+_found_users = TTLCache(maxsize=10000, ttl=settings.ad_user_cache_ttl)
+
+def find_user(username: str):
+    """
+    Exact username lookup for existence checks: the index first, then a
+    cached live lookup for accounts created since the last sync.
+    """
+    user = directory_index.find(username)
+    if user is not None:
+        return user
+    key = username.lower()
+    user = _found_users.get(key)
+    if user is None:
+        user = get_ad_user(username)
+        if user is not None:
+            # Misses aren't cached, so a new account is seen on its next try
+            _found_users.set(key, user)
+    return user
+
+def find_users(usernames) -> dict:
+    """
+    Exact lookup of many usernames at once, keyed by lowercased username.
+    Whatever the index and cache don't know is fetched with one paged
+    search over an OR of the names; names missing from the result are
+    not in AD (or disabled).
+    """
+    found = {}
+    missing = []
+    for username in usernames:
+        key = username.lower()
+        user = directory_index.find(username) or _found_users.get(key)
+        if user is not None:
+            found[key] = user
+        else:
+            missing.append(username)
+    if missing:
+        names = "".join(f"(sAMAccountName={escape_filter_chars(username)})" for username in missing)
+        response = directory_index._paged_entries(f"(&{enabled_users_filter()}(|{names}))", AD_USER_ATTRIBUTES)
+        fetched = 0
+        for item in response:
+            if item.get("type") != "searchResEntry":
+                continue
+            user = _response_to_ad_user(item)
+            if user:
+                found[user.username.lower()] = user
+                _found_users.set(user.username.lower(), user)
+                fetched += 1
+        logger.info("Looked up %d usernames in one directory search, %d found", len(missing), fetched)
+    return found
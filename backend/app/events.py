@@ -0,0 +1,194 @@
+"""
+Live registration events for GET /api/registrations/events (Server-Sent Events).
+
+Write paths call `publish()` after they commit. Each event is encoded once,
+kept in a short replay history and handed to every subscriber's queue on
+the subscriber's own event loop (publishers run on DB worker threads).
+
+- Reconnects: event ids are "<boot>-<sequence>". A client that comes back
+  with Last-Event-ID gets the events it missed replayed from the history;
+  if they are gone, or the id is from before a restart, it gets a `reset`
+  event and should reload /stats.
+- Slow clients: each subscriber's queue holds at most EVENTS_SUBSCRIBER_BUFFER
+  events. A subscriber that falls that far behind has its backlog dropped
+  and its stream closed, and catches up through Last-Event-ID on reconnect.
+- Heartbeats: a comment line every EVENTS_HEARTBEAT_INTERVAL seconds keeps
+  proxies from timing the stream out.
+
+With several workers each one relays its events to the others over the bus
+(app/bus.py), so a stream sees every write whichever worker serves it. Ids
+are per worker: a client that reconnects to a different worker gets a reset.
+"""
+
+import asyncio
+import itertools
+import os
+import threading
+import time
+import logging
+from collections import deque
+from datetime import date
+import orjson
+from . import bus, metrics
+from .config import get_settings
+from .stats import day_key
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+# Distinguishes this process's event ids from those of an earlier run or another worker
+_boot = format(int(time.time() * 1000), "x") + "p" + format(os.getpid(), "x")
+_sequence = itertools.count(1)
+_history = deque(maxlen=settings.events_history_size)
+_subscribers = set()
+_lock = threading.Lock()
+_dropped = 0
+
+class Subscriber:
+    __slots__ = ("loop", "queue", "overflowed")
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=settings.events_subscriber_buffer)
+        self.overflowed = False
+
+    def offer(self, event):
+        """Runs on the subscriber's loop; None tells the stream to end."""
+        global _dropped
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Free the backlog now rather than when the client gets round to it
+            self.overflowed = True
+            _dropped += 1
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+def stats_delta(deltas) -> dict:
+    """Translate counter deltas (see app.stats) into changes to the /stats fields."""
+    today = day_key(date.today())
+    delta = {"issuers": {}}
+    for key, value in deltas.items():
+        if not value:
+            continue
+        if key == "total":
+            delta["total_registrations"] = value
+        elif key == "issued":
+            delta["issued_registrations"] = value
+        elif key == today:
+            delta["todays_registrations"] = value
+        elif key.startswith("issuer:"):
+            delta["issuers"][key[len("issuer:"):]] = value
+    return delta
+
+def publish(event_type: str, data: dict):
+    """Send an event to every subscriber; call it only after the change has committed."""
+    _deliver(event_type, data)
+    bus.publish("events", [event_type, data])
+
+def _deliver(event_type: str, data: dict):
+    with _lock:
+        event = (f"{_boot}-{next(_sequence)}", event_type, orjson.dumps(data))
+        _history.append(event)
+        subscribers = list(_subscribers)
+    for subscriber in subscribers:
+        try:
+            subscriber.loop.call_soon_threadsafe(subscriber.offer, event)
+        except RuntimeError:
+            # The subscriber's loop has closed; its stream is already gone
+            pass
+
+bus.subscribe("events", lambda message: _deliver(*message))
+
+def _parse_id(event_id: str):
+    boot, _, sequence = (event_id or "").partition("-")
+    return boot, int(sequence) if sequence.isdigit() else None
+
+def is_full() -> bool:
+    with _lock:
+        return len(_subscribers) >= settings.events_max_subscribers
+
+def latest_id() -> str:
+    """The id of the newest event; a stream opened with it replays whatever comes after."""
+    with _lock:
+        return _history[-1][0] if _history else f"{_boot}-0"
+
+def _subscribe(last_event_id: str = None):
+    """
+    Register a subscriber on the running loop. Returns (subscriber, replay,
+    reset_id): the events to replay, or reset_id set if the client has to
+    reload its state because they are no longer available.
+    """
+    subscriber = Subscriber(asyncio.get_running_loop())
+    with _lock:
+        if len(_subscribers) >= settings.events_max_subscribers:
+            return None, [], None
+        _subscribers.add(subscriber)
+        history = list(_history)
+
+    if last_event_id is None:
+        return subscriber, [], None
+    boot, sequence = _parse_id(last_event_id)
+    latest = history[-1][0] if history else f"{_boot}-0"
+    if boot != _boot or sequence is None:
+        return subscriber, [], latest
+    missed = [event for event in history if _parse_id(event[0])[1] > sequence]
+    oldest = _parse_id(history[0][0])[1] if history else None
+    if oldest is not None and oldest > sequence + 1:
+        # Some of what the client missed has already left the history
+        return subscriber, [], latest
+    return subscriber, missed, None
+
+def unsubscribe(subscriber: Subscriber):
+    with _lock:
+        _subscribers.discard(subscriber)
+
+def _format(event) -> bytes:
+    event_id, event_type, data = event
+    return b"id: %s\nevent: %s\ndata: %s\n\n" % (event_id.encode(), event_type.encode(), data)
+
+async def stream(last_event_id: str = None):
+    """
+    The SSE body for one client, replaying what came after `last_event_id`.
+
+    The subscriber is registered on the first iteration rather than when
+    the response is built: a client that goes away before the body starts
+    leaves nothing behind, since the generator never runs.
+    """
+    # How long the browser waits before reconnecting, in milliseconds
+    yield b"retry: %d\n\n" % int(settings.events_retry_interval * 1000)
+    subscriber, replay, reset_id = _subscribe(last_event_id)
+    if subscriber is None:
+        # Filled up since the request was accepted; the browser retries
+        return
+    try:
+        if reset_id is not None:
+            yield _format((reset_id, "reset", b"{}"))
+        for event in replay:
+            yield _format(event)
+        while True:
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), settings.events_heartbeat_interval)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            if event is None:
+                return
+            yield _format(event)
+    finally:
+        unsubscribe(subscriber)
+
+def _collect_event_metrics():
+    with _lock:
+        subscribers = len(_subscribers)
+    return [
+        ("events_subscribers", "Open registration event streams", "gauge", (), {(): subscribers}),
+        ("events_dropped_subscribers_total", "Event streams closed because the client fell behind", "counter", (),
+         {(): _dropped}),
+    ]
+
+metrics.register_collector(_collect_event_metrics)
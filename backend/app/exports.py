@@ -0,0 +1,126 @@
+"""
+Report exports of the registrations table.
+
+CSV is written batch by batch from a `fetchmany` cursor straight into the
+response, so an export holds one batch in memory however many rows match.
+An XLSX file is a zip and can't be sent before it is complete: it is
+written with openpyxl's write-only workbook (rows go straight to disk) to
+a temporary file, which is then streamed back and deleted.
+"""
+
+import csv
+import io
+import os
+import tempfile
+import logging
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+EXPORT_FORMATS = ("csv", "xlsx")
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+# Same headings as the dashboard's client-side export
+EXPORT_HEADERS = (
+    "Account Number", "Full Name", "Phone Number", "Email", "ID Number",
+    "Registration Date", "Issued By", "Status",
+)
+
+EXPORT_COLUMNS = """
+    account_number, full_name, phone_number, email, id_number,
+    registration_date, issued_by, is_issued
+"""
+
+# Excel's sheet limit, header row included
+XLSX_MAX_ROWS = 1048576
+
+# Spreadsheet apps run cells starting with these as formulas
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+def _text(value) -> str:
+    if value is None:
+        return ""
+    value = str(value)
+    if value.startswith(_FORMULA_PREFIXES) and not _is_number(value):
+        return "'" + value
+    return value
+
+def _is_number(value: str) -> bool:
+    # Phone numbers such as +250788123456 are data, not formulas
+    return value[1:].replace(" ", "").isdigit()
+
+def export_row(row) -> tuple:
+    """Map an EXPORT_COLUMNS row to the values written under EXPORT_HEADERS."""
+    account_number, full_name, phone_number, email, id_number, registration_date, issued_by, is_issued = row
+    return (
+        _text(account_number),
+        _text(full_name),
+        _text(phone_number),
+        _text(email),
+        _text(id_number),
+        registration_date.isoformat(sep=" ", timespec="seconds") if registration_date else "",
+        _text(issued_by),
+        "Issued" if is_issued else "Pending",
+    )
+
+async def csv_chunks(batches):
+    """Turn an async iterator of row batches into CSV text, one chunk per batch."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # The BOM makes Excel read the file as UTF-8, like the upload parser does
+    buffer.write("\ufeff")
+    writer.writerow(EXPORT_HEADERS)
+    yield buffer.getvalue()
+
+    async for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(export_row(row) for row in rows)
+        yield buffer.getvalue()
+
+def write_xlsx(conn, query: str, params) -> str:
+    """Write the query's rows to a temporary XLSX file and return its path; the caller deletes it."""
+    # Imported lazily: only XLSX exports need openpyxl
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = None
+    sheet_rows = XLSX_MAX_ROWS
+    total = 0
+
+    handle, path = tempfile.mkstemp(prefix="export-", suffix=".xlsx")
+    os.close(handle)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(settings.db_fetch_batch_size)
+            if not rows:
+                break
+            for row in rows:
+                if sheet_rows >= XLSX_MAX_ROWS:
+                    # Past Excel's row limit the export carries on in another sheet
+                    sheet = workbook.create_sheet(f"Registrations {len(workbook.worksheets) + 1}"
+                                                  if workbook.worksheets else "Registrations")
+                    sheet.append(EXPORT_HEADERS)
+                    sheet_rows = 1
+                sheet.append(export_row(row))
+                sheet_rows += 1
+            total += len(rows)
+
+        if sheet is None:
+            workbook.create_sheet("Registrations").append(EXPORT_HEADERS)
+        workbook.save(path)
+        logger.info("Wrote XLSX export of %d rows", total)
+        return path
+    except Exception:
+        os.remove(path)
+        raise
+    finally:
+        cursor.close()
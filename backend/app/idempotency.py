@@ -0,0 +1,81 @@
+"""
+Idempotency-Key support for write endpoints.
+
+The first request with a given key stores its response in
+`idempotency_keys` inside the same transaction as the write it made, so a
+double-click or a client retry gets that response back instead of doing
+the work twice. Keys are scoped to the calling user, and reusing a key
+with a different request body is rejected. Expired keys are purged by
+`keep_purged()` every IDEMPOTENCY_PURGE_INTERVAL seconds.
+"""
+
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+MAX_KEY_LENGTH = 100
+
+def validate_key(key):
+    if key is not None and not 0 < len(key) <= MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters"
+        )
+    return key
+
+def fingerprint(body: str) -> str:
+    return hashlib.sha256(body.encode()).hexdigest()
+
+def replay(cursor, key: str, user: str, request_hash: str):
+    """Return the stored response body for (key, user), or None if the key is new."""
+    cursor.execute("""
+        SELECT request_hash, response_body
+        FROM idempotency_keys
+        WHERE idempotency_key = ? AND issued_by = ?
+    """, (key, user))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    if row[0] != request_hash:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used with a different request"
+        )
+    return row[1]
+
+def save(cursor, key: str, user: str, request_hash: str, response_body: str):
+    """Record the response in the caller's transaction; a concurrent twin fails on the primary key."""
+    cursor.execute("""
+        INSERT INTO idempotency_keys (idempotency_key, issued_by, request_hash, response_body, created_at)
+        VALUES (?, ?, ?, ?, ?)
+    """, (key, user, request_hash, response_body, datetime.now()))
+
+def purge_expired(conn):
+    """Drop keys older than IDEMPOTENCY_KEY_TTL."""
+    cursor = conn.cursor()
+    try:
+        cutoff = datetime.now() - timedelta(seconds=settings.idempotency_key_ttl)
+        cursor.execute("DELETE FROM idempotency_keys WHERE created_at < ?", (cutoff,))
+        purged = cursor.rowcount
+        conn.commit()
+        if purged:
+            logger.info("Purged %d expired idempotency keys", purged)
+        return purged
+    finally:
+        cursor.close()
+
+async def keep_purged(db):
+    """Purge at startup and then every IDEMPOTENCY_PURGE_INTERVAL, for as long as the app runs."""
+    while True:
+        try:
+            await db.run(purge_expired)
+        except Exception as e:
+            logger.warning("Purging expired idempotency keys failed: %s", e)
+        await asyncio.sleep(settings.idempotency_purge_interval)
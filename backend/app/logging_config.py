@@ -0,0 +1,202 @@
+"""
+Logging pipeline: request threads only build a LogRecord and enqueue it;
+a background listener formats (JSON by default) and writes it.
+
+- Levels: LOG_LEVEL for the root logger, LOG_LEVELS for per-logger
+  overrides, e.g. "app.auth=DEBUG,app.directory=WARNING,uvicorn.access=WARNING".
+- Lazy formatting: log with %-style arguments; the message is only
+  rendered on the listener thread, and only for records that pass.
+- Rate limits: records at or below LOG_RATE_LIMIT_LEVEL are capped at
+  LOG_RATE_LIMIT per second per call site; the next record that gets
+  through carries a `suppressed` count. LOG_DEBUG_SAMPLE_RATE samples
+  DEBUG records on top of that.
+- Redaction: values of LOG_REDACT_FIELDS passed via `extra=` are replaced
+  by a hash keyed with JWT_SECRET, so the same user can still be correlated
+  across lines. Without a secret the key is random per process: an unkeyed
+  hash of an account or phone number is easily brute-forced. Put sensitive
+  values in `extra`, never in the message.
+- A full queue drops records instead of blocking the caller.
+"""
+
+import atexit
+import hashlib
+import hmac
+import json
+import logging
+import queue
+import random
+import secrets
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from . import metrics
+from .config import get_settings
+
+settings = get_settings()
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+def _parse_levels(spec: str) -> dict:
+    levels = {}
+    for item in (spec or "").split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+# Redacted values only correlate within one process if this is random
+_redact_key = settings.jwt_secret.encode() if settings.jwt_secret else secrets.token_bytes(32)
+
+def redact(value) -> str:
+    digest = hmac.new(_redact_key, str(value).encode(), hashlib.sha256).hexdigest()
+    return f"<redacted:{digest[:10]}>"
+
+class JsonFormatter(logging.Formatter):
+    def __init__(self, redact_fields=()):
+        super().__init__()
+        self.redact_fields = frozenset(redact_fields)
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key in _RECORD_ATTRIBUTES or key.startswith("_"):
+                continue
+            entry[key] = redact(value) if key in self.redact_fields and value is not None else value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class TextFormatter(logging.Formatter):
+    def __init__(self, redact_fields=()):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+        self.redact_fields = frozenset(redact_fields)
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        extras = [
+            f"{key}={redact(value) if key in self.redact_fields and value is not None else value}"
+            for key, value in record.__dict__.items()
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_")
+        ]
+        return f"{line} [{' '.join(extras)}]" if extras else line
+
+class RateLimitFilter(logging.Filter):
+    """Caps low-severity records per call site per second, optionally sampling DEBUG."""
+
+    def __init__(self, per_second: float, max_level: int, debug_sample_rate: float = 1.0):
+        super().__init__()
+        self.per_second = per_second
+        self.max_level = max_level
+        self.debug_sample_rate = debug_sample_rate
+        self.suppressed = 0
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level:
+            return True
+        if record.levelno <= logging.DEBUG and self.debug_sample_rate < 1.0:
+            if random.random() >= self.debug_sample_rate:
+                return False
+        if self.per_second <= 0:
+            return True
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or record.created - window[0] >= 1.0:
+                dropped = window[2] if window else 0
+                self._windows[key] = [record.created, 1, 0]
+                if dropped:
+                    record.suppressed = dropped
+                return True
+            if window[1] < self.per_second:
+                window[1] += 1
+                return True
+            window[2] += 1
+            self.suppressed += 1
+            return False
+
+class NonBlockingQueueHandler(QueueHandler):
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The listener is in-process: hand the record over unformatted
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+_listener = None
+_handler = None
+_rate_limit = None
+_configure_lock = threading.Lock()
+
+def configure_logging():
+    """Install the queue handler on the root logger; safe to call more than once."""
+    global _listener, _handler, _rate_limit
+    with _configure_lock:
+        if _listener is not None:
+            return
+        redact_fields = [field.strip() for field in settings.log_redact_fields.split(",") if field.strip()]
+        formatter = JsonFormatter(redact_fields) if settings.log_format == "json" else TextFormatter(redact_fields)
+        output = logging.StreamHandler(sys.stderr)
+        output.setFormatter(formatter)
+
+        _handler = NonBlockingQueueHandler(queue.Queue(maxsize=settings.log_queue_size))
+        _rate_limit = RateLimitFilter(
+            settings.log_rate_limit,
+            logging.getLevelName(settings.log_rate_limit_level.upper()),
+            settings.log_debug_sample_rate,
+        )
+        _handler.addFilter(_rate_limit)
+
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(_handler)
+        root.setLevel(settings.log_level.upper())
+        for name, level in _parse_levels(settings.log_levels).items():
+            logging.getLogger(name).setLevel(level)
+
+        _listener = QueueListener(_handler.queue, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+        if not settings.jwt_secret:
+            logging.getLogger(__name__).warning(
+                "JWT_SECRET is not set; redacted log fields use a random key and won't match across processes"
+            )
+
+def stop_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+            logging.getLogger().removeHandler(_handler)
+
+def _collect_logging_metrics():
+    if _handler is None:
+        return []
+    return [
+        ("log_records_dropped_total", "Log records dropped because the queue was full", "counter", (),
+         {(): _handler.dropped}),
+        ("log_records_rate_limited_total", "Log records suppressed by the per-call-site rate limit", "counter", (),
+         {(): _rate_limit.suppressed}),
+        ("log_queue_depth", "Log records waiting for the writer thread", "gauge", (),
+         {(): _handler.queue.qsize()}),
+    ]
+
+metrics.register_collector(_collect_logging_metrics)
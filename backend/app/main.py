@@ -1,13 +1,27 @@
 from fastapi import FastAPI, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
-from .auth import verify_ldap_credentials, create_access_token
+from .auth import authenticate_user, create_access_token, revoke_token, oauth2_scheme
 from .routers.registrations import router as registrations_router
-from .database import init_db
+from .routers.branches import router as branches_router
+from .routers.issuers import router as issuers_router
+from .database import init_db, close_pool
+from .async_db import AsyncDB
+from .registration_cache import load_registered_accounts, keep_fresh
+from .idempotency import keep_purged as keep_idempotency_keys_purged
+from .directory import directory_index
+from .core_banking import account_lookup
+from . import metrics, workers
+from .logging_config import configure_logging, stop_logging
+from .config import get_settings
+import asyncio
 import logging
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
+settings = get_settings()
+
+configure_logging()
 logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Bank Statement Registration API")
@@ -15,39 +29,77 @@ app = FastAPI(title="Bank Statement Registration API")
 # Initialize database on startup
 @app.on_event("startup")
 async def startup_event():
-    init_db()
+    # Migrations run in the first worker only when there are several
+    workers.start(init_db)
+    # Warm the verify Bloom filter in the background; verify falls back to the DB until then
+    app.state.bloom_loader = asyncio.ensure_future(AsyncDB().run(load_registered_accounts))
+    app.state.bloom_refresher = asyncio.ensure_future(keep_fresh(AsyncDB()))
+    app.state.idempotency_purge = asyncio.ensure_future(keep_idempotency_keys_purged(AsyncDB()))
+    if settings.ad_index_enabled:
+        directory_index.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    app.state.bloom_refresher.cancel()
+    app.state.idempotency_purge.cancel()
+    directory_index.stop()
+    account_lookup.close()
+    workers.stop()
+    close_pool()
+    stop_logging()
 
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
-    llow_origins=["*"],
+    allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
     expose_headers=["*"]
 )
 
+if settings.metrics_enabled:
+    app.add_middleware(metrics.MetricsMiddleware)
+
 # Include routers
 app.include_router(registrations_router)
+app.include_router(branches_router)
+app.include_router(issuers_router)
 
 @app.post("/token")
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    logger.debug(f"Login attempt for user: {form_data.username}")
+    logger.debug("Login attempt", extra={"username": form_data.username})
     
-    if not verify_ldap_credentials(form_data.username, form_data.password):
-        logger.error(f"Authentication failed for user: {form_data.username}")
+    # LDAP binds block; keep them off the event loop
+    username = await run_in_threadpool(authenticate_user, form_data.username, form_data.password)
+    if username is None:
+        logger.warning("Authentication failed", extra={"username": form_data.username})
         raise HTTPException(
             status_code=401,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    logger.debug(f"Authentication successful for user: {form_data.username}")
-    access_token = create_access_token(data={"sub": form_data.username})
+    logger.debug("Authentication successful", extra={"username": form_data.username})
+    # One name per account, whatever form it was typed in, so revocations match
+    access_token = create_access_token(data={"sub": username})
     return {"access_token": access_token, "token_type": "bearer"}
 
+@app.post("/logout")
+async def logout(token: str = Depends(oauth2_scheme)):
+    revoke_token(token)
+    return {"message": "Logged out"}
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 async def root():
     return {"message": "Bank Statement Registration API"}
 
-# python -m uvicorn app.main:app --host 0.0.0.0 --port 9000
\ No newline at end of file
+# python -m uvicorn app.main:app --host 0.0.0.0 --port 9000
+# Several workers on one host, see app/workers.py:
+# WORKERS=4 python -m app.serve --host 0.0.0.0 --port 9000
\ No newline at end of file
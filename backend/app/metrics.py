@@ -0,0 +1,311 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+`MetricsMiddleware` records per-route request latency, status counts and
+in-flight gauges, plus how many queries each request sent and how long
+it spent in them. database.py (pool acquire/connect, statement timing)
+and auth.py (LDAP binds and searches, token checks) report into the same
+registry through the `observe_*` hooks.
+Everything is served at GET /metrics.
+
+With METRICS_ENABLED=false the middleware is not installed and every hook
+returns on its first line.
+"""
+
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from .config import get_settings
+
+settings = get_settings()
+
+enabled = settings.metrics_enabled
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"
+            for labels, value in items
+        ]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, *labels, value: float):
+        with self._lock:
+            self._values[labels] = value
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels):
+        # Non-cumulative counts per bucket; render() accumulates them
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        with self._lock:
+            items = sorted((labels, (list(s[0]), s[1], s[2])) for labels, s in self._values.items())
+        lines = self.header()
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {count}")
+        return lines
+
+http_requests = Counter(
+    "http_requests_total", "HTTP requests by route and status", ("method", "route", "status")
+)
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route")
+)
+http_requests_in_flight = Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served", ("method",)
+)
+db_queries_per_request = Histogram(
+    "db_queries_per_request", "SQL statements sent per HTTP request", ("method", "route"), buckets=COUNT_BUCKETS
+)
+db_time_per_request = Histogram(
+    "db_query_seconds_per_request", "Time spent in SQL statements per HTTP request", ("method", "route")
+)
+db_query_duration = Histogram(
+    "db_query_duration_seconds", "SQL statement latency by statement type", ("statement",)
+)
+db_acquire_duration = Histogram(
+    "db_pool_acquire_seconds", "Time to lease a pooled connection, including any connect"
+)
+db_connect_duration = Histogram(
+    "db_connect_seconds", "Time to open a new database connection"
+)
+db_errors = Counter("db_query_errors_total", "SQL statements that raised", ("statement",))
+ldap_duration = Histogram(
+    "ldap_operation_seconds", "LDAP bind and search latency by operation and outcome", ("operation", "outcome")
+)
+token_verifications = Counter(
+    "auth_token_verifications_total", "Bearer token checks by verified-token cache result", ("cache",)
+)
+token_decode_duration = Histogram(
+    "auth_token_decode_seconds", "JWT signature and claims verification time on cache misses"
+)
+core_banking_lookups = Counter(
+    "core_banking_lookups_total", "Account detail lookups by where the answer came from", ("source",)
+)
+core_banking_call_duration = Histogram(
+    "core_banking_call_seconds", "Core-banking batch calls by outcome, including queueing", ("outcome",)
+)
+core_banking_batch_size = Histogram(
+    "core_banking_batch_size", "Accounts per core-banking call", buckets=COUNT_BUCKETS
+)
+
+REGISTRY = [
+    http_requests, http_request_duration, http_requests_in_flight,
+    db_queries_per_request, db_time_per_request, db_query_duration,
+    db_acquire_duration, db_connect_duration, db_errors,
+    ldap_duration, token_verifications, token_decode_duration,
+    core_banking_lookups, core_banking_call_duration, core_banking_batch_size,
+]
+
+# Called at scrape time; each returns [(name, help, kind, label_names, {labels: value})]
+_collectors = []
+
+def register_collector(collect):
+    _collectors.append(collect)
+
+class RequestStats:
+    __slots__ = ("queries", "query_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+
+_request_stats = contextvars.ContextVar("request_stats", default=None)
+
+def _statement_type(sql: str) -> str:
+    words = sql.split(None, 1)
+    return words[0].upper() if words else ""
+
+def observe_query(sql: str, seconds: float, failed: bool = False):
+    if not enabled:
+        return
+    statement = _statement_type(sql)
+    db_query_duration.observe(seconds, statement)
+    if failed:
+        db_errors.inc(statement)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.query_seconds += seconds
+
+def observe_acquire(seconds: float):
+    if enabled:
+        db_acquire_duration.observe(seconds)
+
+def observe_connect(seconds: float):
+    if enabled:
+        db_connect_duration.observe(seconds)
+
+def observe_ldap(operation: str, seconds: float, outcome: str):
+    if enabled:
+        ldap_duration.observe(seconds, operation, outcome)
+
+def observe_token(cache_hit: bool, decode_seconds: float = None):
+    if not enabled:
+        return
+    token_verifications.inc("hit" if cache_hit else "miss")
+    if decode_seconds is not None:
+        token_decode_duration.observe(decode_seconds)
+
+def observe_core_banking_lookup(source: str):
+    if enabled:
+        core_banking_lookups.inc(source)
+
+def observe_core_banking_call(outcome: str, batch_size: int, seconds: float):
+    if enabled:
+        core_banking_call_duration.observe(seconds, outcome)
+        core_banking_batch_size.observe(batch_size)
+
+class InstrumentedCursor:
+    """Cursor proxy timing each execute(); only handed out while metrics are enabled."""
+
+    __slots__ = ("_cursor",)
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        # Driver flags such as pyodbc's fast_executemany belong on the real cursor
+        if name == "_cursor":
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._cursor, name, value)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def _timed(self, method, sql, *args):
+        started = time.perf_counter()
+        try:
+            result = method(sql, *args)
+        except BaseException:
+            observe_query(sql, time.perf_counter() - started, failed=True)
+            raise
+        observe_query(sql, time.perf_counter() - started)
+        # sqlite3 returns the cursor itself; keep callers on the proxy
+        return self if result is self._cursor else result
+
+    def execute(self, sql, *args):
+        return self._timed(self._cursor.execute, sql, *args)
+
+    def executemany(self, sql, *args):
+        return self._timed(self._cursor.executemany, sql, *args)
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so streamed responses are timed to their last byte."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        # The route is only known after routing, so in-flight is tracked per method
+        http_requests_in_flight.inc(method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_flight.dec(method)
+            _request_stats.reset(token)
+            route = scope.get("route")
+            # Templates, not raw paths, keep label cardinality bounded
+            route = getattr(route, "path", None) or "unmatched"
+            http_requests.inc(method, route, str(status["code"]))
+            http_request_duration.observe(elapsed, method, route)
+            db_queries_per_request.observe(stats.queries, method, route)
+            db_time_per_request.observe(stats.query_seconds, method, route)
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    for collect in _collectors:
+        for name, help_text, kind, label_names, values in collect():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(values.items()):
+                lines.append(f"{name}{_format_labels(label_names, labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
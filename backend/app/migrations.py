@@ -0,0 +1,492 @@
+"""
+Versioned schema migrations.
+
+Each migration runs once, in its own transaction, and is recorded in
+`schema_migrations`. Workers that start together serialise on a lock
+(sp_getapplock on SQL Server, the database write lock on SQLite) and
+re-check the applied versions once they hold it, so only one of them
+applies any given migration.
+
+    python -m app.migrations migrate   apply pending migrations
+    python -m app.migrations status    list applied and pending versions
+    python -m app.migrations check     report router queries no index covers
+
+The indexes in migrations 3-5 follow the query shapes in query_shapes(); when
+a router query changes, update the shape there and run `check`.
+"""
+
+import sys
+import logging
+import xml.etree.ElementTree as ElementTree
+from contextlib import contextmanager
+from datetime import datetime
+from .config import get_settings
+from .database import get_db_connection, is_sqlite
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+class Migration:
+    def __init__(self, version: int, description: str, mssql, sqlite, after=None):
+        self.version = version
+        self.description = description
+        self.mssql = mssql
+        self.sqlite = sqlite
+        # Runs after the migration commits, e.g. to backfill derived data
+        self.after = after
+
+    def statements(self):
+        return self.sqlite if is_sqlite() else self.mssql
+
+def _rebuild_counters(conn):
+    from .stats import rebuild_counters
+    rebuild_counters(conn)
+
+MIGRATIONS = [
+    Migration(
+        1, "registrations, counters and idempotency keys",
+        mssql=[
+            # Databases created by the old init_db already have some of these
+            """
+            IF OBJECT_ID('registrations', 'U') IS NULL
+            CREATE TABLE registrations (
+                id VARCHAR(36) PRIMARY KEY,
+                account_number VARCHAR(20) NOT NULL UNIQUE,
+                full_name VARCHAR(100) NOT NULL,
+                phone_number VARCHAR(20) NOT NULL,
+                email VARCHAR(100),
+                id_number VARCHAR(50),
+                registration_date DATETIME NOT NULL,
+                created_at DATETIME NOT NULL DEFAULT GETDATE(),
+                issued_by VARCHAR(100) NOT NULL,
+                is_issued BIT NOT NULL DEFAULT 0
+            )
+            """,
+            """
+            IF COL_LENGTH('registrations', 'is_issued') IS NULL
+            ALTER TABLE registrations ADD is_issued BIT NOT NULL
+                CONSTRAINT DF_registrations_is_issued DEFAULT 0 WITH VALUES
+            """,
+            """
+            IF OBJECT_ID('registration_counters', 'U') IS NULL
+            CREATE TABLE registration_counters (
+                counter_key VARCHAR(150) PRIMARY KEY,
+                counter_value BIGINT NOT NULL
+            )
+            """,
+            """
+            IF OBJECT_ID('idempotency_keys', 'U') IS NULL
+            CREATE TABLE idempotency_keys (
+                idempotency_key VARCHAR(100) NOT NULL,
+                issued_by VARCHAR(100) NOT NULL,
+                request_hash CHAR(64) NOT NULL,
+                response_body NVARCHAR(MAX) NOT NULL,
+                created_at DATETIME NOT NULL,
+                PRIMARY KEY (idempotency_key, issued_by)
+            )
+            """,
+        ],
+        sqlite=[
+            """
+            CREATE TABLE IF NOT EXISTS registrations (
+                id VARCHAR(36) PRIMARY KEY,
+                account_number VARCHAR(20) NOT NULL UNIQUE,
+                full_name VARCHAR(100) NOT NULL,
+                phone_number VARCHAR(20) NOT NULL,
+                email VARCHAR(100),
+                id_number VARCHAR(50),
+                registration_date DATETIME NOT NULL,
+                created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                issued_by VARCHAR(100) NOT NULL,
+                is_issued BIT NOT NULL DEFAULT 0
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS registration_counters (
+                counter_key VARCHAR(150) PRIMARY KEY,
+                counter_value BIGINT NOT NULL
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS idempotency_keys (
+                idempotency_key VARCHAR(100) NOT NULL,
+                issued_by VARCHAR(100) NOT NULL,
+                request_hash CHAR(64) NOT NULL,
+                response_body TEXT NOT NULL,
+                created_at DATETIME NOT NULL,
+                PRIMARY KEY (idempotency_key, issued_by)
+            )
+            """,
+        ],
+        # Counters may predate this migration or be missing entirely
+        after=_rebuild_counters,
+    ),
+    Migration(
+        2, "branches and issuers",
+        mssql=[
+            """
+            IF OBJECT_ID('branches', 'U') IS NULL
+            CREATE TABLE branches (
+                id VARCHAR(36) PRIMARY KEY,
+                code VARCHAR(20) NOT NULL UNIQUE,
+                name VARCHAR(100) NOT NULL,
+                created_at DATETIME NOT NULL DEFAULT GETDATE()
+            )
+            """,
+            """
+            IF OBJECT_ID('issuers', 'U') IS NULL
+            CREATE TABLE issuers (
+                id VARCHAR(36) PRIMARY KEY,
+                name VARCHAR(100) NOT NULL,
+                branch_id VARCHAR(36) NOT NULL REFERENCES branches(id),
+                created_at DATETIME NOT NULL DEFAULT GETDATE(),
+                active BIT NOT NULL DEFAULT 1
+            )
+            """,
+        ],
+        sqlite=[
+            """
+            CREATE TABLE IF NOT EXISTS branches (
+                id VARCHAR(36) PRIMARY KEY,
+                code VARCHAR(20) NOT NULL UNIQUE,
+                name VARCHAR(100) NOT NULL,
+                created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS issuers (
+                id VARCHAR(36) PRIMARY KEY,
+                name VARCHAR(100) NOT NULL,
+                branch_id VARCHAR(36) NOT NULL REFERENCES branches(id),
+                created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                active BIT NOT NULL DEFAULT 1
+            )
+            """,
+        ],
+    ),
+    Migration(
+        3, "indexes for the router queries",
+        # Every insert and issue maintains each of these, so they carry only
+        # what the queries seek or filter on. Pages, bounded prefix sorts,
+        # verify and exports fetch the rest of the row by key (_ROW_LOOKUPS);
+        # verify and the register upsert seek the UNIQUE constraint's index
+        mssql=[
+            # GET /api/registrations: keyset over (registration_date, id) newest first;
+            # issued_only reads it in order too since nearly every row is issued.
+            # The broad-prefix scan filters on account_number and full_name as it walks the dates
+            """
+            CREATE INDEX IX_registrations_date_id ON registrations (registration_date DESC, id DESC)
+                INCLUDE (account_number, full_name, is_issued)
+            """,
+            # Pending rows are few: a filtered index keeps that listing off the big one
+            """
+            CREATE INDEX IX_registrations_pending ON registrations (registration_date DESC, id DESC)
+                WHERE is_issued = 0
+            """,
+            "CREATE INDEX IX_issuers_branch ON issuers (branch_id) INCLUDE (name, created_at, active)",
+            "CREATE INDEX IX_issuers_created ON issuers (created_at DESC) INCLUDE (name, branch_id, active)",
+            "CREATE INDEX IX_issuers_name ON issuers (name) INCLUDE (branch_id, active)",
+            "CREATE INDEX IX_branches_created ON branches (created_at DESC) INCLUDE (code, name)",
+            "CREATE INDEX IX_idempotency_keys_created ON idempotency_keys (created_at)",
+        ],
+        # SQLite has no INCLUDE; trailing key columns make the same indexes covering.
+        # Its indexes also don't carry a TEXT primary key the way SQL Server's carry
+        # the clustered key, so id is listed where queries return it
+        sqlite=[
+            """
+            CREATE INDEX IF NOT EXISTS IX_registrations_date_id
+                ON registrations (registration_date DESC, id DESC, account_number, full_name, is_issued)
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS IX_registrations_pending ON registrations (registration_date DESC, id DESC)
+                WHERE is_issued = 0
+            """,
+            "CREATE INDEX IF NOT EXISTS IX_issuers_branch ON issuers (branch_id, name, created_at, active)",
+            "CREATE INDEX IF NOT EXISTS IX_issuers_created ON issuers (created_at DESC, name, branch_id, active, id)",
+            "CREATE INDEX IF NOT EXISTS IX_issuers_name ON issuers (name, branch_id, active, id)",
+            "CREATE INDEX IF NOT EXISTS IX_branches_created ON branches (created_at DESC, code, name, id)",
+            "CREATE INDEX IF NOT EXISTS IX_idempotency_keys_created ON idempotency_keys (created_at)",
+        ],
+    ),
+    Migration(
+        4, "per-issuer registrations in date order",
+        # GET /api/registrations/export?issued_by=...: one issuer's rows oldest
+        # first, with any status, without a sort. Also serves the per-issuer
+        # status counts and the counter rebuild's grouping
+        mssql=[
+            """
+            CREATE INDEX IX_registrations_issuer_date ON registrations (issued_by, registration_date, id)
+                INCLUDE (is_issued)
+            """,
+        ],
+        sqlite=[
+            """
+            CREATE INDEX IF NOT EXISTS IX_registrations_issuer_date
+                ON registrations (issued_by, registration_date, id, is_issued)
+            """,
+        ],
+    ),
+    Migration(
+        5, "name prefix search",
+        # GET /api/registrations?name=...: a prefix range, so the index has to
+        # lead with the name. account_prefix ranges seek the UNIQUE
+        # constraint's index on account_number
+        mssql=[
+            "CREATE INDEX IX_registrations_name ON registrations (full_name)",
+        ],
+        # LIKE only seeks a NOCASE index in SQLite, since LIKE ignores case there
+        sqlite=[
+            "CREATE INDEX IF NOT EXISTS IX_registrations_name ON registrations (full_name COLLATE NOCASE)",
+        ],
+    ),
+]
+
+def _ensure_version_table(cursor):
+    if is_sqlite():
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                description VARCHAR(200) NOT NULL,
+                applied_at DATETIME NOT NULL
+            )
+        """)
+    else:
+        cursor.execute("""
+            IF OBJECT_ID('schema_migrations', 'U') IS NULL
+            CREATE TABLE schema_migrations (
+                version INT PRIMARY KEY,
+                description VARCHAR(200) NOT NULL,
+                applied_at DATETIME NOT NULL
+            )
+        """)
+
+def applied_versions(cursor) -> set:
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+@contextmanager
+def _migration_lock(conn, cursor):
+    """Hold the cross-worker migration lock for the whole run."""
+    timeout = settings.migration_lock_timeout
+    if is_sqlite():
+        # Each migration takes the write lock itself; just wait longer for it
+        cursor.execute(f"PRAGMA busy_timeout={int(timeout * 1000)}")
+        try:
+            yield
+        finally:
+            cursor.execute("PRAGMA busy_timeout=5000")
+        return
+
+    cursor.execute("""
+        SET NOCOUNT ON;
+        DECLARE @result INT;
+        EXEC @result = sp_getapplock
+            @Resource = 'schema_migrations', @LockMode = 'Exclusive',
+            @LockOwner = 'Session', @LockTimeout = ?;
+        SELECT @result;
+        SET NOCOUNT OFF;
+    """, (int(timeout * 1000),))
+    result = cursor.fetchone()[0]
+    if result < 0:
+        raise RuntimeError(f"Could not take the migration lock (sp_getapplock returned {result})")
+    try:
+        yield
+    finally:
+        cursor.execute("EXEC sp_releaseapplock @Resource = 'schema_migrations', @LockOwner = 'Session'")
+        conn.commit()
+
+def _apply(conn, cursor, migration: Migration) -> bool:
+    if is_sqlite():
+        conn.rollback()
+        cursor.execute("BEGIN IMMEDIATE")
+    # Another worker may have applied it while we waited for the lock
+    if migration.version in applied_versions(cursor):
+        conn.rollback()
+        return False
+
+    started = datetime.now()
+    for statement in migration.statements():
+        cursor.execute(statement)
+    cursor.execute(
+        "INSERT INTO schema_migrations (version, description, applied_at) VALUES (?, ?, ?)",
+        (migration.version, migration.description, datetime.now())
+    )
+    conn.commit()
+    logger.info(
+        "Applied migration %d (%s) in %.1fs",
+        migration.version, migration.description, (datetime.now() - started).total_seconds()
+    )
+    if migration.after:
+        migration.after(conn)
+    return True
+
+def migrate(conn) -> list:
+    """Apply every pending migration; returns the versions this call applied."""
+    cursor = conn.cursor()
+    try:
+        with _migration_lock(conn, cursor):
+            _ensure_version_table(cursor)
+            conn.commit()
+            pending = [m for m in MIGRATIONS if m.version not in applied_versions(cursor)]
+            conn.rollback()
+            return [m.version for m in pending if _apply(conn, cursor, m)]
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def query_shapes():
+    """(name, sql, params) for every hot query the routers issue."""
+    from .routers.registrations import (
+        REGISTRATION_COLUMNS, RegistrationFilters, _count_query, _encode_cursor, _export_query,
+        _registrations_query,
+    )
+    from .reference_data import BRANCH_COLUMNS, ISSUER_COLUMNS
+    from .stats import STATS_COUNTERS_SQL
+
+    now = datetime.now()
+    broad_prefix = RegistrationFilters(account_prefix="1")
+    broad_prefix.scan_by_date = True
+    after = _encode_cursor(now, "00000000-0000-0000-0000-000000000000")
+    return [
+        ("registrations: first page", *_registrations_query(RegistrationFilters(), None, 101)),
+        ("registrations: next page", *_registrations_query(RegistrationFilters(), after, 101)),
+        ("registrations: issued only", *_registrations_query(RegistrationFilters(status="issued"), after, 101)),
+        ("registrations: by issuer", *_registrations_query(RegistrationFilters(issued_by="user"), after, 101)),
+        ("registrations: account prefix",
+         *_registrations_query(RegistrationFilters(account_prefix="1000"), None, 101)),
+        ("registrations: name prefix", *_registrations_query(RegistrationFilters(name="jo"), None, 101)),
+        ("registrations: broad prefix", *_registrations_query(broad_prefix, None, 101)),
+        ("registrations: filtered count",
+         *_count_query(RegistrationFilters(issued_by="user", status="pending"), 10001)),
+        ("registrations: pending", f"""
+            SELECT {REGISTRATION_COLUMNS} FROM registrations
+            WHERE is_issued = 0
+            ORDER BY registration_date DESC, id DESC
+        """, ()),
+        ("export: date range", *_export_query(RegistrationFilters(date_from=now.date(), date_to=now.date()))),
+        ("export: issuer", *_export_query(RegistrationFilters(issued_by="user", status="issued"))),
+        ("verify account", """
+            SELECT full_name, phone_number, registration_date, is_issued
+            FROM registrations WHERE account_number = ?
+        """, ("0000000000",)),
+        ("stats counters", STATS_COUNTERS_SQL, ("day:2000-01-01",)),
+        ("reference data: branches", f"SELECT {BRANCH_COLUMNS} FROM branches ORDER BY created_at DESC", ()),
+        ("reference data: issuers", f"SELECT {ISSUER_COLUMNS} FROM issuers ORDER BY created_at DESC", ()),
+        ("idempotency purge", "DELETE FROM idempotency_keys WHERE created_at < ?", (now,)),
+    ]
+
+# Prefix searches only sort up to REGISTRATIONS_SORT_LIMIT rows; past that
+# they read the date index instead (registrations: broad prefix)
+_BOUNDED_SORTS = {"registrations: account prefix", "registrations: name prefix"}
+
+# Queries that fetch the rest of the row by key: at most a page, a bounded
+# sort or one account, or an export, which reads every row it returns once.
+# Covering them would copy most of the row into each index (see migration 3)
+_ROW_LOOKUPS = {
+    "registrations: first page", "registrations: next page", "registrations: issued only",
+    "registrations: by issuer", "registrations: account prefix", "registrations: name prefix",
+    "registrations: broad prefix", "registrations: pending", "export: date range", "export: issuer",
+    "verify account",
+}
+
+def _sqlite_plan_problems(cursor, sql: str, params) -> list:
+    cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+    # Writes touch the table row anyway; only reads should stay inside the index
+    is_read = sql.lstrip().upper().startswith("SELECT")
+    problems = []
+    for row in cursor.fetchall():
+        detail = row[-1]
+        if detail.startswith("SCAN (subquery"):
+            # Reading a subquery's own rows, e.g. the capped COUNT(*)
+            continue
+        if detail.startswith("SCAN") and "INDEX" not in detail and "CONSTANT ROW" not in detail:
+            problems.append(f"full scan ({detail})")
+        elif "TEMP B-TREE" in detail:
+            problems.append(f"sort ({detail})")
+        elif is_read and "USING INDEX" in detail and "sqlite_autoindex" not in detail:
+            problems.append(f"index without covering columns ({detail})")
+    return problems
+
+_SHOWPLAN_NS = "{http://schemas.microsoft.com/sqlserver/2004/07/showplan}"
+_MSSQL_PROBLEM_OPS = {
+    "Table Scan": "full scan",
+    "Clustered Index Scan": "full scan",
+    "Key Lookup": "index without covering columns",
+    "RID Lookup": "index without covering columns",
+    "Sort": "sort",
+}
+
+def _mssql_plan_problems(cursor, sql: str, params) -> list:
+    cursor.execute("SET SHOWPLAN_XML ON")
+    try:
+        cursor.execute(sql, params)
+        plan = cursor.fetchone()[0]
+    finally:
+        cursor.execute("SET SHOWPLAN_XML OFF")
+    problems = []
+    for relop in ElementTree.fromstring(plan).iter(f"{_SHOWPLAN_NS}RelOp"):
+        op = relop.get("PhysicalOp")
+        if op in _MSSQL_PROBLEM_OPS:
+            target = relop.find(f".//{_SHOWPLAN_NS}Object")
+            table = target.get("Table") if target is not None else ""
+            problems.append(f"{_MSSQL_PROBLEM_OPS[op]} ({op} {table})".rstrip())
+    return problems
+
+def check(conn) -> dict:
+    """Plan every query in query_shapes() and return {name: [problems]} for the uncovered ones."""
+    cursor = conn.cursor()
+    plan_problems = _sqlite_plan_problems if is_sqlite() else _mssql_plan_problems
+    uncovered = {}
+    try:
+        for name, sql, params in query_shapes():
+            problems = plan_problems(cursor, sql, params)
+            if name in _BOUNDED_SORTS:
+                problems = [problem for problem in problems if not problem.startswith("sort")]
+            if name in _ROW_LOOKUPS:
+                problems = [problem for problem in problems if not problem.startswith("index without")]
+            if problems:
+                uncovered[name] = problems
+        return uncovered
+    finally:
+        conn.rollback()
+        cursor.close()
+
+def main(argv):
+    command = argv[1] if len(argv) == 2 else None
+    if command not in ("migrate", "status", "check"):
+        print("usage: python -m app.migrations migrate|status|check")
+        return 2
+    logging.basicConfig(level=logging.INFO)
+    conn = get_db_connection()
+    try:
+        if command == "migrate":
+            applied = migrate(conn)
+            print(f"Applied migrations: {applied or 'none, schema is current'}")
+        elif command == "status":
+            cursor = conn.cursor()
+            try:
+                _ensure_version_table(cursor)
+                applied = applied_versions(cursor)
+            finally:
+                conn.rollback()
+                cursor.close()
+            for migration in MIGRATIONS:
+                state = "applied" if migration.version in applied else "pending"
+                print(f"{migration.version:>4}  {state:<8} {migration.description}")
+        else:
+            uncovered = check(conn)
+            for name, problems in uncovered.items():
+                print(f"{name}:")
+                for problem in problems:
+                    print(f"    {problem}")
+            print(f"{len(uncovered)} of {len(query_shapes())} queries not covered by an index")
+            return 1 if uncovered else 0
+    finally:
+        conn.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
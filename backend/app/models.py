@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
 from datetime import datetime
 
 class RegistrationCreate(BaseModel):
@@ -21,6 +21,88 @@ class RegistrationResponse(BaseModel):
     issued_by: Optional[str] = None
     is_issued: bool = False   
 
+class AccountDetails(BaseModel):
+    # As held by the core-banking system, see app.core_banking
+    full_name: str
+    phone_number: str
+
+class BulkRegistrationRow(BaseModel):
+    # Everything is optional here so a bad row is reported, not rejected with a 422
+    account_number: Optional[str] = None
+    full_name: Optional[str] = None
+    phone_number: Optional[str] = None
+    email: Optional[str] = None
+    id_number: Optional[str] = None
+
+class BulkRegistrationCreate(BaseModel):
+    registrations: List[BulkRegistrationRow]
+
+class BulkRegistrationResult(BaseModel):
+    row: int
+    account_number: str
+    status: str  # "created", "duplicate" or "error"
+    id: Optional[str] = None
+    detail: Optional[str] = None
+
+class BulkRegistrationResponse(BaseModel):
+    success: int
+    failed: int
+    results: List[BulkRegistrationResult]
+
+class IssueBatchRequest(BaseModel):
+    # Either list may be empty; entries are matched exactly
+    ids: List[str] = []
+    account_numbers: List[str] = []
+
+class IssueBatchResponse(BaseModel):
+    # Entries are echoed back as they were sent, ids and account numbers alike
+    issued: List[str]
+    already_issued: List[str]
+    not_found: List[str]
+
+class BranchCreate(BaseModel):
+    code: str = Field(..., min_length=1, max_length=20)
+    name: str = Field(..., min_length=1, max_length=100)
+
+class Branch(BaseModel):
+    id: str
+    code: str
+    name: str
+    created_at: datetime
+
+class BranchResponse(Branch):
+    pass
+
+class IssuerCreate(BaseModel):
+    # The issuer's AD username (sAMAccountName)
+    name: str = Field(..., min_length=1, max_length=100)
+    branch_id: str
+
+class IssuerBulkCreate(BaseModel):
+    issuers: List[IssuerCreate]
+
+class IssuerBulkResult(BaseModel):
+    name: str
+    # "created", "exists", "duplicate", "not_found" (in AD) or "invalid_branch"
+    status: str
+    id: Optional[str] = None
+    detail: Optional[str] = None
+
+class IssuerBulkResponse(BaseModel):
+    success: int
+    failed: int
+    results: List[IssuerBulkResult]
+
+class Issuer(BaseModel):
+    id: str
+    name: str
+    branch_id: str
+    created_at: datetime
+    active: bool = True
+
+class IssuerResponse(Issuer):
+    pass
+
 class ADUser(BaseModel):
     username: str
     display_name: str
@@ -0,0 +1,118 @@
+"""
+Read-through cache of the branches and issuers tables.
+
+Both tables are small and change only through the branch and issuer
+endpoints, so one immutable snapshot of each serves the list endpoints
+(pre-encoded, with their ETags) and O(1) lookups by id, code and username.
+
+The snapshot is stamped with the table versions from app.versions. The
+create, delete and toggle paths bump those after they commit, which
+invalidates it; the next read reloads both tables, once, however many
+requests are waiting. Changes made outside the API are picked up when the
+snapshot is REFERENCE_DATA_TTL seconds old.
+"""
+
+import threading
+import time
+import logging
+from typing import Optional
+from . import versions
+from .config import get_settings
+from .models import BranchResponse, IssuerResponse
+from .serialization import RowEncoder
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+BRANCH_COLUMNS = "id, code, name, created_at"
+ISSUER_COLUMNS = "id, name, branch_id, created_at, active"
+
+BRANCH_ENCODER = RowEncoder(BranchResponse, BRANCH_COLUMNS.split(","))
+ISSUER_ENCODER = RowEncoder(IssuerResponse, ISSUER_COLUMNS.split(","), {"active": bool})
+
+class ReferenceData:
+    """One consistent load of both tables and the indexes over them."""
+
+    def __init__(self, branch_rows, issuer_rows, branches_tag: str, issuers_tag: str):
+        self.loaded_at = time.monotonic()
+        self.branches_tag = branches_tag
+        self.issuers_tag = issuers_tag
+
+        self._branches = {row[0]: BranchResponse(**BRANCH_ENCODER.to_dict(row)) for row in branch_rows}
+        self._branch_codes = {branch.code: branch for branch in self._branches.values()}
+        # Like the list query's JOIN, issuers of a missing branch are left out
+        issuer_rows = [row for row in issuer_rows if row[2] in self._branches]
+        self._issuers = {row[0]: IssuerResponse(**ISSUER_ENCODER.to_dict(row)) for row in issuer_rows}
+        # Issuer names are AD usernames, which are case-insensitive
+        self._issuer_names = {issuer.name.lower(): issuer for issuer in self._issuers.values()}
+
+        self.branches_json = BRANCH_ENCODER.dumps(branch_rows)
+        self.issuers_json = ISSUER_ENCODER.dumps(issuer_rows)
+
+    def branch(self, branch_id: str) -> Optional[BranchResponse]:
+        return self._branches.get(branch_id)
+
+    def branch_by_code(self, code: str) -> Optional[BranchResponse]:
+        return self._branch_codes.get(code)
+
+    def issuer(self, issuer_id: str) -> Optional[IssuerResponse]:
+        return self._issuers.get(issuer_id)
+
+    def issuer_by_name(self, username: str) -> Optional[IssuerResponse]:
+        return self._issuer_names.get(username.lower())
+
+_snapshot = None
+_lock = threading.Lock()
+
+def _tags():
+    return versions.etag("branches"), versions.etag("issuers", "branches")
+
+def cached() -> Optional[ReferenceData]:
+    """The current snapshot, or None if it is stale and has to be loaded."""
+    snapshot = _snapshot
+    if snapshot is None or time.monotonic() - snapshot.loaded_at >= settings.reference_data_ttl:
+        return None
+    if (snapshot.branches_tag, snapshot.issuers_tag) != _tags():
+        return None
+    return snapshot
+
+def load(conn) -> ReferenceData:
+    """Load both tables; concurrent callers wait for one load instead of each running it."""
+    global _snapshot
+    with _lock:
+        snapshot = cached()
+        if snapshot is not None:
+            return snapshot
+
+        previous = _snapshot
+        # Tags first, see app/versions.py
+        branches_tag, issuers_tag = _tags()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"SELECT {BRANCH_COLUMNS} FROM branches ORDER BY created_at DESC")
+            branch_rows = cursor.fetchall()
+            cursor.execute(f"SELECT {ISSUER_COLUMNS} FROM issuers ORDER BY created_at DESC")
+            issuer_rows = cursor.fetchall()
+        finally:
+            cursor.close()
+        snapshot = ReferenceData(branch_rows, issuer_rows, branches_tag, issuers_tag)
+
+        if previous is not None and (previous.branches_tag, previous.issuers_tag) == (branches_tag, issuers_tag):
+            # Reloaded for age alone; if the data moved anyway it was changed
+            # behind the API's back, so move the ETags on too
+            changed = []
+            if snapshot.branches_json != previous.branches_json:
+                changed.append("branches")
+            if snapshot.issuers_json != previous.issuers_json:
+                changed.append("issuers")
+            if changed:
+                logger.info("Reference data changed outside the API: %s", ", ".join(changed))
+                versions.bump(*changed)
+                snapshot.branches_tag, snapshot.issuers_tag = _tags()
+
+        _snapshot = snapshot
+        return snapshot
+
+async def get(db) -> ReferenceData:
+    return cached() or await db.run(load)
@@ -0,0 +1,227 @@
+"""
+Cache of account registration status for the verify hot path.
+
+`verify_cache` holds recent lookups (including "not registered") with a
+TTL and LRU bound. `registered_accounts` is a Bloom filter of every
+registered account number: once loaded at startup, an account missing
+from it is definitely not registered and the DB is never asked. Write
+paths keep both up to date after they commit, and tell the other workers
+over the bus (app/bus.py) so their copies follow within milliseconds.
+
+The bus is best effort, so with several workers "not registered" answers
+are only trusted while the shared registrations version (app/versions.py)
+is the one the filter was last synced at. Write paths bump the version
+through `bump_version()`, which keeps the filter in sync across this
+worker's own writes as long as no other worker bumped in between. Once
+another worker has written, verify asks the DB until `keep_fresh()` has
+added the registrations since the last sync, every
+VERIFY_BLOOM_REFRESH_INTERVAL seconds. The filter is
+also rebuilt from scratch every VERIFY_BLOOM_REBUILD_INTERVAL seconds, so
+rows written outside the API are picked up in any mode.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from . import bus, versions
+from .cache import TTLCache, BloomFilter
+from .config import get_settings
+from .database import datetime_param
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+verify_cache = TTLCache(settings.verify_cache_size, settings.verify_cache_ttl)
+registered_accounts = BloomFilter(settings.verify_bloom_capacity, settings.verify_bloom_error_rate)
+
+_bloom_ready = False
+bloom_negatives = 0
+
+# Registrations version the filter holds everything up to, and when the
+# sync that established it started
+_bloom_version = None
+_bloom_synced_at = None
+# Filter being rebuilt; writes go into it as well until it replaces the old one
+_rebuilding = None
+
+# Bumped by every write so a read that raced a write never caches stale data
+_write_seq = 0
+_write_lock = threading.Lock()
+
+_MISSING = object()
+
+def _in_sync() -> bool:
+    """Whether a write on another worker could be missing from this one's filter and cache."""
+    return not versions.is_shared() or versions.current("registrations") == _bloom_version
+
+def lookup(account_number: str):
+    """
+    Return (found, registration, seq). registration is None for unregistered
+    accounts; pass seq back to store() after reading the DB on a miss.
+    """
+    global bloom_negatives
+    seq = _write_seq
+    registration = verify_cache.get(account_number, _MISSING)
+    if registration is not _MISSING and (registration is not None or _in_sync()):
+        return True, registration, seq
+    if _bloom_ready and account_number not in registered_accounts and _in_sync():
+        bloom_negatives += 1
+        return True, None, seq
+    return False, None, seq
+
+def _add(account_number: str):
+    # Under _write_lock, so a rebuild can't swap filters between the two adds
+    registered_accounts.add(account_number)
+    if _rebuilding is not None:
+        _rebuilding.add(account_number)
+
+def store(account_number: str, registration, seq: int):
+    """Cache a DB read, unless some write committed since lookup() handed out seq."""
+    with _write_lock:
+        if seq == _write_seq:
+            verify_cache.set(account_number, registration)
+
+# Account numbers per bus message, to stay well inside a datagram
+_BUS_CHUNK_SIZE = 1000
+
+def _share(key: str, account_numbers):
+    for start in range(0, len(account_numbers), _BUS_CHUNK_SIZE):
+        bus.publish("registration_cache", {key: account_numbers[start:start + _BUS_CHUNK_SIZE]})
+
+def remember(account_number: str, registration):
+    """Write-through after a committed registration."""
+    global _write_seq
+    with _write_lock:
+        _write_seq += 1
+        _add(account_number)
+        verify_cache.set(account_number, registration)
+    _share("registered", [account_number])
+
+def forget(account_number: str):
+    forget_all([account_number])
+
+def forget_all(account_numbers):
+    global _write_seq
+    account_numbers = list(account_numbers)
+    with _write_lock:
+        _write_seq += 1
+        for account_number in account_numbers:
+            verify_cache.invalidate(account_number)
+    _share("changed", account_numbers)
+
+def mark_registered(account_numbers):
+    global _write_seq
+    account_numbers = list(account_numbers)
+    with _write_lock:
+        _write_seq += 1
+        for account_number in account_numbers:
+            _add(account_number)
+            verify_cache.invalidate(account_number)
+    _share("registered", account_numbers)
+
+def bump_version():
+    """
+    versions.bump("registrations") for a write this worker has committed and
+    already applied here (remember, mark_registered, forget...). If the
+    filter was in sync just before, it still is.
+    """
+    global _bloom_version
+    with _write_lock:
+        version, = versions.bump("registrations")
+        if _bloom_version == version - 1:
+            _bloom_version = version
+
+def _on_bus_message(message: dict):
+    """Another worker committed writes to these accounts; drop what we hold."""
+    global _write_seq
+    with _write_lock:
+        _write_seq += 1
+        for account_number in message.get("registered", ()):
+            _add(account_number)
+            verify_cache.invalidate(account_number)
+        for account_number in message.get("changed", ()):
+            verify_cache.invalidate(account_number)
+
+bus.subscribe("registration_cache", _on_bus_message)
+
+def _read_accounts(cursor, into: BloomFilter):
+    while True:
+        rows = cursor.fetchmany(settings.db_fetch_batch_size)
+        if not rows:
+            return
+        with _write_lock:
+            for row in rows:
+                into.add(row[0])
+
+def load_registered_accounts(conn):
+    """Fill a new Bloom filter from the registrations table, then swap it in; at startup and every rebuild."""
+    global registered_accounts, _rebuilding, _bloom_ready, _bloom_version, _bloom_synced_at
+    # Version first, like the list ETags: a write that lands mid-scan only makes us resync
+    version = versions.current("registrations")
+    started = datetime.now()
+    accounts = BloomFilter(settings.verify_bloom_capacity, settings.verify_bloom_error_rate)
+    with _write_lock:
+        _rebuilding = accounts
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT account_number FROM registrations")
+        _read_accounts(cursor, accounts)
+        with _write_lock:
+            registered_accounts = accounts
+            _bloom_version, _bloom_synced_at = version, started
+        _bloom_ready = True
+        logger.info("Loaded %d account numbers into the verify Bloom filter", accounts.count)
+    finally:
+        with _write_lock:
+            _rebuilding = None
+        cursor.close()
+
+def refresh_registered_accounts(conn):
+    """Add registrations other workers committed since the last sync, if there were any."""
+    global _bloom_version, _bloom_synced_at
+    version = versions.current("registrations")
+    if version == _bloom_version:
+        return
+    started = datetime.now()
+    # Rows carry the time they were built, which can be a while before they committed
+    since = _bloom_synced_at - timedelta(seconds=settings.verify_bloom_refresh_overlap)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            f"SELECT account_number FROM registrations WHERE registration_date >= {datetime_param()}",
+            (since,)
+        )
+        _read_accounts(cursor, registered_accounts)
+    finally:
+        cursor.close()
+    with _write_lock:
+        _bloom_version, _bloom_synced_at = version, started
+
+async def keep_fresh(db):
+    """Keep the filter in sync for as long as the app runs; started after the first load."""
+    rebuilt_at = time.monotonic()
+    while True:
+        await asyncio.sleep(settings.verify_bloom_refresh_interval)
+        if not _bloom_ready:
+            continue
+        try:
+            if (settings.verify_bloom_rebuild_interval
+                    and time.monotonic() - rebuilt_at >= settings.verify_bloom_rebuild_interval):
+                rebuilt_at = time.monotonic()
+                await db.run(load_registered_accounts)
+            elif versions.is_shared():
+                await db.run(refresh_registered_accounts)
+        except Exception as e:
+            logger.warning("Verify Bloom filter sync failed: %s", e)
+
+def cache_stats() -> dict:
+    return {
+        **verify_cache.stats(),
+        "bloom_ready": _bloom_ready,
+        "bloom_negatives": bloom_negatives,
+        "bloom_in_sync": _in_sync(),
+        "bloom_inserts": registered_accounts.count,
+    }
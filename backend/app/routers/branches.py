@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
-from ..database import get_db_connection
+from fastapi import APIRouter, Depends, Header, HTTPException
+from typing import List, Optional
+from ..async_db import AsyncDB, get_async_db
+from ..serialization import JSONBytes
+from .. import reference_data, versions
 from ..models import Branch, BranchCreate, BranchResponse
 from ..auth import get_current_user
 import uuid
@@ -12,16 +14,20 @@ router = APIRouter(
 )
 
 @router.post("/", response_model=BranchResponse)
-async def create_branch(branch: BranchCreate, current_user: str = Depends(get_current_user)):
-    conn = get_db_connection()
+async def create_branch(
+    branch: BranchCreate,
+    current_user: str = Depends(get_current_user),
+    db: AsyncDB = Depends(get_async_db)
+):
+    # The UNIQUE constraint on code still guards against a concurrent create
+    if (await reference_data.get(db)).branch_by_code(branch.code):
+        raise HTTPException(status_code=400, detail="Branch code already exists")
+    return await db.run(_create_branch, branch)
+
+def _create_branch(conn, branch: BranchCreate):
     cursor = conn.cursor()
     
     try:
-        # Check if branch code already exists
-        cursor.execute("SELECT code FROM branches WHERE code = ?", branch.code)
-        if cursor.fetchone():
-            raise HTTPException(status_code=400, detail="Branch code already exists")
-        
         branch_id = str(uuid.uuid4())
         created_at = datetime.utcnow()
         
@@ -31,6 +37,7 @@ async def create_branch(branch: BranchCreate, current_user: str = Depends(get_cu
         """, (branch_id, branch.code, branch.name, created_at))
         
         conn.commit()
+        versions.bump("branches")
         
         return BranchResponse(
             id=branch_id,
@@ -38,47 +45,49 @@ async def create_branch(branch: BranchCreate, current_user: str = Depends(get_cu
             name=branch.name,
             created_at=created_at
         )
+    except HTTPException:
+        conn.rollback()
+        raise
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
 
 @router.get("/", response_model=List[BranchResponse])
-async def get_branches(current_user: str = Depends(get_current_user)):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute("SELECT id, code, name, created_at FROM branches ORDER BY created_at DESC")
-        branches = []
-        for row in cursor.fetchall():
-            branches.append(BranchResponse(
-                id=row[0],
-                code=row[1],
-                name=row[2],
-                created_at=row[3]
-            ))
-        return branches
-    finally:
-        cursor.close()
-        conn.close()
+async def get_branches(
+    if_none_match: Optional[str] = Header(None),
+    current_user: str = Depends(get_current_user),
+    db: AsyncDB = Depends(get_async_db)
+):
+    data = await reference_data.get(db)
+    if versions.matches(if_none_match, data.branches_tag):
+        return versions.not_modified(data.branches_tag)
+    return versions.tag_response(JSONBytes(data.branches_json), data.branches_tag)
 
 @router.delete("/{branch_id}")
-async def delete_branch(branch_id: str, current_user: str = Depends(get_current_user)):
-    conn = get_db_connection()
+async def delete_branch(
+    branch_id: str,
+    current_user: str = Depends(get_current_user),
+    db: AsyncDB = Depends(get_async_db)
+):
+    return await db.run(_delete_branch, branch_id)
+
+def _delete_branch(conn, branch_id: str):
     cursor = conn.cursor()
     
     try:
-        cursor.execute("DELETE FROM branches WHERE id = ?", branch_id)
+        cursor.execute("DELETE FROM branches WHERE id = ?", (branch_id,))
         if cursor.rowcount == 0:
             raise HTTPException(status_code=404, detail="Branch not found")
         conn.commit()
+        versions.bump("branches")
         return {"message": "Branch deleted successfully"}
+    except HTTPException:
+        conn.rollback()
+        raise
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
\ No newline at end of file
@@ -1,14 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from typing import List
-from ..database import get_db_connection
-from ..models import Issuer, IssuerCreate, IssuerResponse, ADUser
-from ..auth import get_current_user, get_ad_users
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Optional
+from ..async_db import AsyncDB, get_async_db
+from ..config import get_settings
+from ..database import is_sqlite
+from ..serialization import JSONBytes
+from .. import reference_data, versions
+from ..models import (
+    Issuer, IssuerCreate, IssuerResponse, ADUser,
+    IssuerBulkCreate, IssuerBulkResult, IssuerBulkResponse
+)
+from ..auth import get_current_user
+from ..directory import find_user, find_users, search_users
 import uuid
 from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
+settings = get_settings()
+
 router = APIRouter(
     prefix="/api/issuers",
     tags=["issuers"]
@@ -20,30 +31,36 @@ async def get_users_from_ad(
     current_user: str = Depends(get_current_user)
 ):
     try:
-        logger.debug(f"Searching AD users with term: {search}")
-        users = get_ad_users(search)
-        logger.debug(f"Found {len(users)} matching users")
+        logger.debug("Searching AD users", extra={"search_term": search})
+        users = await run_in_threadpool(search_users, search)
+        logger.debug("Found %d matching users", len(users))
         return users
     except Exception as e:
-        logger.error(f"Error fetching AD users: {str(e)}")
+        logger.error("Error fetching AD users: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/", response_model=IssuerResponse)
-async def create_issuer(issuer: IssuerCreate, current_user: str = Depends(get_current_user)):
-    conn = get_db_connection()
+async def create_issuer(
+    issuer: IssuerCreate,
+    current_user: str = Depends(get_current_user),
+    db: AsyncDB = Depends(get_async_db)
+):
+    data = await reference_data.get(db)
+    if data.branch(issuer.branch_id) is None:
+        raise HTTPException(status_code=400, detail="Branch not found")
+    if data.issuer_by_name(issuer.name) is not None:
+        raise HTTPException(status_code=400, detail="Issuer already exists")
+    # Exact username match, from the directory index when it has the user
+    user = await run_in_threadpool(find_user, issuer.name)
+    if user is None:
+        raise HTTPException(status_code=400, detail="User not found in Active Directory")
+    # Stored as AD spells it, whatever case was typed
+    return await db.run(_create_issuer, issuer.model_copy(update={"name": user.username}))
+
+def _create_issuer(conn, issuer: IssuerCreate):
     cursor = conn.cursor()
     
     try:
-        # Verify branch exists
-        cursor.execute("SELECT id FROM branches WHERE id = ?", issuer.branch_id)
-        if not cursor.fetchone():
-            raise HTTPException(status_code=400, detail="Branch not found")
-        
-        # Verify user exists in AD
-        ad_users = get_ad_users(issuer.name)
-        if not any(user.username == issuer.name for user in ad_users):
-            raise HTTPException(status_code=400, detail="User not found in Active Directory")
-        
         issuer_id = str(uuid.uuid4())
         created_at = datetime.utcnow()
         
@@ -53,6 +70,7 @@ async def create_issuer(issuer: IssuerCreate, current_user: str = Depends(get_cu
         """, (issuer_id, issuer.name, issuer.branch_id, created_at, True))
         
         conn.commit()
+        versions.bump("issuers")
         
         return IssuerResponse(
             id=issuer_id,
@@ -61,80 +79,161 @@ async def create_issuer(issuer: IssuerCreate, current_user: str = Depends(get_cu
             created_at=created_at,
             active=True
         )
+    except HTTPException:
+        conn.rollback()
+        raise
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
 
-@router.get("/", response_model=List[IssuerResponse])
-async def get_issuers(current_user: str = Depends(get_current_user)):
-    conn = get_db_connection()
+@router.post("/bulk", response_model=IssuerBulkResponse)
+async def create_issuers(
+    payload: IssuerBulkCreate,
+    current_user: str = Depends(get_current_user),
+    db: AsyncDB = Depends(get_async_db)
+):
+    """
+    Provision many issuers at once: branches and existing issuers are
+    checked against the reference-data cache, every username against AD in
+    one search, and the valid ones are inserted in one transaction.
+    """
+    if len(payload.issuers) > settings.issuer_bulk_max_size:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.issuer_bulk_max_size} issuers can be created per request"
+        )
+
+    data = await reference_data.get(db)
+    results = [None] * len(payload.issuers)
+    candidates = []
+    seen = set()
+    for index, issuer in enumerate(payload.issuers):
+        key = issuer.name.lower()
+        existing = data.issuer_by_name(issuer.name)
+        if key in seen:
+            results[index] = IssuerBulkResult(name=issuer.name, status="duplicate", detail="Repeated in this request")
+        elif data.branch(issuer.branch_id) is None:
+            results[index] = IssuerBulkResult(name=issuer.name, status="invalid_branch", detail="Branch not found")
+        elif existing is not None:
+            results[index] = IssuerBulkResult(
+                name=issuer.name, status="exists", id=existing.id, detail="Issuer already exists"
+            )
+        else:
+            candidates.append((index, issuer))
+        seen.add(key)
+
+    users = await run_in_threadpool(find_users, [issuer.name for _, issuer in candidates]) if candidates else {}
+    valid = []
+    for index, issuer in candidates:
+        user = users.get(issuer.name.lower())
+        if user is None:
+            results[index] = IssuerBulkResult(
+                name=issuer.name, status="not_found", detail="User not found in Active Directory"
+            )
+        else:
+            valid.append((index, issuer.model_copy(update={"name": user.username})))
+
+    if valid:
+        ids = await db.run(_create_issuers, [issuer for _, issuer in valid])
+        for (index, _), issuer_id in zip(valid, ids):
+            # Names are echoed as sent, though stored as AD spells them
+            results[index] = IssuerBulkResult(name=payload.issuers[index].name, status="created", id=issuer_id)
+
+    logger.info("Bulk issuer provisioning: %d of %d created", len(valid), len(payload.issuers))
+    return IssuerBulkResponse(success=len(valid), failed=len(results) - len(valid), results=results)
+
+def _create_issuers(conn, issuers: List[IssuerCreate]):
+    """Insert all of `issuers` in one executemany and one commit; returns their new ids in order."""
     cursor = conn.cursor()
-    
     try:
-        cursor.execute("""
-            SELECT i.id, i.name, i.branch_id, i.created_at, i.active 
-            FROM issuers i
-            JOIN branches b ON i.branch_id = b.id
-            ORDER BY i.created_at DESC
-        """)
-        
-        issuers = []
-        for row in cursor.fetchall():
-            issuers.append(IssuerResponse(
-                id=row[0],
-                name=row[1],
-                branch_id=row[2],
-                created_at=row[3],
-                active=row[4]
-            ))
-        return issuers
+        created_at = datetime.utcnow()
+        params = [(str(uuid.uuid4()), issuer.name, issuer.branch_id, created_at, True) for issuer in issuers]
+        if hasattr(cursor, "fast_executemany"):
+            # One round trip for the whole batch on SQL Server
+            cursor.fast_executemany = True
+        cursor.executemany("""
+            INSERT INTO issuers (id, name, branch_id, created_at, active)
+            VALUES (?, ?, ?, ?, ?)
+        """, params)
+        conn.commit()
+        versions.bump("issuers")
+        return [row[0] for row in params]
+    except Exception as e:
+        conn.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
+
+@router.get("/", response_model=List[IssuerResponse])
+async def get_issuers(
+    if_none_match: Optional[str] = Header(None),
+    current_user: str = Depends(get_current_user),
+    db: AsyncDB = Depends(get_async_db)
+):
+    data = await reference_data.get(db)
+    if versions.matches(if_none_match, data.issuers_tag):
+        return versions.not_modified(data.issuers_tag)
+    return versions.tag_response(JSONBytes(data.issuers_json), data.issuers_tag)
 
 @router.delete("/{issuer_id}")
-async def delete_issuer(issuer_id: str, current_user: str = Depends(get_current_user)):
-    conn = get_db_connection()
+async def delete_issuer(
+    issuer_id: str,
+    current_user: str = Depends(get_current_user),
+    db: AsyncDB = Depends(get_async_db)
+):
+    return await db.run(_delete_issuer, issuer_id)
+
+def _delete_issuer(conn, issuer_id: str):
     cursor = conn.cursor()
     
     try:
-        cursor.execute("DELETE FROM issuers WHERE id = ?", issuer_id)
+        cursor.execute("DELETE FROM issuers WHERE id = ?", (issuer_id,))
         if cursor.rowcount == 0:
             raise HTTPException(status_code=404, detail="Issuer not found")
         conn.commit()
+        versions.bump("issuers")
         return {"message": "Issuer deleted successfully"}
+    except HTTPException:
+        conn.rollback()
+        raise
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
 
 @router.put("/{issuer_id}/toggle-active")
-async def toggle_issuer_active(issuer_id: str, current_user: str = Depends(get_current_user)):
-    conn = get_db_connection()
+async def toggle_issuer_active(
+    issuer_id: str,
+    current_user: str = Depends(get_current_user),
+    db: AsyncDB = Depends(get_async_db)
+):
+    return await db.run(_toggle_issuer_active, issuer_id)
+
+def _toggle_issuer_active(conn, issuer_id: str):
     cursor = conn.cursor()
     
     try:
-        cursor.execute("""
-            UPDATE issuers 
-            SET active = ~active 
-            OUTPUT inserted.active
-            WHERE id = ?
-        """, issuer_id)
+        if is_sqlite():
+            query = "UPDATE issuers SET active = 1 - active WHERE id = ? RETURNING active"
+        else:
+            query = "UPDATE issuers SET active = ~active OUTPUT inserted.active WHERE id = ?"
+        cursor.execute(query, (issuer_id,))
         
         result = cursor.fetchone()
         if not result:
             raise HTTPException(status_code=404, detail="Issuer not found")
             
         conn.commit()
+        versions.bump("issuers")
         return {"active": bool(result[0])}
+    except HTTPException:
+        conn.rollback()
+        raise
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        cursor.close()
-        conn.close()
\ No newline at end of file
+        cursor.close()
\ No newline at end of file
@@ -1,14 +1,47 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from typing import List, Optional  
-from ..database import get_db_connection
-from ..models import RegistrationCreate, RegistrationResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from typing import List, Literal, Optional
+from ..async_db import AsyncDB, get_async_db
+from ..config import get_settings
+from ..core_banking import account_lookup
+from ..database import limit_clause, datetime_param, is_sqlite
+from .. import events, exports, idempotency, registration_cache, versions
+from ..bulk import LOOKUP_CHUNK_SIZE, _chunks, register_chunk, summarize
+from ..serialization import JSONBytes, RowEncoder
+from ..stats import bump, counted_total, read_stats, registration_deltas
+from ..uploads import SUPPORTED_EXTENSIONS, store_upload, create_job, get_job, process_upload
+from ..models import (
+    RegistrationCreate, RegistrationResponse,
+    BulkRegistrationCreate, BulkRegistrationResponse,
+    IssueBatchRequest, IssueBatchResponse
+)
 from ..auth import get_current_user
+import asyncio
+import base64
+import json
 import uuid
-from datetime import datetime
+import os
+from datetime import date, datetime, time, timedelta
 import logging
 
 logger = logging.getLogger(__name__)
 
+settings = get_settings()
+
+REGISTRATION_COLUMNS = """
+    id, account_number, full_name, phone_number,
+    email, id_number, registration_date, created_at,
+    issued_by, is_issued
+"""
+
+# Rows in REGISTRATION_COLUMNS order straight to RegistrationResponse JSON
+REGISTRATION_ENCODER = RowEncoder(RegistrationResponse, REGISTRATION_COLUMNS.split(","), {
+    "issued_by": lambda issued_by: issued_by if issued_by is not None else "",
+    "is_issued": bool,
+})
+
 router = APIRouter(
     prefix="/api/registrations",
     tags=["registrations"]
@@ -17,215 +50,653 @@ router = APIRouter(
 @router.get("/verify/{account_number}")
 async def verify_account(
     account_number: str,
-    current_user: str = Depends(get_current_user)
+    current_user: str = Depends(get_current_user),
+    db: AsyncDB = Depends(get_async_db)
 ):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("""
-            SELECT id, full_name, phone_number, registration_date, is_issued
-            FROM registrations 
-            WHERE account_number = ?
-        """, account_number)
-        existing_registration = cursor.fetchone()
-        if existing_registration:
-            return {
-                "accountNumber": account_number,
-                "isRegistered": True,
-                "registrationDate": existing_registration[3],
-                "isIssued": bool(existing_registration[4]) if existing_registration[4] is not None else False,
-                "accountDetails": {
-                    "fullName": existing_registration[1],
-                    "phoneNumber": existing_registration[2]
-                }
-            }
-        
-        # For demo purposes, return mock account details
-        # In production, this would query your core banking system
+    found, registration, seq = registration_cache.lookup(account_number)
+    if not found:
+        registration = await db.run(_find_registration, account_number)
+        registration_cache.store(account_number, registration, seq)
+
+    if registration:
+        full_name, phone_number, registration_date, is_issued = registration
         return {
             "accountNumber": account_number,
-            "isRegistered": False,
+            "isRegistered": True,
+            "registrationDate": registration_date,
+            "isIssued": bool(is_issued) if is_issued is not None else False,
             "accountDetails": {
-                "fullName": "John Doe",
-                "phoneNumber": "0788123456"
+                "fullName": full_name,
+                "phoneNumber": phone_number
             }
         }
-        
+
+    # Not registered yet: the details to register with come from core banking
+    status, details = await account_lookup.lookup(account_number)
+    return {
+        "accountNumber": account_number,
+        "isRegistered": False,
+        "accountDetailsStatus": status,
+        "accountDetails": {
+            "fullName": details.full_name,
+            "phoneNumber": details.phone_number
+        } if details else None
+    }
+
+@router.get("/verify-cache/stats")
+async def get_verify_cache_stats(current_user: str = Depends(get_current_user)):
+    return registration_cache.cache_stats()
+
+def _find_registration(conn, account_number: str):
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT full_name, phone_number, registration_date, is_issued
+            FROM registrations
+            WHERE account_number = ?
+        """, (account_number,))
+        row = cursor.fetchone()
+        return tuple(row) if row else None
     except Exception as e:
-        logger.error(f"Error verifying account: {str(e)}")
+        logger.error("Error verifying account: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
 
 @router.post("/", response_model=RegistrationResponse)
-def register_account(reg: RegistrationCreate, user=Depends(get_current_user)):
-    conn = get_db_connection()
+async def register_account(
+    reg: RegistrationCreate,
+    user=Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(
+        None, description="Retries with the same key return the original result"
+    ),
+    db: AsyncDB = Depends(get_async_db)
+):
+    idempotency.validate_key(idempotency_key)
+    return await db.run(_register_account, reg, user, idempotency_key)
+
+# Issue a registration in one statement: insert it, or complete a pending
+# (bulk-loaded) row. Rows already issued are left alone and return nothing.
+# The old date/issuer come back too, to move the pending row's counters.
+_UPSERT_REGISTRATION_MSSQL = f"""
+    MERGE registrations WITH (HOLDLOCK) AS target
+    USING (
+        SELECT ? AS id, ? AS account_number, ? AS full_name, ? AS phone_number,
+               ? AS email, ? AS id_number, ? AS registration_date, ? AS issued_by
+    ) AS source
+    ON target.account_number = source.account_number
+    WHEN MATCHED AND target.is_issued = 0 THEN
+        UPDATE SET full_name = source.full_name, phone_number = source.phone_number,
+                   email = source.email, id_number = source.id_number,
+                   registration_date = source.registration_date,
+                   issued_by = source.issued_by, is_issued = 1
+    WHEN NOT MATCHED THEN
+        INSERT (id, account_number, full_name, phone_number, email, id_number, registration_date, created_at, issued_by, is_issued)
+        VALUES (source.id, source.account_number, source.full_name, source.phone_number, source.email,
+                source.id_number, source.registration_date, source.registration_date, source.issued_by, 1)
+    OUTPUT {", ".join("inserted." + column.strip() for column in REGISTRATION_COLUMNS.split(","))},
+           deleted.registration_date, deleted.issued_by;
+"""
+
+_UPSERT_REGISTRATION_SQLITE = f"""
+    INSERT INTO registrations (id, account_number, full_name, phone_number, email, id_number, registration_date, created_at, issued_by, is_issued)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
+    ON CONFLICT(account_number) DO UPDATE
+    SET full_name = excluded.full_name, phone_number = excluded.phone_number,
+        email = excluded.email, id_number = excluded.id_number,
+        registration_date = excluded.registration_date,
+        issued_by = excluded.issued_by, is_issued = 1
+    WHERE registrations.is_issued = 0
+    RETURNING {REGISTRATION_COLUMNS}
+"""
+
+def _upsert_registration(conn, cursor, reg: RegistrationCreate, user: str, now: datetime):
+    """Return (row, previous) where previous is the pending row's (date, issuer), or row None if already issued."""
+    reg_id = str(uuid.uuid4())
+    if not is_sqlite():
+        cursor.execute(_UPSERT_REGISTRATION_MSSQL, (
+            reg_id, reg.account_number, reg.full_name, reg.phone_number,
+            reg.email, reg.id_number, now, user
+        ))
+        row = cursor.fetchone()
+        if row is None:
+            return None, None
+        previous = (row[10], row[11]) if row[10] is not None else None
+        return row[:10], previous
+
+    # RETURNING cannot see the replaced values, so read them first under the
+    # write lock; in-process SQLite has no round trips to save
+    conn.rollback()
+    cursor.execute("BEGIN IMMEDIATE")
+    cursor.execute(
+        "SELECT registration_date, issued_by FROM registrations WHERE account_number = ? AND is_issued = 0",
+        (reg.account_number,)
+    )
+    previous = cursor.fetchone()
+    cursor.execute(_UPSERT_REGISTRATION_SQLITE, (
+        reg_id, reg.account_number, reg.full_name, reg.phone_number,
+        reg.email, reg.id_number, now, now, user
+    ))
+    row = cursor.fetchone()
+    return row, tuple(previous) if previous else None
+
+def _register_account(conn, reg: RegistrationCreate, user: str, idempotency_key: str = None):
     cursor = conn.cursor()
+    request_hash = idempotency.fingerprint(reg.model_dump_json()) if idempotency_key else None
     try:
-        # Check if account exists
-        cursor.execute("SELECT id, is_issued FROM registrations WHERE account_number = ?", (reg.account_number,))
-        row = cursor.fetchone()
-        if row:
-            reg_id, is_issued = row
-            if is_issued:
-                raise HTTPException(status_code=400, detail="Account has already received a free statement")
-            # Update pending registration
-            cursor.execute("""
-                UPDATE registrations
-                SET full_name=?, phone_number=?, email=?, id_number=?, registration_date=?, issued_by=?, is_issued=1
-                WHERE id=?
-            """, (
-                reg.full_name, reg.phone_number, reg.email, reg.id_number,
-                datetime.now(), user, reg_id
-            ))
-            conn.commit()
-            # Fetch the updated record
-            cursor.execute("""
-                SELECT id, account_number, full_name, phone_number, email, id_number, registration_date, created_at, issued_by, is_issued
-                FROM registrations WHERE id=?
-            """, (reg_id,))
-            updated_row = cursor.fetchone()
-        else:
-            # Insert new registration
-            reg_id = str(uuid.uuid4())
-            now = datetime.now()
-            cursor.execute("""
-                INSERT INTO registrations (id, account_number, full_name, phone_number, email, id_number, registration_date, created_at, issued_by, is_issued)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
-            """, (
-                reg_id, reg.account_number, reg.full_name, reg.phone_number, reg.email, reg.id_number,
-                now, now, user
-            ))
-            conn.commit()
-            # Fetch the inserted record
-            cursor.execute("""
-                SELECT id, account_number, full_name, phone_number, email, id_number, registration_date, created_at, issued_by, is_issued
-                FROM registrations WHERE id=?
-            """, (reg_id,))
-            updated_row = cursor.fetchone()
-        # Return all required fields
-        return RegistrationResponse(
-            id=updated_row[0],
-            account_number=updated_row[1],
-            full_name=updated_row[2],
-            phone_number=updated_row[3],
-            email=updated_row[4],
-            id_number=updated_row[5],
-            registration_date=updated_row[6],
-            created_at=updated_row[7],
-            issued_by=updated_row[8],
-            is_issued=bool(updated_row[9])
+        now = datetime.now()
+        row, previous = _upsert_registration(conn, cursor, reg, user, now)
+        if row is None:
+            # Already issued: either a retry of a request that won, or a real duplicate
+            stored = idempotency_key and idempotency.replay(cursor, idempotency_key, user, request_hash)
+            conn.rollback()
+            if stored:
+                return RegistrationResponse.model_validate_json(stored)
+            raise HTTPException(status_code=400, detail="Account has already received a free statement")
+
+        registration = _row_to_registration(row)
+        deltas = registration_deltas(now, user, True)
+        if previous:
+            # Move the row out of its pending date/issuer buckets
+            deltas.subtract(registration_deltas(previous[0], previous[1], False))
+        bump(cursor, deltas)
+
+        if idempotency_key:
+            try:
+                idempotency.save(cursor, idempotency_key, user, request_hash, registration.model_dump_json())
+            except Exception:
+                # A concurrent request with the same key got there first
+                conn.rollback()
+                stored = idempotency.replay(cursor, idempotency_key, user, request_hash)
+                if stored is None:
+                    raise
+                return RegistrationResponse.model_validate_json(stored)
+        conn.commit()
+
+        registration_cache.remember(
+            reg.account_number,
+            (registration.full_name, registration.phone_number, registration.registration_date, True)
         )
+        registration_cache.bump_version()
+        events.publish("registration", {
+            "registration": registration.model_dump(mode="json"),
+            "stats": events.stats_delta(deltas),
+        })
+        return registration
+    except Exception:
+        conn.rollback()
+        raise
     finally:
         cursor.close()
-        conn.close()
+
+@router.post("/bulk", response_model=BulkRegistrationResponse)
+async def register_bulk(
+    payload: BulkRegistrationCreate,
+    user=Depends(get_current_user),
+    db: AsyncDB = Depends(get_async_db)
+):
+    if len(payload.registrations) > settings.bulk_max_rows:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.bulk_max_rows} rows can be registered per request"
+        )
+    rows = [(index + 1, row.model_dump()) for index, row in enumerate(payload.registrations)]
+    results = await db.run(register_chunk, rows, user, set())
+    return summarize(results)
+
+@router.post("/upload", status_code=202)
+async def upload_registrations(
+    file: UploadFile = File(..., description="CSV or XLSX with Account Number, Customer Name and Phone Number columns"),
+    user=Depends(get_current_user)
+):
+    if not (file.filename or "").lower().endswith(SUPPORTED_EXTENSIONS):
+        raise HTTPException(status_code=400, detail="Invalid file format. Please upload a CSV or XLSX file.")
+
+    path = await run_in_threadpool(store_upload, file.file, file.filename)
+    job = create_job(file.filename, user)
+    # Not bound to the request: the job keeps running after this response
+    job.task = asyncio.ensure_future(AsyncDB().run(process_upload, job, path))
+    return job.to_dict()
+
+@router.get("/upload/{job_id}")
+async def get_upload_status(job_id: str, user=Depends(get_current_user)):
+    job = get_job(job_id)
+    if job is None or job.owner != user:
+        raise HTTPException(status_code=404, detail="Upload job not found")
+    return job.to_dict()
 
 @router.get("/stats")
-async def get_registration_stats(current_user: str = Depends(get_current_user)):
-    conn = get_db_connection()
+async def get_registration_stats(
+    if_none_match: Optional[str] = Header(None),
+    current_user: str = Depends(get_current_user),
+    db: AsyncDB = Depends(get_async_db)
+):
+    # Today's count changes at midnight without any write
+    today = date.today()
+    tag = versions.etag("registrations", extra=today.isoformat())
+    if versions.matches(if_none_match, tag):
+        return versions.not_modified(tag)
+    stats = await db.run(_get_registration_stats, today)
+    return versions.tag_response(JSONResponse(stats), tag)
+
+def _get_registration_stats(conn, today: date = None):
     cursor = conn.cursor()
-    
+
     try:
-        # Get total registrations
-        cursor.execute("SELECT COUNT(*) FROM registrations")
-        total_registrations = cursor.fetchone()[0]
-        
-        # Get today's registrations
-        cursor.execute("""
-            SELECT COUNT(*) 
-            FROM registrations 
-            WHERE CAST(registration_date AS DATE) = CAST(GETDATE() AS DATE)
-        """)
-        todays_registrations = cursor.fetchone()[0]
-        
-        # Get registrations by branch
-        cursor.execute("""
-            SELECT issued_by, COUNT(*) as count
-            FROM registrations
-            GROUP BY issued_by
-            ORDER BY count DESC
-        """)
-        branch_stats = [{"branch": row[0], "count": row[1]} for row in cursor.fetchall()]
-        
-        return {
-            "total_registrations": total_registrations,
-            "todays_registrations": todays_registrations,
-            "branch_stats": branch_stats
-        }
+        # Counters are kept current by the write paths, see app/stats.py
+        return read_stats(cursor, today)
     finally:
         cursor.close()
-        conn.close()
+
+@router.get("/events")
+async def registration_events(
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+    current_user: str = Depends(get_current_user)
+):
+    """
+    Server-Sent Events: `registration`, `registrations` (bulk), `issued` and
+    `reset`. Each data payload carries a `stats` delta to apply to /stats.
+    """
+    if events.is_full():
+        raise HTTPException(status_code=503, detail="Too many open event streams, try again later")
+    # A new client still gets what is published before its stream starts
+    return StreamingResponse(
+        events.stream(last_event_id or events.latest_id()),
+        media_type="text/event-stream",
+        # No caching, and no buffering by nginx-style proxies
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.patch("/{registration_id}/issue")
-def issue_registration(registration_id: str, user=Depends(get_current_user)):
-    conn = get_db_connection()
+async def issue_registration(
+    registration_id: str,
+    user=Depends(get_current_user),
+    db: AsyncDB = Depends(get_async_db)
+):
+    return await db.run(_issue_registration, registration_id)
+
+def _issue_registration(conn, registration_id: str):
     cursor = conn.cursor()
     try:
-        cursor.execute(
-            "UPDATE registrations SET is_issued = 1 WHERE id = ?",
-            (registration_id,)
-        )
+        if is_sqlite():
+            query = "UPDATE registrations SET is_issued = 1 WHERE id = ? AND is_issued = 0 RETURNING account_number"
+        else:
+            query = "UPDATE registrations SET is_issued = 1 OUTPUT inserted.account_number WHERE id = ? AND is_issued = 0"
+        cursor.execute(query, (registration_id,))
+        issued = cursor.fetchone()
+        if issued:
+            bump(cursor, {"issued": 1})
         conn.commit()
+        if issued:
+            registration_cache.forget(issued[0])
+            registration_cache.bump_version()
+            events.publish("issued", {
+                "account_numbers": [issued[0]],
+                "stats": events.stats_delta({"issued": 1}),
+            })
         return {"message": "Registration issued successfully."}
     except Exception as e:
         conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         cursor.close()
-        conn.close()
 
-# Also update the get_registrations endpoint to include filtering by issued status
-@router.get("/", response_model=List[RegistrationResponse])
-async def get_registrations(
-    current_user: str = Depends(get_current_user),
-    issued_only: bool = Query(False, description="Filter by issued statements only")
+@router.post("/issue-batch", response_model=IssueBatchResponse)
+async def issue_registrations(
+    batch: IssueBatchRequest,
+    user=Depends(get_current_user),
+    db: AsyncDB = Depends(get_async_db)
 ):
-    conn = get_db_connection()
+    ids = _distinct(batch.ids)
+    account_numbers = _distinct(batch.account_numbers)
+    if not ids and not account_numbers:
+        raise HTTPException(status_code=400, detail="Send at least one id or account number")
+    if len(ids) + len(account_numbers) > settings.issue_batch_max_size:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.issue_batch_max_size} registrations can be issued per request"
+        )
+    return await db.run(_issue_batch, ids, account_numbers)
+
+def _distinct(values):
+    return list(dict.fromkeys(value.strip() for value in values if value and value.strip()))
+
+def _issue_batch(conn, ids, account_numbers):
+    """Issue every pending match in one transaction, with one UPDATE per chunk of keys."""
     cursor = conn.cursor()
-    
     try:
-        query = """
-            SELECT id, account_number, full_name, phone_number,
-                   email, id_number, registration_date, created_at,
-                   issued_by, is_issued
-            FROM registrations
-        """
-        
-        # Add filter if requested
-        if issued_only:
-            query += " WHERE is_issued = 1"
-            
-        query += " ORDER BY registration_date DESC"
-        
-        cursor.execute(query)
-        
-        registrations = []
-        for row in cursor.fetchall():
-            registrations.append(RegistrationResponse(
-                id=row[0],
-                account_number=row[1],
-                full_name=row[2],
-                phone_number=row[3],
-                email=row[4],
-                id_number=row[5],
-                registration_date=row[6],
-                created_at=row[7],
-                issued_by=row[8] if row[8] is not None else "",
-                is_issued=bool(row[9]) if len(row) > 9 else False
-            ))
-        return registrations
+        result = {"issued": [], "already_issued": [], "not_found": []}
+        issued_accounts = []
+        for column, keys in (("id", ids), ("account_number", account_numbers)):
+            for chunk in _chunks(keys, LOOKUP_CHUNK_SIZE):
+                placeholders = ", ".join("?" * len(chunk))
+                if is_sqlite():
+                    query = f"""
+                        UPDATE registrations SET is_issued = 1
+                        WHERE {column} IN ({placeholders}) AND is_issued = 0
+                        RETURNING {column}, account_number
+                    """
+                else:
+                    query = f"""
+                        UPDATE registrations SET is_issued = 1
+                        OUTPUT inserted.{column}, inserted.account_number
+                        WHERE {column} IN ({placeholders}) AND is_issued = 0
+                    """
+                cursor.execute(query, tuple(chunk))
+                issued = dict(cursor.fetchall())
+                issued_accounts.extend(issued.values())
+
+                # Whatever the UPDATE skipped either was issued already or doesn't exist
+                rest = [key for key in chunk if key not in issued]
+                existing = set()
+                if rest:
+                    cursor.execute(
+                        f"SELECT {column} FROM registrations WHERE {column} IN ({', '.join('?' * len(rest))})",
+                        tuple(rest)
+                    )
+                    existing = {row[0] for row in cursor.fetchall()}
+                for key in chunk:
+                    if key in issued:
+                        result["issued"].append(key)
+                    elif key in existing:
+                        result["already_issued"].append(key)
+                    else:
+                        result["not_found"].append(key)
+
+        if issued_accounts:
+            bump(cursor, {"issued": len(issued_accounts)})
+        conn.commit()
+        registration_cache.forget_all(issued_accounts)
+        if issued_accounts:
+            registration_cache.bump_version()
+            events.publish("issued", {
+                "account_numbers": issued_accounts,
+                "stats": events.stats_delta({"issued": len(issued_accounts)}),
+            })
+        logger.info("Issued %d registrations in a batch of %d", len(issued_accounts), len(ids) + len(account_numbers))
+        return result
+    except Exception:
+        conn.rollback()
+        raise
     finally:
         cursor.close()
-        conn.close()
 
-def get_issued_registrations():
-    conn = get_db_connection()
+def _row_to_registration(row) -> RegistrationResponse:
+    return RegistrationResponse(
+        id=row[0],
+        account_number=row[1],
+        full_name=row[2],
+        phone_number=row[3],
+        email=row[4],
+        id_number=row[5],
+        registration_date=row[6],
+        created_at=row[7],
+        issued_by=row[8] if row[8] is not None else "",
+        is_issued=bool(row[9]) if len(row) > 9 else False
+    )
+
+def _encode_cursor(registration_date: datetime, registration_id: str) -> str:
+    raw = json.dumps([registration_date.isoformat(), registration_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _decode_cursor(token: str):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        registration_date, registration_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(registration_date), str(registration_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+class RegistrationFilters:
+    """Filters shared by the listing, its total count and the export."""
+
+    def __init__(self, account_prefix: Optional[str] = None, name: Optional[str] = None,
+                 issued_by: Optional[str] = None, date_from: Optional[date] = None,
+                 date_to: Optional[date] = None, status: str = "all"):
+        self.account_prefix = account_prefix
+        self.name = name
+        self.issued_by = issued_by
+        self.date_from = date_from
+        self.date_to = date_to
+        self.status = status
+        # Set by _choose_prefix_plan when a prefix matches too many rows to sort
+        self.scan_by_date = False
+
+    def conditions(self, by_date: bool = False):
+        """
+        WHERE terms and their parameters; each one can seek an index. With
+        by_date the prefix terms are kept off their indexes (SQLite only,
+        SQL Server gets a table hint) so the date index drives the query.
+        """
+        conditions = []
+        params = []
+        prefix = "+" if by_date and is_sqlite() else ""
+
+        if self.account_prefix:
+            # A key range rather than LIKE: SQLite's LIKE can't use a case-sensitive index
+            conditions.append(f"{prefix}account_number >= ? AND {prefix}account_number < ?")
+            params.extend([self.account_prefix, _prefix_upper_bound(self.account_prefix)])
+        if self.name:
+            conditions.append(f"{prefix}full_name LIKE ? ESCAPE '\\'")
+            params.append(_escape_like(self.name) + "%")
+        if self.issued_by:
+            conditions.append("issued_by = ?")
+            params.append(self.issued_by)
+        # The date range is inclusive of both days
+        if self.date_from:
+            conditions.append(f"registration_date >= {datetime_param()}")
+            params.append(datetime.combine(self.date_from, time.min))
+        if self.date_to:
+            conditions.append(f"registration_date < {datetime_param()}")
+            params.append(datetime.combine(self.date_to + timedelta(days=1), time.min))
+        if self.status != "all":
+            conditions.append("is_issued = ?")
+            params.append(1 if self.status == "issued" else 0)
+        return conditions, params
+
+def registration_filters(
+    account_prefix: Optional[str] = Query(
+        None, pattern=r"^[0-9]{1,20}$", description="Account numbers starting with these digits"
+    ),
+    name: Optional[str] = Query(
+        None, min_length=1, max_length=100, description="Customer names starting with this text, in any case"
+    ),
+    issued_by: Optional[str] = Query(None, description="Only registrations made by this issuer"),
+    date_from: Optional[date] = Query(None, description="First registration day to include"),
+    date_to: Optional[date] = Query(None, description="Last registration day to include"),
+    status: Literal["all", "issued", "pending"] = Query("all", description="Issued or pending registrations only")
+) -> RegistrationFilters:
+    """FastAPI dependency reading RegistrationFilters from the query string."""
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to")
+    return RegistrationFilters(account_prefix, name, issued_by, date_from, date_to, status)
+
+def _prefix_upper_bound(prefix: str) -> str:
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+def _escape_like(value: str) -> str:
+    # [ is a wildcard on SQL Server only, escaping it is harmless on SQLite
+    for char in ("\\", "%", "_", "["):
+        value = value.replace(char, "\\" + char)
+    return value
+
+def _registrations_query(filters: RegistrationFilters, after: Optional[str], limit: Optional[int]):
+    """Build the keyset query over (registration_date, id), newest first."""
+    conditions, params = filters.conditions(by_date=filters.scan_by_date)
+
+    if after:
+        after_date, after_id = _decode_cursor(after)
+        conditions.append(
+            f"(registration_date < {datetime_param()} "
+            f"OR (registration_date = {datetime_param()} AND id < ?))"
+        )
+        params.extend([after_date, after_date, after_id])
+
+    query = f"SELECT {REGISTRATION_COLUMNS} FROM registrations"
+    if filters.scan_by_date and not is_sqlite():
+        query += " WITH (INDEX(IX_registrations_date_id))"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY registration_date DESC, id DESC"
+
+    if limit is not None:
+        query += limit_clause()
+        params.append(limit)
+    return query, tuple(params)
+
+def _count_query(filters: RegistrationFilters, limit: int):
+    """Count matching rows, stopping after `limit` so a broad filter can't scan the table."""
+    conditions, params = filters.conditions()
+    where = " WHERE " + " AND ".join(conditions) if conditions else ""
+    if is_sqlite():
+        query = f"SELECT COUNT(*) FROM (SELECT 1 FROM registrations{where} LIMIT ?)"
+        return query, tuple(params) + (limit,)
+    query = f"SELECT COUNT(*) FROM (SELECT TOP (?) 1 AS matched FROM registrations{where}) AS capped"
+    return query, (limit,) + tuple(params)
+
+@router.get("/", response_model=List[RegistrationResponse])
+async def get_registrations(
+    current_user: str = Depends(get_current_user),
+    filters: RegistrationFilters = Depends(registration_filters),
+    issued_only: bool = Query(False, description="Same as status=issued"),
+    pending_only: bool = Query(False, description="Same as status=pending"),
+    limit: Optional[int] = Query(
+        None, ge=1, le=settings.registrations_max_page_size,
+        description="Page size; defaults to REGISTRATIONS_PAGE_SIZE"
+    ),
+    after: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header"),
+    with_total: bool = Query(
+        False, description="Send X-Total-Count, exact or a lower bound as flagged by X-Total-Count-Exact"
+    ),
+    stream: bool = Query(False, description="Stream every matching row as NDJSON instead of one page"),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncDB = Depends(get_async_db)
+):
+    if issued_only and pending_only:
+        raise HTTPException(status_code=400, detail="issued_only and pending_only are mutually exclusive")
+    if issued_only:
+        filters.status = "issued"
+    elif pending_only:
+        filters.status = "pending"
+
+    # Taken before the query runs, see app/versions.py
+    tag = versions.etag("registrations")
+    if versions.matches(if_none_match, tag):
+        return versions.not_modified(tag)
+
+    if stream:
+        query, params = _registrations_query(filters, after, limit)
+        return versions.tag_response(StreamingResponse(
+            _stream_registrations(db, query, params),
+            media_type="application/x-ndjson"
+        ), tag)
+
+    limit = limit or settings.registrations_page_size
+    body, next_cursor, total = await db.run(_get_registrations, filters, after, limit, with_total)
+
+    # Returned as-is: the rows were encoded on the DB thread, response_model only documents them
+    page = JSONBytes(body)
+    if next_cursor:
+        page.headers["X-Next-Cursor"] = next_cursor
+    if total is not None:
+        page.headers["X-Total-Count"] = str(total[0])
+        page.headers["X-Total-Count-Exact"] = "true" if total[1] else "false"
+    return versions.tag_response(page, tag)
+
+def _get_registrations(conn, filters: RegistrationFilters, after: Optional[str], limit: int, with_total: bool):
+    """
+    Return (JSON body, next cursor, total) for one page; total is
+    (count, exact), or None unless with_total.
+    """
     cursor = conn.cursor()
+
     try:
-        cursor.execute("SELECT * FROM registrations WHERE is_issued = 1")
-        results = cursor.fetchall()
-        return results
+        matches = None
+        if filters.account_prefix or filters.name:
+            matches = _choose_prefix_plan(cursor, filters)
+
+        # Fetch one extra row to learn whether another page follows
+        cursor.execute(*_registrations_query(filters, after, limit + 1))
+        rows = cursor.fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(rows[-1][6], rows[-1][0])
+
+        total = None
+        if with_total:
+            if matches is not None and not filters.scan_by_date:
+                total = (matches, True)
+            else:
+                total = _count_registrations(cursor, filters)
+        return REGISTRATION_ENCODER.dumps(rows), next_cursor, total
     finally:
         cursor.close()
-        conn.close()
+
+def _choose_prefix_plan(cursor, filters: RegistrationFilters) -> int:
+    """
+    Prefix ranges come out of their index in key order, not date order. A
+    narrow one is read there and sorted; once it matches more than
+    REGISTRATIONS_SORT_LIMIT rows, walking the date index and skipping
+    the rows that don't match fills a page sooner. Returns the capped
+    number of matches.
+    """
+    limit = settings.registrations_sort_limit
+    cursor.execute(*_count_query(filters, limit + 1))
+    matches = cursor.fetchone()[0]
+    filters.scan_by_date = matches > limit
+    return matches
+
+def _count_registrations(cursor, filters: RegistrationFilters):
+    # Filters the counters are keyed by never touch registrations at all
+    if not (filters.account_prefix or filters.name):
+        counted = counted_total(cursor, filters.issued_by, filters.date_from, filters.date_to, filters.status)
+        if counted is not None:
+            return counted, True
+
+    limit = settings.registrations_count_limit
+    cursor.execute(*_count_query(filters, limit + 1))
+    count = cursor.fetchone()[0]
+    if count > limit:
+        return limit, False
+    return count, True
+
+async def _stream_registrations(db: AsyncDB, query: str, params):
+    async for rows in db.stream(query, params):
+        yield REGISTRATION_ENCODER.dumps_lines(rows)
+
+def _export_query(filters: RegistrationFilters):
+    """Build the export query, oldest first."""
+    conditions, params = filters.conditions()
+    query = f"SELECT {exports.EXPORT_COLUMNS} FROM registrations"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY registration_date, id"
+    return query, tuple(params)
+
+@router.get("/export")
+async def export_registrations(
+    current_user: str = Depends(get_current_user),
+    format: Literal["csv", "xlsx"] = Query("csv", description="csv is streamed as it is read; xlsx is built first"),
+    filters: RegistrationFilters = Depends(registration_filters),
+    db: AsyncDB = Depends(get_async_db)
+):
+    query, params = _export_query(filters)
+    filename = f"registrations-{datetime.now():%Y%m%d-%H%M%S}.{format}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    logger.info("Export requested: format=%s status=%s", format, filters.status, extra={"username": current_user})
+
+    if format == "xlsx":
+        path = await db.run(exports.write_xlsx, query, params)
+        return FileResponse(
+            path,
+            media_type=exports.MEDIA_TYPES["xlsx"],
+            headers=headers,
+            background=BackgroundTask(os.remove, path)
+        )
+
+    return StreamingResponse(
+        exports.csv_chunks(db.stream(query, params)),
+        media_type=exports.MEDIA_TYPES["csv"],
+        headers=headers
+    )
@@ -0,0 +1,182 @@
+"""
+Incrementally maintained registration statistics.
+
+Write paths adjust counter rows in `registration_counters` inside their
+own transaction, so `/stats` reads O(issuers) rows instead of scanning
+`registrations`. Counter keys:
+
+    total            every registration
+    issued           registrations whose statement has been issued
+    day:YYYY-MM-DD   registrations by registration date
+    issuer:<user>    registrations by issued_by
+
+Rebuild the counters from scratch with `python -m app.stats rebuild`.
+"""
+
+import sys
+import logging
+from collections import Counter
+from datetime import date, datetime
+from .database import get_db_connection, is_sqlite
+
+logger = logging.getLogger(__name__)
+
+def day_key(value) -> str:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        value = value.date()
+    return f"day:{value.isoformat()}"
+
+def issuer_key(issued_by) -> str:
+    return f"issuer:{issued_by or ''}"
+
+def registration_deltas(registration_date, issued_by, is_issued: bool, sign: int = 1) -> Counter:
+    """Counter deltas for adding (sign=1) or removing (sign=-1) one registration."""
+    deltas = Counter({
+        "total": sign,
+        day_key(registration_date): sign,
+        issuer_key(issued_by): sign,
+    })
+    if is_issued:
+        deltas["issued"] += sign
+    return deltas
+
+def bump(cursor, deltas):
+    """Apply counter deltas in one statement, inside the caller's transaction."""
+    items = [(key, delta) for key, delta in deltas.items() if delta]
+    if not items:
+        return
+    params = tuple(value for item in items for value in item)
+    values = ", ".join("(?, ?)" for _ in items)
+    if is_sqlite():
+        cursor.execute(f"""
+            INSERT INTO registration_counters (counter_key, counter_value)
+            VALUES {values}
+            ON CONFLICT(counter_key) DO UPDATE
+            SET counter_value = counter_value + excluded.counter_value
+        """, params)
+    else:
+        cursor.execute(f"""
+            MERGE registration_counters WITH (HOLDLOCK) AS target
+            USING (VALUES {values}) AS source (counter_key, delta)
+            ON target.counter_key = source.counter_key
+            WHEN MATCHED THEN
+                UPDATE SET counter_value = target.counter_value + source.delta
+            WHEN NOT MATCHED THEN
+                INSERT (counter_key, counter_value) VALUES (source.counter_key, source.delta);
+        """, params)
+
+# A key range rather than LIKE so SQLite can seek on the primary key as well
+STATS_COUNTERS_SQL = """
+    SELECT counter_key, counter_value
+    FROM registration_counters
+    WHERE counter_key IN ('total', 'issued', ?)
+       OR (counter_key >= 'issuer:' AND counter_key < 'issuer;')
+"""
+
+def read_stats(cursor, today: date = None) -> dict:
+    today_key = day_key(today or date.today())
+    cursor.execute(STATS_COUNTERS_SQL, (today_key,))
+
+    counters = {}
+    branch_stats = []
+    for key, value in cursor.fetchall():
+        if key.startswith("issuer:"):
+            if value:
+                branch_stats.append({"branch": key[len("issuer:"):], "count": value})
+        else:
+            counters[key] = value
+    branch_stats.sort(key=lambda stat: stat["count"], reverse=True)
+
+    return {
+        "total_registrations": counters.get("total", 0),
+        "todays_registrations": counters.get(today_key, 0),
+        "issued_registrations": counters.get("issued", 0),
+        "branch_stats": branch_stats
+    }
+
+def counted_total(cursor, issued_by: str = None, date_from: date = None, date_to: date = None,
+                  status: str = "all"):
+    """
+    Number of registrations matching these filters, read from the counters,
+    or None when no counter answers that combination.
+    """
+    if issued_by:
+        if date_from or date_to or status != "all":
+            return None
+        cursor.execute(
+            "SELECT counter_value FROM registration_counters WHERE counter_key = ?",
+            (issuer_key(issued_by),)
+        )
+        row = cursor.fetchone()
+        return row[0] if row else 0
+
+    if date_from or date_to:
+        if status != "all":
+            return None
+        # ISO dates sort like the days they name, so the day keys form a range
+        cursor.execute("""
+            SELECT COALESCE(SUM(counter_value), 0)
+            FROM registration_counters
+            WHERE counter_key >= ? AND counter_key <= ?
+        """, (day_key(date_from) if date_from else "day:", day_key(date_to) if date_to else "day;"))
+        return cursor.fetchone()[0]
+
+    cursor.execute("SELECT counter_key, counter_value FROM registration_counters WHERE counter_key IN ('total', 'issued')")
+    counters = dict(cursor.fetchall())
+    total, issued = counters.get("total", 0), counters.get("issued", 0)
+    return {"all": total, "issued": issued, "pending": total - issued}[status]
+
+def rebuild_counters(conn):
+    """Recompute every counter from `registrations` while blocking concurrent writers."""
+    cursor = conn.cursor()
+    try:
+        if is_sqlite():
+            # Take the write lock up front so no registration slips in mid-rebuild
+            conn.rollback()
+            cursor.execute("BEGIN IMMEDIATE")
+            lock_hint = ""
+        else:
+            lock_hint = " WITH (TABLOCK, HOLDLOCK)"
+
+        day_expr = "date(registration_date)" if is_sqlite() else "CAST(registration_date AS DATE)"
+        cursor.execute(f"""
+            SELECT {day_expr}, issued_by, is_issued, COUNT(*)
+            FROM registrations{lock_hint}
+            GROUP BY {day_expr}, issued_by, is_issued
+        """)
+        counters = Counter()
+        for registration_day, issued_by, is_issued, count in cursor.fetchall():
+            for key, delta in registration_deltas(registration_day, issued_by, bool(is_issued)).items():
+                counters[key] += delta * count
+
+        cursor.execute("DELETE FROM registration_counters")
+        if counters:
+            cursor.executemany(
+                "INSERT INTO registration_counters (counter_key, counter_value) VALUES (?, ?)",
+                list(counters.items())
+            )
+        conn.commit()
+        logger.info("Rebuilt %d registration counters", len(counters))
+        return counters
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def main(argv):
+    if argv[1:] != ["rebuild"]:
+        print("usage: python -m app.stats rebuild")
+        return 2
+    conn = get_db_connection()
+    try:
+        counters = rebuild_counters(conn)
+    finally:
+        conn.close()
+    print(f"Rebuilt {len(counters)} counters, total registrations: {counters.get('total', 0)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
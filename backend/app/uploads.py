@@ -0,0 +1,196 @@
+"""
+Server-side ingestion of bulk registration files.
+
+Uploaded CSV/XLSX files are parsed incrementally with a row generator and
+fed to the bulk registration code in chunks, so memory does not grow with
+the size of the file. Progress is tracked on an UploadJob that clients poll;
+with several workers the job's worker shares its progress over the bus so a
+poll can land on any of them.
+"""
+
+import csv
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import logging
+from . import bus
+from .bulk import register_chunk
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+# Same headers the frontend template and validateRow accept
+COLUMN_ALIASES = {
+    "account number": "account_number",
+    "accountnumber": "account_number",
+    "account_number": "account_number",
+    "customer name": "full_name",
+    "customername": "full_name",
+    "full name": "full_name",
+    "full_name": "full_name",
+    "phone number": "phone_number",
+    "phonenumber": "phone_number",
+    "phone_number": "phone_number",
+    "email": "email",
+    "id number": "id_number",
+    "idnumber": "id_number",
+    "id_number": "id_number",
+}
+
+SUPPORTED_EXTENSIONS = (".csv", ".xlsx")
+
+def _map_headers(headers):
+    return [COLUMN_ALIASES.get(str(header or "").strip().lower()) for header in headers]
+
+def _rows_from_values(value_rows):
+    """Turn header + value tuples into (row_number, dict) pairs, skipping blank lines."""
+    columns = None
+    row_number = 0
+    for values in value_rows:
+        if columns is None:
+            columns = _map_headers(values)
+            continue
+        if not any(value not in (None, "") for value in values):
+            continue
+        row_number += 1
+        yield row_number, {
+            column: value for column, value in zip(columns, values) if column
+        }
+
+def _csv_values(path: str):
+    with open(path, newline="", encoding="utf-8-sig") as handle:
+        yield from csv.reader(handle)
+
+def _xlsx_values(path: str):
+    # Imported lazily: only XLSX uploads need openpyxl
+    from openpyxl import load_workbook
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+def iter_upload_rows(path: str, filename: str):
+    """Yield (row_number, row dict) pairs from a CSV or XLSX file without loading it whole."""
+    if filename.lower().endswith(".xlsx"):
+        return _rows_from_values(_xlsx_values(path))
+    return _rows_from_values(_csv_values(path))
+
+def store_upload(fileobj, filename: str) -> str:
+    """Copy an upload to a private temp file that outlives the request."""
+    suffix = os.path.splitext(filename)[1].lower()
+    fd, path = tempfile.mkstemp(prefix="bulk-upload-", suffix=suffix)
+    with os.fdopen(fd, "wb") as target:
+        shutil.copyfileobj(fileobj, target, 1024 * 1024)
+    return path
+
+class UploadJob:
+    def __init__(self, filename: str, owner: str):
+        self.id = str(uuid.uuid4())
+        self.filename = filename
+        self.owner = owner
+        self.status = "queued"
+        self.rows_processed = 0
+        self.success = 0
+        self.failed = 0
+        self.errors = []
+        self.detail = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.task = None
+
+    def record(self, results):
+        for result in results:
+            self.rows_processed += 1
+            if result["status"] == "created":
+                self.success += 1
+                continue
+            self.failed += 1
+            if len(self.errors) < settings.upload_max_reported_errors:
+                self.errors.append(
+                    f"Row {result['row']} ({result['account_number']}): {result['detail']}"
+                )
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "rows_processed": self.rows_processed,
+            "success": self.success,
+            "failed": self.failed,
+            "errors": self.errors,
+            "detail": self.detail,
+        }
+
+    def share(self):
+        bus.publish("upload_jobs", {
+            **self.to_dict(),
+            "owner": self.owner,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        })
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+def create_job(filename: str, owner: str) -> UploadJob:
+    job = UploadJob(filename, owner)
+    cutoff = time.time() - settings.upload_job_ttl
+    with _jobs_lock:
+        # Forget finished jobs nobody has polled for a while
+        for job_id in [job_id for job_id, old in _jobs.items()
+                       if old.finished_at and old.finished_at < cutoff]:
+            del _jobs[job_id]
+        _jobs[job.id] = job
+    job.share()
+    return job
+
+def _on_shared_job(snapshot: dict):
+    """Progress of a job running on another worker."""
+    with _jobs_lock:
+        job = _jobs.get(snapshot["id"])
+        if job is None:
+            job = _jobs[snapshot["id"]] = UploadJob(snapshot["filename"], snapshot["owner"])
+    for name in ("id", "status", "rows_processed", "success", "failed", "errors", "detail",
+                 "created_at", "finished_at"):
+        setattr(job, name, snapshot[name])
+
+bus.subscribe("upload_jobs", _on_shared_job)
+
+def get_job(job_id: str):
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+def process_upload(conn, job: UploadJob, path: str):
+    """Parse the stored upload and register it chunk by chunk; runs on the DB executor."""
+    job.status = "running"
+    job.share()
+    seen = set()
+    chunk = []
+    try:
+        for row in iter_upload_rows(path, job.filename):
+            chunk.append(row)
+            if len(chunk) >= settings.bulk_insert_chunk_size:
+                job.record(register_chunk(conn, chunk, job.owner, seen))
+                job.share()
+                chunk = []
+        if chunk:
+            job.record(register_chunk(conn, chunk, job.owner, seen))
+        job.status = "completed"
+    except Exception as e:
+        logger.error("Upload job %s failed: %s", job.id, e)
+        job.status = "failed"
+        job.detail = str(e)
+    finally:
+        job.finished_at = time.time()
+        job.share()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,115 @@
+"""
+Table version counters for conditional GETs.
+
+Every path that changes a table calls `bump(table)` after it commits. List
+endpoints read the version before they query and send it as a strong ETag.
+A request whose If-None-Match still matches is answered with a 304 from
+memory, without leasing a database connection.
+
+Reading the version first means a write that lands mid-query can only make
+the ETag older than the body, which costs the next request a full response,
+never a stale 304. Versions are per process and start again on restart; the
+boot id in the ETag keeps a restarted server from matching old tags.
+
+With several workers (see app/workers.py) the counters of TABLES live in a
+small memory-mapped file instead, so every worker hands out the same ETags
+and a bump on one is seen by the next request on any other.
+"""
+
+import fcntl
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import defaultdict
+from typing import Optional
+from fastapi import Response
+
+# Tables whose versions are shared between workers
+TABLES = ("registrations", "branches", "issuers")
+
+_boot = format(int(time.time() * 1000), "x")
+_versions = defaultdict(int)
+_lock = threading.Lock()
+
+# Shared file layout: the deployment's boot time, then one counter per table
+_SLOT = struct.Struct("<Q")
+_shared = None
+_shared_fd = None
+
+# Browsers keep the body but revalidate before every use
+CACHE_CONTROL = "private, no-cache"
+
+def create_shared(path: str):
+    """Start a fresh versions file for a new deployment; workers then `share()` it."""
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(_SLOT.pack(int(time.time() * 1000)))
+        f.write(bytes(_SLOT.size * len(TABLES)))
+    # Workers of an older deployment keep the file they mapped
+    os.replace(temp_path, path)
+
+def share(path: str):
+    global _shared, _shared_fd, _boot
+    _shared_fd = os.open(path, os.O_RDWR)
+    _shared = mmap.mmap(_shared_fd, _SLOT.size * (len(TABLES) + 1))
+    _boot = format(_SLOT.unpack_from(_shared, 0)[0], "x")
+
+def _offset(table: str) -> int:
+    return _SLOT.size * (TABLES.index(table) + 1)
+
+def bump(*tables: str) -> tuple:
+    """Move `tables` to their next versions; returns the new versions in order."""
+    with _lock:
+        if _shared is None:
+            for table in tables:
+                _versions[table] += 1
+            return tuple(_versions[table] for table in tables)
+        # The thread lock orders this process's bumps, flock the other workers'
+        fcntl.flock(_shared_fd, fcntl.LOCK_EX)
+        try:
+            bumped = []
+            for table in tables:
+                offset = _offset(table)
+                bumped.append(_SLOT.unpack_from(_shared, offset)[0] + 1)
+                _SLOT.pack_into(_shared, offset, bumped[-1])
+            return tuple(bumped)
+        finally:
+            fcntl.flock(_shared_fd, fcntl.LOCK_UN)
+
+def is_shared() -> bool:
+    return _shared is not None
+
+def current(table: str) -> int:
+    with _lock:
+        return _version(table)
+
+def _version(table: str) -> int:
+    if _shared is None:
+        return _versions[table]
+    return _SLOT.unpack_from(_shared, _offset(table))[0]
+
+def etag(*tables: str, extra: str = None) -> str:
+    """Strong ETag over the current versions of `tables`, plus `extra` for other inputs."""
+    with _lock:
+        parts = [_boot] + [str(_version(table)) for table in tables]
+    if extra:
+        parts.append(extra)
+    return '"' + ".".join(parts) + '"'
+
+def matches(if_none_match: Optional[str], tag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    return any(candidate.strip().removeprefix("W/") == tag for candidate in if_none_match.split(","))
+
+def not_modified(tag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": tag, "Cache-Control": CACHE_CONTROL})
+
+def tag_response(response: Response, tag: str) -> Response:
+    response.headers["ETag"] = tag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return response
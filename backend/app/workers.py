@@ -0,0 +1,87 @@
+"""
+Running the API as several worker processes on one host:
+
+    WORKERS=4 python -m app.serve --host 0.0.0.0 --port 9000
+
+Each worker is a full copy of the app with its own DB pool (sized per
+worker, see DB_POOL_TOTAL_MAX_SIZE in app/config.py) and its own in-process
+caches. At startup `start()`:
+
+- runs the one-off initialisation (schema migrations) in the first worker
+  only; the others wait on a file lock and skip it. Workers restarted later
+  in the same deployment skip it too;
+- maps the shared table versions, so ETags agree across workers;
+- joins the invalidation bus (app/bus.py), over which the workers tell each
+  other about writes to their caches.
+
+A deployment is one run of the process manager: APP_DEPLOYMENT_ID if set,
+otherwise the parent pid, which is uvicorn's (or gunicorn's) master.
+Lock, marker, versions file and bus sockets live under RUNTIME_DIR.
+
+Per-worker state that is not shared: /metrics (scrape each worker or sum
+them), the AD directory index (each worker syncs its own) and revocations
+made before a worker (re)started.
+"""
+
+import fcntl
+import os
+import logging
+from typing import Optional
+from . import bus, versions
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+deployment_id = os.getenv("APP_DEPLOYMENT_ID") or f"ppid-{os.getppid()}"
+
+def enabled() -> bool:
+    return settings.workers > 1
+
+def _runtime_path(*parts: str) -> str:
+    return os.path.join(settings.runtime_dir, *parts)
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+def _remove_old_bus_directories():
+    root = _runtime_path("bus")
+    for name in os.listdir(root) if os.path.isdir(root) else ():
+        if name != deployment_id:
+            try:
+                # Only empty ones: a deployment still shutting down keeps its sockets
+                os.rmdir(os.path.join(root, name))
+            except OSError:
+                pass
+
+def start(init):
+    """Worker startup: `init()` once per deployment, then join the shared state."""
+    if not enabled():
+        init()
+        return
+
+    os.makedirs(settings.runtime_dir, exist_ok=True)
+    marker = _runtime_path("initialized")
+    with open(_runtime_path("init.lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if _read(marker) == deployment_id:
+            logger.info("Deployment %s already initialised", deployment_id)
+        else:
+            init()
+            versions.create_shared(_runtime_path("versions"))
+            _remove_old_bus_directories()
+            # Written last: if init fails the next worker tries again
+            with open(marker, "w") as f:
+                f.write(deployment_id)
+            logger.info("Initialised deployment %s for %d workers", deployment_id, settings.workers)
+
+    versions.share(_runtime_path("versions"))
+    bus.start(_runtime_path("bus", deployment_id))
+
+def stop():
+    bus.stop()
@@ -0,0 +1,60 @@
+"""
+Per-request cost of get_current_user with and without the verified-token cache.
+
+    cd backend && python -m benchmarks.bench_auth [--requests 100000] [--tokens 50]
+
+Runs in-process against app.auth, so it needs no LDAP server or database;
+stand-in settings from benchmarks/env.py fill in anything not already in
+the environment.
+"""
+
+import argparse
+import statistics
+import time
+
+from benchmarks import env
+
+env.apply()
+
+from app import auth  # noqa: E402
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def _run(label, check, tokens, requests):
+    samples = []
+    started = time.perf_counter()
+    for index in range(requests):
+        token = tokens[index % len(tokens)]
+        t0 = time.perf_counter_ns()
+        check(token)
+        samples.append(time.perf_counter_ns() - t0)
+    elapsed = time.perf_counter() - started
+    print(
+        f"{label:<10} {requests / elapsed:>12,.0f} req/s   "
+        f"mean {statistics.fmean(samples) / 1000:>7.2f} us   "
+        f"p50 {_percentile(samples, 0.50) / 1000:>7.2f} us   "
+        f"p99 {_percentile(samples, 0.99) / 1000:>7.2f} us"
+    )
+    return statistics.fmean(samples)
+
+def _uncached(token):
+    username, jti, issued_at, _ = auth._verify_token(token)
+    auth._is_revoked(username, jti, issued_at)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100000)
+    parser.add_argument("--tokens", type=int, default=50, help="distinct users sending requests")
+    args = parser.parse_args()
+
+    tokens = [auth.create_access_token({"sub": f"user{i}"}) for i in range(args.tokens)]
+
+    uncached = _run("uncached", _uncached, tokens, args.requests)
+    auth._verified_tokens.clear()
+    cached = _run("cached", auth.authenticate_token, tokens, args.requests)
+    print(f"speedup    {uncached / cached:.1f}x, cache {auth._verified_tokens.stats()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Cost of turning registration rows into a JSON response body, per path.
+
+    cd backend && python -m benchmarks.bench_serialization [--rows 100000] [--repeat 5]
+
+    models     one RegistrationResponse per row, then FastAPI's own
+               response_model validation and serialization, as a route
+               returning models does
+    encoder    REGISTRATION_ENCODER: row tuples straight to JSON bytes
+
+Rows are generated in memory with the types the database driver returns,
+so neither path pays for a query. Both bodies are checked to decode to
+the same JSON before anything is timed.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+
+from benchmarks import env
+
+env.apply()
+
+from fastapi.routing import APIRoute, serialize_response  # noqa: E402
+from app.routers.registrations import REGISTRATION_ENCODER, _row_to_registration, router  # noqa: E402
+from benchmarks import datasets  # noqa: E402
+
+def _rows(count: int):
+    start = datetime(2024, 1, 1)
+    rows = []
+    for n in range(count):
+        registered = start + timedelta(seconds=n * 37, microseconds=n % 1000000)
+        rows.append((
+            str(uuid.UUID(int=n)),
+            datasets.account_number(n),
+            datasets.customer_name(n),
+            f"07{n % 100000000:08d}",
+            f"customer{n}@example.com" if n % 3 == 0 else None,
+            f"1199{n:012d}" if n % 2 == 0 else None,
+            registered,
+            registered,
+            datasets.issuer_name(n),
+            0 if n % datasets.PENDING_EVERY == 0 else 1,
+        ))
+    return rows
+
+def _list_route() -> APIRoute:
+    for route in router.routes:
+        if isinstance(route, APIRoute) and route.path == "/api/registrations/" and "GET" in route.methods:
+            return route
+    raise RuntimeError("GET /api/registrations/ is not registered")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = _rows(args.rows)
+    field = _list_route().response_field
+    loop = asyncio.new_event_loop()
+
+    def models():
+        registrations = [_row_to_registration(row) for row in rows]
+        return loop.run_until_complete(serialize_response(
+            field=field, response_content=registrations, is_coroutine=True, dump_json=True
+        ))
+
+    def encoder():
+        return REGISTRATION_ENCODER.dumps(rows)
+
+    if json.loads(models()) != json.loads(encoder()):
+        raise SystemExit("The two paths produce different JSON")
+
+    results = {}
+    for label, build in (("models", models), ("encoder", encoder)):
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            body = build()
+            timings.append(time.perf_counter() - started)
+        tracemalloc.start()
+        build()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        best = min(timings)
+        results[label] = best
+        print(
+            f"{label:<8} {args.rows:>9,} rows   best {best * 1000:>8.1f} ms   "
+            f"median {statistics.median(timings) * 1000:>8.1f} ms   "
+            f"{args.rows / best:>12,.0f} rows/s   {best / args.rows * 1e6:>5.2f} us/row   peak {peak / 2 ** 20:>7.1f} MiB   "
+            f"body {len(body) / 2 ** 20:.1f} MiB"
+        )
+    print(f"speedup  {results['models'] / results['encoder']:.1f}x")
+
+if __name__ == "__main__":
+    main()
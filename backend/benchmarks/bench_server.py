@@ -0,0 +1,105 @@
+"""
+The real app, wired to the local stand-ins for a load test:
+
+    BENCH_LDAP_USERS=1000 SQLITE_PATH=... python -m uvicorn benchmarks.bench_server:app
+
+It seeds the ldap3 mock with a service account and BENCH_LDAP_USERS
+users (user0, user1, ... all with env.USER_PASSWORD), counts every SQL
+statement the app sends, and adds two routes for the load driver:
+
+    POST /_bench/reset      zero the statement count and the peak RSS
+    GET  /_bench/counters   statements sent and RSS so far
+"""
+
+import os
+import sqlite3
+import threading
+
+from benchmarks import env
+
+env.apply()
+
+from ldap3 import Connection, MOCK_SYNC  # noqa: E402
+from app import auth, database  # noqa: E402
+from app.config import get_settings  # noqa: E402
+
+settings = get_settings()
+
+def seed_directory(users: int):
+    conn = Connection(auth.get_ldap_server(), client_strategy=MOCK_SYNC)
+    conn.strategy.add_entry(settings.ldap_username, {
+        "objectClass": ["user"],
+        "sAMAccountName": "svc-bench",
+        "userPassword": settings.ldap_password,
+    })
+    for n in range(users):
+        username = f"user{n}"
+        conn.strategy.add_entry(f"CN=User {n},OU=Staff,{settings.ldap_base_dn}", {
+            "objectClass": ["user"],
+            "objectCategory": "person",
+            "sAMAccountName": username,
+            "userPrincipalName": f"{username}@{settings.ldap_upn_suffix}",
+            "displayName": f"Bench User {n}",
+            "mail": f"{username}@{settings.ldap_upn_suffix}",
+            "department": f"Branch {n % 40}",
+            "userAccountControl": 512,
+            "whenChanged": "20240101000000.0Z",
+            "userPassword": env.USER_PASSWORD,
+        })
+
+seed_directory(int(os.getenv("BENCH_LDAP_USERS", "1000")))
+
+_statements = 0
+_statements_lock = threading.Lock()
+
+def _count_statement(_sql):
+    global _statements
+    with _statements_lock:
+        _statements += 1
+
+_connect_sqlite = database._connect_sqlite
+
+def _counting_connect(path: str = None) -> sqlite3.Connection:
+    conn = _connect_sqlite(path)
+    # Every statement the app sends is one round trip against a networked server
+    conn.set_trace_callback(_count_statement)
+    return conn
+
+database._connect_sqlite = _counting_connect
+
+from app.main import app  # noqa: E402
+
+def _proc_status() -> dict:
+    values = {}
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                name, _, value = line.partition(":")
+                if name in ("VmRSS", "VmHWM"):
+                    values[name] = int(value.split()[0])
+    except OSError:
+        import resource
+        values["VmHWM"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return values
+
+@app.post("/_bench/reset")
+async def bench_reset():
+    global _statements
+    with _statements_lock:
+        _statements = 0
+    try:
+        # Resets VmHWM to the current RSS so each scenario gets its own peak
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        pass
+    return {"ok": True}
+
+@app.get("/_bench/counters")
+async def bench_counters():
+    status = _proc_status()
+    return {
+        "statements": _statements,
+        "rss_kb": status.get("VmRSS"),
+        "peak_rss_kb": status.get("VmHWM"),
+    }
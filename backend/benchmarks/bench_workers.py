@@ -0,0 +1,170 @@
+"""
+Throughput scaling with the number of uvicorn workers (WORKERS, see
+app/workers.py), against the same local stand-ins as load_test:
+
+    cd backend && python -m benchmarks.bench_workers --workers 1 2 4
+    python -m benchmarks.bench_workers --rows 100000 --scenarios verify stats --duration 10
+
+For each worker count it starts benchmarks.bench_server with that many
+workers and drives each scenario from --clients load-generator processes
+(so the client side is not one GIL), --threads keep-alive connections
+each. It reports throughput, p50/p99 latency and the speedup and scaling
+efficiency (speedup / workers) against the first worker count. Results go
+to benchmarks/results/workers-<timestamp>.json.
+
+Scaling is bounded by the cores left over for the server: on a host with
+fewer cores than workers + clients, expect the speedup to flatten at the
+core count rather than track the worker count.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+
+from benchmarks import env
+
+env.apply()
+
+from benchmarks import datasets  # noqa: E402
+from benchmarks.load_test import (  # noqa: E402
+    HERE, Client, Scenario, _git_commit, _percentile, login, start_server,
+)
+
+SCENARIOS = ("verify", "stats", "list", "search")
+
+def _drive(port, name, rows, ldap_users, token, threads, start, end):
+    """One load-generator process: `threads` connections until `end`; latencies after `start`."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    scenario = Scenario(name, rows, ldap_users, token)
+
+    def worker(_):
+        client = Client(port)
+        state = {}
+        samples = []
+        errors = 0
+        while True:
+            now = time.time()
+            if now >= end:
+                return samples, errors
+            try:
+                status = scenario.send(client, state)[0]
+            except Exception:
+                status = None
+            if now >= start:
+                samples.append(time.time() - now)
+                errors += status != 200
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(worker, range(threads)))
+    return [s for samples, _ in results for s in samples], sum(errors for _, errors in results)
+
+def wait_until_warm(port: int, token: str, workers: int, timeout: float = 600):
+    """Every worker loads its own Bloom filter; new connections spread over them."""
+    deadline = time.time() + timeout
+    ready_in_a_row = 0
+    while time.time() < deadline:
+        status, _, body = Client(port).request(
+            "GET", "/api/registrations/verify-cache/stats", headers={"Authorization": f"Bearer {token}"}
+        )
+        if status == 200 and json.loads(body).get("bloom_ready"):
+            ready_in_a_row += 1
+            if ready_in_a_row >= 8 * workers:
+                return
+        else:
+            ready_in_a_row = 0
+            time.sleep(0.5)
+    raise RuntimeError("Verify Bloom filters did not finish loading")
+
+def run_scenario(pool, port, args, name, token) -> dict:
+    start = time.time() + 1 + args.warmup
+    end = start + args.duration
+    jobs = [
+        pool.apply_async(_drive, (port, name, args.rows, args.ldap_users, token, args.threads, start, end))
+        for _ in range(args.clients)
+    ]
+    samples, errors = [], 0
+    for job in jobs:
+        job_samples, job_errors = job.get()
+        samples.extend(job_samples)
+        errors += job_errors
+    samples.sort()
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "throughput_rps": round(len(samples) / args.duration, 1),
+        "latency_ms": {
+            "p50": round(_percentile(samples, 0.50) * 1000, 3) if samples else None,
+            "p99": round(_percentile(samples, 0.99) * 1000, 3) if samples else None,
+        },
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--clients", type=int, default=4, help="load-generator processes")
+    parser.add_argument("--threads", type=int, default=8, help="connections per load-generator process")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds before each scenario")
+    parser.add_argument("--ldap-users", type=int, default=1000)
+    parser.add_argument("--data-dir", default=os.path.join(HERE, "data"))
+    parser.add_argument("--output", default=os.path.join(HERE, "results"))
+    args = parser.parse_args()
+
+    results = {
+        "suite": "api-workers",
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("data_dir", "output")},
+        "runs": [],
+    }
+    if max(args.workers) + args.clients > (os.cpu_count() or 1):
+        print(f"Note: {os.cpu_count()} CPUs for up to {max(args.workers)} workers and {args.clients} "
+              "load generators; scaling will be CPU-bound")
+
+    db_path = datasets.build(args.data_dir, args.rows)
+    baseline = {}
+    os.makedirs(args.output, exist_ok=True)
+    with multiprocessing.Pool(args.clients) as pool:
+        for workers in args.workers:
+            log_path = os.path.join(args.data_dir, f"server-workers-{workers}.log")
+            process, port = start_server(db_path, args.ldap_users, log_path, workers=workers)
+            try:
+                token = login(port)
+                wait_until_warm(port, token, workers)
+                run = {"workers": workers, "scenarios": {}}
+                for name in args.scenarios:
+                    metrics = run_scenario(pool, port, args, name, token)
+                    baseline.setdefault(name, (workers, metrics["throughput_rps"]))
+                    base_workers, base_rps = baseline[name]
+                    speedup = metrics["throughput_rps"] / base_rps if base_rps else 0
+                    metrics["speedup"] = round(speedup, 2)
+                    metrics["efficiency"] = round(speedup * base_workers / workers, 2)
+                    run["scenarios"][name] = metrics
+                    print(
+                        f"{workers:>2} workers {name:<7} {metrics['throughput_rps']:>9,.0f} req/s  "
+                        f"p50 {metrics['latency_ms']['p50'] or 0:>8.2f}  p99 {metrics['latency_ms']['p99'] or 0:>8.2f} ms  "
+                        f"x{metrics['speedup']:<5.2f} efficiency {metrics['efficiency']:>4.0%}  errors {metrics['errors']}"
+                    )
+                results["runs"].append(run)
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+
+    output = os.path.join(args.output, f"workers-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
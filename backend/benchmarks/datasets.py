@@ -0,0 +1,110 @@
+"""
+Synthetic SQLite databases for the load tests, built once per size and
+reused by later runs.
+
+Rows are generated inside SQLite with a recursive CTE, so a 10M-row
+database costs minutes rather than hours of Python inserts. Row n gets
+account number `account_number(n)`, a registration date that increases
+with n over the last two years, one of ISSUERS issuers, and every
+PENDING_EVERY-th row is left pending.
+"""
+
+import os
+import time
+from datetime import datetime, timedelta
+
+ISSUERS = 200
+PENDING_EVERY = 50
+HISTORY_DAYS = 730
+BATCH_ROWS = 500000
+
+# Accounts the load test registers live outside the generated range
+NEW_ACCOUNT_PREFIX = "9"
+
+def account_number(n: int) -> str:
+    return f"1{n:011d}"
+
+def customer_name(n: int) -> str:
+    return f"Customer {n}"
+
+def issuer_name(n: int) -> str:
+    return f"user{n % ISSUERS}"
+
+def dataset_path(data_dir: str, rows: int) -> str:
+    return os.path.join(data_dir, f"registrations-{rows}.db")
+
+def _row_count(conn) -> int:
+    try:
+        return conn.execute("SELECT COUNT(*) FROM registrations").fetchone()[0]
+    except Exception:
+        return -1
+
+_GENERATE_SQL = f"""
+    WITH RECURSIVE seq(n) AS (
+        SELECT ? UNION ALL SELECT n + 1 FROM seq WHERE n + 1 < ?
+    )
+    INSERT INTO registrations (
+        id, account_number, full_name, phone_number, email, id_number,
+        registration_date, created_at, issued_by, is_issued
+    )
+    SELECT
+        printf('%08x-0000-4000-8000-%012x', n / 4294967296, n),
+        printf('1%011d', n),
+        'Customer ' || n,
+        printf('07%08d', n % 100000000),
+        CASE WHEN n % 3 = 0 THEN 'customer' || n || '@example.com' END,
+        CASE WHEN n % 2 = 0 THEN printf('1199%012d', n) END,
+        datetime(?, '+' || CAST(n * ? AS INTEGER) || ' seconds'),
+        datetime(?, '+' || CAST(n * ? AS INTEGER) || ' seconds'),
+        'user' || (n % {ISSUERS}),
+        CASE WHEN n % {PENDING_EVERY} = 0 THEN 0 ELSE 1 END
+    FROM seq
+"""
+
+def build(data_dir: str, rows: int, log=print) -> str:
+    """Return the path of a database holding exactly `rows` generated registrations."""
+    from app.database import _connect_sqlite
+    from app.migrations import migrate
+    from app.stats import rebuild_counters
+
+    os.makedirs(data_dir, exist_ok=True)
+    path = dataset_path(data_dir, rows)
+    if os.path.exists(path):
+        conn = _connect_sqlite(path)
+        try:
+            migrate(conn)
+            existing = _row_count(conn)
+            # Earlier load tests may have registered NEW_ACCOUNT_PREFIX accounts on top
+            generated = conn.execute(
+                "SELECT COUNT(*) FROM registrations WHERE account_number < ?",
+                (NEW_ACCOUNT_PREFIX,)
+            ).fetchone()[0]
+        finally:
+            conn.close()
+        if generated == rows:
+            log(f"Reusing {path} ({existing:,} rows)")
+            return path
+        os.remove(path)
+
+    started = time.perf_counter()
+    conn = _connect_sqlite(path)
+    try:
+        # A throwaway file: trade durability for load speed
+        conn.execute("PRAGMA synchronous=OFF")
+        migrate(conn)
+        start = (datetime.now() - timedelta(days=HISTORY_DAYS)).strftime("%Y-%m-%d %H:%M:%S")
+        step = HISTORY_DAYS * 86400 / max(rows, 1)
+        for offset in range(0, rows, BATCH_ROWS):
+            conn.execute(_GENERATE_SQL, (offset, min(offset + BATCH_ROWS, rows), start, step, start, step))
+            conn.commit()
+            log(f"  {min(offset + BATCH_ROWS, rows):,} / {rows:,} rows")
+        rebuild_counters(conn)
+        conn.execute("ANALYZE")
+        conn.commit()
+    except BaseException:
+        conn.close()
+        os.remove(path)
+        raise
+    conn.close()
+    log(f"Built {path} in {time.perf_counter() - started:.0f}s")
+    return path
@@ -0,0 +1,32 @@
+"""
+Settings for running the app against local stand-ins: SQLite instead of
+SQL Server and the ldap3 offline mock instead of bk.local. Import this
+before anything under `app`, which reads its settings at import time.
+"""
+
+import os
+
+BENCH_ENV = {
+    "DRIVER": "ODBC Driver 17 for SQL Server",
+    "DB_SERVER": "localhost",
+    "DB_NAME": "bench",
+    "DB_USERNAME": "bench",
+    "DB_PASSWORD": "bench",
+    "DB_BACKEND": "sqlite",
+    "LDAP_SERVER": "ldap://bench.local",
+    "LDAP_STRATEGY": "mock",
+    "LDAP_BASE_DN": "DC=bench,DC=local",
+    "LDAP_UPN_SUFFIX": "bench.local",
+    "LDAP_USERNAME": "CN=svc-bench,OU=Service,DC=bench,DC=local",
+    "LDAP_PASSWORD": "bench-service",
+    "JWT_SECRET": "bench-secret",
+}
+
+# Password of every synthetic directory user
+USER_PASSWORD = "bench-password"
+
+def apply(overrides: dict = None) -> dict:
+    """Fill in stand-in settings the environment does not already set; returns the result."""
+    for name, value in {**BENCH_ENV, **(overrides or {})}.items():
+        os.environ.setdefault(name, value)
+    return {name: os.environ[name] for name in {**BENCH_ENV, **(overrides or {})}}
@@ -0,0 +1,104 @@
+"""
+Concurrency check for POST /api/registrations/: many clients register the
+same account number at the same instant against a running server.
+
+    cd backend && python -m benchmarks.hammer_register --url http://localhost:9000 --clients 50
+    python -m benchmarks.hammer_register --shared-key   # every client retries one request
+
+With distinct Idempotency-Keys exactly one client must win and the rest
+must get 400; with --shared-key every client must get the winner's
+response back. Any 5xx (e.g. a UNIQUE violation leaking through) or a
+/stats total that moved by more than one fails the run. Tokens are minted
+locally, so JWT_SECRET must match the server's.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("JWT_SECRET", "bench-secret")
+for name in ("DRIVER", "DB_SERVER", "DB_NAME", "DB_USERNAME", "DB_PASSWORD", "LDAP_SERVER", "LDAP_BASE_DN"):
+    os.environ.setdefault(name, "unused")
+
+from app.auth import create_access_token  # noqa: E402
+
+def _request(url, token, method="GET", body=None, headers=None):
+    request = urllib.request.Request(url, method=method, data=body)
+    request.add_header("Authorization", f"Bearer {token}")
+    request.add_header("Content-Type", "application/json")
+    for name, value in (headers or {}).items():
+        request.add_header(name, value)
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.status, json.loads(response.read() or b"null")
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b"null")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:9000")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--account", default=None, help="defaults to a fresh random account number")
+    parser.add_argument("--shared-key", action="store_true", help="send one Idempotency-Key from every client")
+    args = parser.parse_args()
+
+    token = create_access_token({"sub": "hammer"})
+    account = args.account or str(uuid.uuid4().int)[:12]
+    body = json.dumps({
+        "account_number": account,
+        "full_name": "Hammer Test",
+        "phone_number": "0788000000",
+    }).encode()
+    shared_key = uuid.uuid4().hex
+
+    status, before = _request(f"{args.url}/api/registrations/stats", token)
+    if status != 200:
+        print(f"GET /stats failed with {status}: {before}")
+        return 1
+
+    barrier = threading.Barrier(args.clients)
+
+    def client(_):
+        key = shared_key if args.shared_key else uuid.uuid4().hex
+        barrier.wait()
+        started = time.perf_counter()
+        status, payload = _request(
+            f"{args.url}/api/registrations/", token, "POST", body, {"Idempotency-Key": key}
+        )
+        return status, payload, time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        results = list(pool.map(client, range(args.clients)))
+
+    _, after = _request(f"{args.url}/api/registrations/stats", token)
+    statuses = Counter(status for status, _, _ in results)
+    ids = {payload["id"] for status, payload, _ in results if status == 200}
+    latencies = sorted(elapsed for _, _, elapsed in results)
+    print(f"account {account}, {args.clients} clients: {dict(statuses)}")
+    print(f"latency p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, max {latencies[-1] * 1000:.1f} ms")
+
+    failures = []
+    if any(status >= 500 for status in statuses):
+        failures.append("server errors")
+    if len(ids) != 1:
+        failures.append(f"{len(ids)} distinct registrations returned")
+    if args.shared_key and statuses[200] != args.clients:
+        failures.append("idempotent retries did not all replay the original response")
+    if not args.shared_key and (statuses[200] != 1 or statuses[400] != args.clients - 1):
+        failures.append("expected one success and the rest rejected")
+    if after["total_registrations"] - before["total_registrations"] > 1:
+        failures.append("total_registrations moved by more than one")
+
+    print("FAIL: " + "; ".join(failures) if failures else "OK")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
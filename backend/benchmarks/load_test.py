@@ -0,0 +1,386 @@
+"""
+Load test for the API against local stand-ins (SQLite + ldap3 mock).
+
+    cd backend && python -m benchmarks.load_test --rows 10000 1000000 10000000
+    python -m benchmarks.load_test --rows 10000 --duration 5 --scenarios verify stats
+    python -m benchmarks.load_test --rows 10000 --baseline benchmarks/results/<earlier>.json
+
+For each dataset size it builds (or reuses) a synthetic database, starts
+benchmarks.bench_server under uvicorn in a child process and drives
+concurrent load at each scenario in turn:
+
+    token      POST /token for a random directory user
+    verify     GET /api/registrations/verify/<account>, 10% unregistered
+    stats      GET /api/registrations/stats
+    list       GET /api/registrations/, following X-Next-Cursor for up to 10 pages
+    search     GET /api/registrations/ with an account prefix, name prefix or
+               issuer filter and with_total, as the dashboard search box sends
+    register   POST /api/registrations/ with a fresh account number
+
+It reports throughput, p50/p95/p99 latency, peak server RSS and SQL
+statements (round trips) per request. Results go to
+benchmarks/results/load-<timestamp>.json. --baseline compares against
+an earlier result file and flags throughput drops or p99 increases
+beyond --tolerance.
+
+The load generator is a thread pool in this process, separate from the
+server's, using keep-alive connections from the standard library.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import env
+
+env.apply()
+
+from benchmarks import datasets  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BACKEND = os.path.dirname(HERE)
+
+SCENARIOS = ("token", "verify", "stats", "list", "search", "register")
+
+class Client:
+    """One keep-alive connection per load thread."""
+
+    def __init__(self, port: int):
+        self.port = port
+        self.conn = None
+
+    def request(self, method: str, path: str, body: bytes = None, headers: dict = None):
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=60)
+            try:
+                self.conn.request(method, path, body=body, headers=headers or {})
+                response = self.conn.getresponse()
+                return response.status, response.getheaders(), response.read()
+            except (http.client.HTTPException, OSError):
+                # The server may have closed an idle keep-alive connection
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+
+class Scenario:
+    """Builds requests for one endpoint; `state` is per load thread."""
+
+    def __init__(self, name: str, rows: int, ldap_users: int, token: str):
+        self.name = name
+        self.rows = rows
+        self.ldap_users = ldap_users
+        self.auth = {"Authorization": f"Bearer {token}"}
+        self._sequence = 0
+        self._sequence_lock = threading.Lock()
+        self._run_id = f"{int(time.time()) % 100000:05d}"
+
+    def _next_sequence(self) -> int:
+        with self._sequence_lock:
+            self._sequence += 1
+            return self._sequence
+
+    def send(self, client: Client, state: dict):
+        return getattr(self, f"_{self.name}")(client, state)
+
+    def _token(self, client, state):
+        form = urllib.parse.urlencode({
+            "username": f"user{random.randrange(self.ldap_users)}",
+            "password": env.USER_PASSWORD,
+        })
+        return client.request("POST", "/token", form.encode(), {
+            "Content-Type": "application/x-www-form-urlencoded",
+        })
+
+    def _verify(self, client, state):
+        if random.random() < 0.1:
+            account = f"{datasets.NEW_ACCOUNT_PREFIX}8{random.randrange(10 ** 10):010d}"
+        else:
+            account = datasets.account_number(random.randrange(self.rows))
+        return client.request("GET", f"/api/registrations/verify/{account}", headers=self.auth)
+
+    def _stats(self, client, state):
+        return client.request("GET", "/api/registrations/stats", headers=self.auth)
+
+    def _list(self, client, state):
+        path = "/api/registrations/?limit=100"
+        if state.get("cursor") and state.get("pages", 0) < 10:
+            path += "&after=" + urllib.parse.quote(state["cursor"])
+            state["pages"] += 1
+        else:
+            state["pages"] = 0
+        result = client.request("GET", path, headers=self.auth)
+        state["cursor"] = dict(result[1]).get("X-Next-Cursor") or dict(result[1]).get("x-next-cursor")
+        return result
+
+    def _search(self, client, state):
+        row = random.randrange(self.rows)
+        kind = random.random()
+        if kind < 0.5:
+            account = datasets.account_number(row)
+            params = {"account_prefix": account[:random.randint(6, len(account))]}
+        elif kind < 0.8:
+            name = datasets.customer_name(row)
+            params = {"name": name[:random.randint(len(name) - 3, len(name))]}
+        else:
+            params = {"issued_by": datasets.issuer_name(row)}
+        query = urllib.parse.urlencode({**params, "limit": 10, "with_total": "true"})
+        return client.request("GET", f"/api/registrations/?{query}", headers=self.auth)
+
+    def _register(self, client, state):
+        sequence = self._next_sequence()
+        body = json.dumps({
+            "account_number": f"{datasets.NEW_ACCOUNT_PREFIX}{self._run_id}{sequence:06d}",
+            "full_name": f"Load Test {sequence}",
+            "phone_number": "0788000000",
+        })
+        return client.request("POST", "/api/registrations/", body.encode(), {
+            **self.auth, "Content-Type": "application/json",
+        })
+
+def _percentile(ordered, fraction):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def run_scenario(port: int, scenario: Scenario, concurrency: int, duration: float, warmup: float) -> dict:
+    control = Client(port)
+    deadline_box = {}
+    samples = []
+    errors = []
+    samples_lock = threading.Lock()
+
+    def worker(_):
+        client = Client(port)
+        state = {}
+        local_samples = []
+        local_errors = []
+        measuring = False
+        while True:
+            now = time.perf_counter()
+            if now >= deadline_box["end"]:
+                break
+            if not measuring and now >= deadline_box["start"]:
+                measuring = True
+            started = time.perf_counter()
+            try:
+                status, _, _ = scenario.send(client, state)
+            except Exception as e:
+                status = f"{type(e).__name__}"
+            elapsed = time.perf_counter() - started
+            if measuring:
+                local_samples.append(elapsed)
+                if status != 200:
+                    local_errors.append(status)
+        with samples_lock:
+            samples.extend(local_samples)
+            errors.extend(local_errors)
+
+    # Warm up caches and connections, then zero the server counters and measure
+    now = time.perf_counter()
+    deadline_box["start"] = now + warmup
+    deadline_box["end"] = now + warmup + duration
+    reset_at = threading.Timer(warmup, lambda: control.request("POST", "/_bench/reset"))
+    reset_at.start()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    reset_at.join()
+    _, _, body = control.request("GET", "/_bench/counters")
+    counters = json.loads(body)
+
+    samples.sort()
+    requests = len(samples)
+    error_counts = {}
+    for status in errors:
+        error_counts[str(status)] = error_counts.get(str(status), 0) + 1
+    return {
+        "requests": requests,
+        "errors": error_counts,
+        "throughput_rps": round(requests / duration, 1),
+        "latency_ms": {
+            "mean": round(sum(samples) / requests * 1000, 3) if requests else None,
+            "p50": round(_percentile(samples, 0.50) * 1000, 3) if requests else None,
+            "p95": round(_percentile(samples, 0.95) * 1000, 3) if requests else None,
+            "p99": round(_percentile(samples, 0.99) * 1000, 3) if requests else None,
+            "max": round(samples[-1] * 1000, 3) if requests else None,
+        },
+        "db_round_trips_per_request": round(counters["statements"] / requests, 2) if requests else None,
+        "peak_rss_mb": round(counters["peak_rss_kb"] / 1024, 1) if counters.get("peak_rss_kb") else None,
+    }
+
+def _free_port() -> int:
+    import socket
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server(db_path: str, ldap_users: int, log_path: str, workers: int = 1):
+    port = _free_port()
+    server_env = {
+        **os.environ,
+        "SQLITE_PATH": db_path,
+        "BENCH_LDAP_USERS": str(ldap_users),
+        "WORKERS": str(workers),
+        "PYTHONPATH": BACKEND + os.pathsep + os.environ.get("PYTHONPATH", ""),
+    }
+    log = open(log_path, "w")
+    # app.serve rather than uvicorn --workers, see its docstring
+    launcher = ["app.serve"] if workers > 1 else ["uvicorn"]
+    process = subprocess.Popen(
+        [sys.executable, "-m", *launcher, "benchmarks.bench_server:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND, env=server_env, stdout=log, stderr=subprocess.STDOUT
+    )
+    client = Client(port)
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited during startup, see {log_path}")
+        try:
+            if client.request("GET", "/")[0] == 200:
+                return process, port
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"Server did not start within 120s, see {log_path}")
+
+def login(port: int) -> str:
+    form = urllib.parse.urlencode({"username": "user0", "password": env.USER_PASSWORD})
+    status, _, body = Client(port).request("POST", "/token", form.encode(), {
+        "Content-Type": "application/x-www-form-urlencoded",
+    })
+    if status != 200:
+        raise RuntimeError(f"Login against the mock directory failed: {status} {body[:200]!r}")
+    return json.loads(body)["access_token"]
+
+def wait_until_warm(port: int, token: str, timeout: float = 600):
+    """Measure steady state: wait for the background Bloom filter load to finish."""
+    client = Client(port)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status, _, body = client.request(
+            "GET", "/api/registrations/verify-cache/stats", headers={"Authorization": f"Bearer {token}"}
+        )
+        if status == 200 and json.loads(body).get("bloom_ready"):
+            return
+        time.sleep(0.5)
+    raise RuntimeError("Verify Bloom filter did not finish loading")
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Return human-readable regressions of `results` against `baseline`."""
+    previous = {
+        (dataset["rows"], name): metrics
+        for dataset in baseline.get("datasets", [])
+        for name, metrics in dataset["scenarios"].items()
+    }
+    regressions = []
+    for dataset in results["datasets"]:
+        for name, metrics in dataset["scenarios"].items():
+            before = previous.get((dataset["rows"], name))
+            if not before or not before["requests"] or not metrics["requests"]:
+                continue
+            throughput = metrics["throughput_rps"] / before["throughput_rps"] - 1
+            p99 = metrics["latency_ms"]["p99"] / before["latency_ms"]["p99"] - 1
+            line = (
+                f"{dataset['rows']:>10,} {name:<9} throughput {throughput:+7.1%}  p99 {p99:+7.1%}"
+            )
+            print(line)
+            if throughput < -tolerance or p99 > tolerance:
+                regressions.append(line)
+    return regressions
+
+def _print_row(rows: int, name: str, metrics: dict):
+    latency = metrics["latency_ms"]
+    print(
+        f"{rows:>10,} {name:<9} {metrics['throughput_rps']:>9,.0f} req/s  "
+        f"p50 {latency['p50'] or 0:>8.2f}  p95 {latency['p95'] or 0:>8.2f}  p99 {latency['p99'] or 0:>8.2f} ms  "
+        f"{metrics['db_round_trips_per_request'] or 0:>5.2f} trips/req  "
+        f"{metrics['peak_rss_mb'] or 0:>7.1f} MB  errors {sum(metrics['errors'].values())}"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000],
+                        help="dataset sizes, e.g. 10000 1000000 10000000")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds before each scenario")
+    parser.add_argument("--ldap-users", type=int, default=1000)
+    parser.add_argument("--data-dir", default=os.path.join(HERE, "data"))
+    parser.add_argument("--output", default=os.path.join(HERE, "results"))
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="relative throughput drop or p99 rise counted as a regression")
+    args = parser.parse_args()
+
+    results = {
+        "suite": "api-load",
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "ldap_users": args.ldap_users,
+            "scenarios": args.scenarios,
+        },
+        "datasets": [],
+    }
+
+    os.makedirs(args.output, exist_ok=True)
+    for rows in args.rows:
+        db_path = datasets.build(args.data_dir, rows)
+        log_path = os.path.join(args.data_dir, f"server-{rows}.log")
+        process, port = start_server(db_path, args.ldap_users, log_path)
+        try:
+            token = login(port)
+            wait_until_warm(port, token)
+            dataset = {"rows": rows, "scenarios": {}}
+            for name in args.scenarios:
+                scenario = Scenario(name, rows, args.ldap_users, token)
+                metrics = run_scenario(port, scenario, args.concurrency, args.duration, args.warmup)
+                dataset["scenarios"][name] = metrics
+                _print_row(rows, name, metrics)
+            results["datasets"].append(dataset)
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    output = os.path.join(args.output, f"load-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""
+Tests run against the local stand-ins from benchmarks/env.py: SQLite in a
+throwaway directory instead of SQL Server, and the ldap3 offline mock.
+
+    cd backend && python -m pytest -q
+"""
+
+import os
+import tempfile
+
+from benchmarks import env
+
+# Settings are read when `app` is first imported, so set them before that
+os.environ.update({
+    **env.BENCH_ENV,
+    "SQLITE_PATH": os.path.join(tempfile.mkdtemp(prefix="free-statement-tests-"), "test.db"),
+    "RUNTIME_DIR": tempfile.mkdtemp(prefix="free-statement-runtime-"),
+    "LOG_LEVEL": "WARNING",
+})
+
+import pytest  # noqa: E402
+
+@pytest.fixture(scope="session")
+def schema():
+    from app.database import init_db
+    init_db()
+
+@pytest.fixture(scope="session")
+def directory():
+    """Seed the ldap3 mock: the service account plus User1 (mixed case, as AD keeps it)."""
+    from ldap3 import Connection, MOCK_SYNC
+    from app import auth
+    from app.config import get_settings
+
+    settings = get_settings()
+    conn = Connection(auth.get_ldap_server(), client_strategy=MOCK_SYNC)
+    conn.strategy.add_entry(settings.ldap_username, {
+        "objectClass": ["user"],
+        "sAMAccountName": "svc-bench",
+        "userPassword": settings.ldap_password,
+    })
+    conn.strategy.add_entry(f"CN=User One,OU=Staff,{settings.ldap_base_dn}", {
+        "objectClass": ["user"],
+        "objectCategory": "person",
+        "sAMAccountName": "User1",
+        "userPrincipalName": f"user1@{settings.ldap_upn_suffix}",
+        "displayName": "User One",
+        "userAccountControl": 512,
+        "userPassword": env.USER_PASSWORD,
+    })
+
+@pytest.fixture
+def client(schema):
+    """A TestClient signed in as "tester"; startup tasks are not run."""
+    from fastapi.testclient import TestClient
+    from app.auth import create_access_token
+    from app.main import app
+
+    return TestClient(app, headers={"Authorization": f"Bearer {create_access_token({'sub': 'tester'})}"})
@@ -0,0 +1,73 @@
+"""Slow handlers must not hold up each other: DB calls and LDAP binds run off the event loop."""
+
+import asyncio
+import time
+
+import httpx
+
+from app.auth import create_access_token
+from app.main import app
+from app.routers import registrations
+
+LATENCY = 0.2
+REQUESTS = 5
+
+async def _concurrently(send) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        started = time.perf_counter()
+        responses = await asyncio.gather(*(send(client) for _ in range(REQUESTS)))
+        elapsed = time.perf_counter() - started
+    assert [response.status_code for response in responses] == [200] * REQUESTS
+    return elapsed
+
+def test_slow_queries_overlap(schema, monkeypatch):
+    read_stats = registrations._get_registration_stats
+
+    def slow_read_stats(conn, today=None):
+        time.sleep(LATENCY)
+        return read_stats(conn, today)
+
+    monkeypatch.setattr(registrations, "_get_registration_stats", slow_read_stats)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'alice'})}"}
+    elapsed = asyncio.run(_concurrently(
+        lambda client: client.get("/api/registrations/stats", headers=headers)
+    ))
+    # Serialised on the event loop this would take REQUESTS * LATENCY
+    assert elapsed < REQUESTS * LATENCY / 2
+
+def test_slow_logins_overlap(monkeypatch):
+    def slow_bind(username, password):
+        time.sleep(LATENCY)
+        return username
+
+    monkeypatch.setattr("app.main.authenticate_user", slow_bind)
+    elapsed = asyncio.run(_concurrently(
+        lambda client: client.post("/token", data={"username": "alice", "password": "secret"})
+    ))
+    assert elapsed < REQUESTS * LATENCY / 2
+
+def test_stalled_streams_leave_slots_for_other_calls(schema, monkeypatch):
+    from app import async_db
+    monkeypatch.setattr(async_db.settings, "db_max_concurrency", 2)
+    monkeypatch.setattr(async_db.settings, "db_max_streams", 1)
+
+    async def run():
+        db = async_db.AsyncDB()
+        # A download whose client stopped reading after the first batch
+        stalled = db.stream("SELECT 1", batch_size=1)
+        assert await stalled.__anext__() == [(1,)]
+        waiting = db.stream("SELECT 2", batch_size=1)
+        try:
+            # The second stream queues for the stream slot without taking a call slot...
+            second = asyncio.ensure_future(waiting.__anext__())
+            await asyncio.sleep(0.1)
+            assert not second.done()
+            # ...so ordinary calls still run
+            assert await asyncio.wait_for(db.run(lambda conn: conn.execute("SELECT 3").fetchone()), 1) == (3,)
+            await stalled.aclose()
+            assert await asyncio.wait_for(second, 1) == [(2,)]
+        finally:
+            await waiting.aclose()
+
+    asyncio.run(run())
@@ -0,0 +1,47 @@
+"""Tokens are issued to one canonical name per account, so revoking it cuts off every login form."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import auth
+from app.main import app
+from benchmarks import env
+
+@pytest.mark.parametrize("login", ["USER1", "user1", "user1@bench.local"])
+def test_revoke_user_covers_every_login_form(schema, directory, login):
+    with TestClient(app) as client:
+        response = client.post("/token", data={"username": login, "password": env.USER_PASSWORD})
+        assert response.status_code == 200
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        assert auth.authenticate_token(response.json()["access_token"]) == "user1"
+        assert client.get("/api/issuers/", headers=headers).status_code == 200
+
+        # What directory sync calls when the account is disabled in AD
+        auth.revoke_user("User1")
+        assert client.get("/api/issuers/", headers=headers).status_code == 401
+
+def _count_searches(monkeypatch) -> list:
+    searches = []
+    find_user = auth._find_user
+    monkeypatch.setattr(auth, "_find_user", lambda username: searches.append(username) or find_user(username))
+    return searches
+
+def test_search_bind_needs_no_second_lookup(directory, monkeypatch):
+    monkeypatch.setattr(auth.settings, "ldap_bind_strategies", "search")
+    searches = _count_searches(monkeypatch)
+    assert auth.authenticate_user("USER1", env.USER_PASSWORD) == "user1"
+    assert searches == ["USER1"]
+
+@pytest.mark.parametrize("login, searched", [
+    ("User1", []),
+    ("BENCH\\User1", []),
+    # Only a UPN's prefix can differ from the sAMAccountName
+    ("user1@bench.local", ["user1@bench.local"]),
+])
+def test_upn_bind_searches_only_for_upns(directory, monkeypatch, login, searched):
+    monkeypatch.setattr(auth.settings, "ldap_bind_strategies", "upn")
+    # The offline mock binds by DN only; stand in for AD accepting the UPN
+    monkeypatch.setattr(auth, "_bind_as", lambda user, password: (password == env.USER_PASSWORD, {}))
+    searches = _count_searches(monkeypatch)
+    assert auth.authenticate_user(login, env.USER_PASSWORD) == "user1"
+    assert searches == searched
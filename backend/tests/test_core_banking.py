@@ -0,0 +1,118 @@
+"""AccountLookup against a fake provider: single-flight, batching, timeouts and the circuit breaker."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app import core_banking
+from app.core_banking import FOUND, NOT_FOUND, UNAVAILABLE, AccountLookup, AccountProvider
+from app.models import AccountDetails
+
+class FakeProvider(AccountProvider):
+    """Knows the accounts in `known`; `latency` and `failing` can be changed between calls."""
+
+    def __init__(self, known=(), latency: float = 0):
+        self.known = set(known)
+        self.latency = latency
+        self.failing = False
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def fetch_accounts(self, account_numbers):
+        with self._lock:
+            self.calls.append(list(account_numbers))
+        time.sleep(self.latency)
+        if self.failing:
+            raise ConnectionError("upstream down")
+        return {
+            account_number: AccountDetails(full_name=f"Customer {account_number}", phone_number="0788000000")
+            for account_number in account_numbers if account_number in self.known
+        }
+
+@pytest.fixture
+def make_lookup(monkeypatch):
+    settings = core_banking.settings
+    monkeypatch.setattr(settings, "core_banking_batch_window", 0.02)
+    monkeypatch.setattr(settings, "core_banking_timeout", 1)
+    lookups = []
+
+    def make(provider, **overrides):
+        for name, value in overrides.items():
+            monkeypatch.setattr(settings, f"core_banking_{name}", value)
+        lookup = AccountLookup(provider)
+        lookups.append(lookup)
+        return lookup
+
+    yield make
+    for lookup in lookups:
+        lookup.close()
+
+def _gather(lookup, account_numbers):
+    async def run():
+        return await asyncio.gather(*(lookup.lookup(account_number) for account_number in account_numbers))
+    return asyncio.run(run())
+
+def test_concurrent_lookups_of_one_account_share_a_call(make_lookup):
+    provider = FakeProvider(known={"100"}, latency=0.05)
+    lookup = make_lookup(provider)
+
+    results = _gather(lookup, ["100"] * 5)
+    assert provider.calls == [["100"]]
+    assert {status for status, _ in results} == {FOUND}
+
+    # Cached afterwards, found and not found alike
+    assert _gather(lookup, ["100", "200"])[0][0] == FOUND
+    assert _gather(lookup, ["200"]) == [(NOT_FOUND, None)]
+    assert provider.calls == [["100"], ["200"]]
+
+def test_lookups_in_one_window_go_up_together(make_lookup):
+    provider = FakeProvider(known={"1", "3", "5"})
+    lookup = make_lookup(provider, batch_size=3)
+
+    accounts = [str(n) for n in range(1, 8)]
+    results = _gather(lookup, accounts)
+    # Full batches go at once, the rest when the window closes
+    assert provider.calls == [["1", "2", "3"], ["4", "5", "6"], ["7"]]
+    assert [status for status, _ in results] == [FOUND, NOT_FOUND, FOUND, NOT_FOUND, FOUND, NOT_FOUND, NOT_FOUND]
+
+def test_slow_upstream_times_out_as_unavailable(make_lookup):
+    provider = FakeProvider(known={"100"}, latency=0.5)
+    lookup = make_lookup(provider, timeout=0.1)
+
+    started = time.monotonic()
+    assert _gather(lookup, ["100"]) == [(UNAVAILABLE, None)]
+    assert time.monotonic() - started < 0.4
+    assert lookup.breaker.failures == 1
+    # Unavailable is not cached: the next lookup asks again
+    provider.latency = 0
+    assert _gather(lookup, ["100"])[0][0] == FOUND
+
+def test_breaker_opens_then_half_opens_then_closes(make_lookup):
+    provider = FakeProvider(known={"100"})
+    provider.failing = True
+    lookup = make_lookup(provider, failure_threshold=2, reset_timeout=0.1)
+
+    assert _gather(lookup, ["1"]) == [(UNAVAILABLE, None)]
+    assert lookup.breaker.state == "closed"
+    assert _gather(lookup, ["2"]) == [(UNAVAILABLE, None)]
+    assert lookup.breaker.state == "open"
+
+    # Open: fail fast without calling upstream
+    calls = len(provider.calls)
+    assert _gather(lookup, ["3"]) == [(UNAVAILABLE, None)]
+    assert len(provider.calls) == calls
+
+    # After the reset timeout one trial goes through; failing, it opens again
+    time.sleep(0.1)
+    assert _gather(lookup, ["4"]) == [(UNAVAILABLE, None)]
+    assert len(provider.calls) == calls + 1
+    assert lookup.breaker.state == "open"
+
+    # A successful trial closes it
+    time.sleep(0.1)
+    provider.failing = False
+    assert _gather(lookup, ["100"])[0][0] == FOUND
+    assert lookup.breaker.state == "closed"
+    assert lookup.breaker.failures == 0
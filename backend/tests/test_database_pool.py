@@ -0,0 +1,115 @@
+"""ConnectionPool over SQLite: leasing, timeouts, recycling and health checks."""
+
+import sqlite3
+import time
+
+import pytest
+
+from app.database import PoolTimeout, sqlite_pool
+
+@pytest.fixture
+def make_pool(tmp_path):
+    pools = []
+
+    def make(**kwargs):
+        pool = sqlite_pool(str(tmp_path / "pool.db"), **{"min_size": 0, **kwargs})
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.close()
+
+def test_close_returns_the_connection(make_pool):
+    pool = make_pool(max_size=1)
+    conn = pool.acquire()
+    raw = conn.raw
+    conn.close()
+
+    assert pool.stats() == {"size": 1, "idle": 1, "in_use": 0, "max_size": 1}
+    # Still open, and the next caller gets the same one
+    raw.execute("SELECT 1")
+    again = pool.acquire()
+    assert again is conn and again.raw is raw
+    again.close()
+
+def test_close_rolls_back_an_open_transaction(make_pool):
+    pool = make_pool(max_size=1)
+    conn = pool.acquire()
+    conn.execute("CREATE TABLE IF NOT EXISTS t (x INTEGER)")
+    conn.commit()
+    conn.execute("INSERT INTO t VALUES (1)")
+    conn.close()
+
+    conn = pool.acquire()
+    assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+    conn.close()
+
+def test_exhausted_pool_times_out(make_pool):
+    pool = make_pool(max_size=2, timeout=0.2)
+    leased = [pool.acquire(), pool.acquire()]
+
+    started = time.monotonic()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    assert 0.2 <= time.monotonic() - started < 1
+    assert pool.stats()["size"] == 2
+
+    # A returned connection unblocks the next caller
+    leased.pop().close()
+    leased.append(pool.acquire(timeout=0))
+    for conn in leased:
+        conn.close()
+
+def test_expired_connections_are_recycled(make_pool):
+    pool = make_pool(max_size=1, max_lifetime=0.05)
+    conn = pool.acquire()
+    old_raw = conn.raw
+    time.sleep(0.1)
+    # Too old to go back in the pool
+    conn.close()
+    assert pool.stats()["size"] == 0
+    with pytest.raises(sqlite3.ProgrammingError):
+        old_raw.execute("SELECT 1")
+
+    conn = pool.acquire()
+    assert conn.raw is not old_raw
+    conn.close()
+
+def test_idle_connection_expiring_in_the_pool_is_replaced(make_pool):
+    pool = make_pool(max_size=1, max_lifetime=0.05)
+    conn = pool.acquire()
+    old_raw = conn.raw
+    conn.close()
+    time.sleep(0.1)
+
+    conn = pool.acquire()
+    assert conn.raw is not old_raw
+    assert pool.stats()["size"] == 1
+    conn.close()
+
+def test_connection_failing_the_ping_is_discarded(make_pool):
+    pool = make_pool(max_size=1, ping_after=0)
+    conn = pool.acquire()
+    dead_raw = conn.raw
+    conn.close()
+    # The server dropped it while it sat idle
+    dead_raw.close()
+
+    conn = pool.acquire()
+    assert conn.raw is not dead_raw
+    assert conn.execute("SELECT 1").fetchone() == (1,)
+    assert pool.stats()["size"] == 1
+    conn.close()
+
+def test_recently_used_connection_skips_the_ping(make_pool):
+    pool = make_pool(max_size=1, ping_after=60)
+    conn = pool.acquire()
+    raw = conn.raw
+    conn.close()
+    raw.close()
+
+    # Returned moments ago, so it is handed out without a health check
+    conn = pool.acquire()
+    assert conn.raw is raw
+    conn.close()
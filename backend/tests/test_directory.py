@@ -0,0 +1,20 @@
+"""Searches over a DirectorySnapshot."""
+
+from app.directory import DirectorySnapshot
+from app.models import ADUser
+
+def _snapshot() -> DirectorySnapshot:
+    names = {"jdoe": "John Doe", "Amutoni": "Alice Mutoni", "bkalisa": "Bosco Kalisa", "adoe": "Anne Doe"}
+    return DirectorySnapshot({username: ADUser(username=username, display_name=name) for username, name in names.items()})
+
+def test_blank_search_lists_users_in_username_order():
+    snapshot = _snapshot()
+    assert [user.username for user in snapshot.search("", 3)] == ["Amutoni", "adoe", "bkalisa"]
+    assert [user.username for user in snapshot.search("   ", 10)] == ["Amutoni", "adoe", "bkalisa", "jdoe"]
+    assert snapshot.search(None, 2) == snapshot.search("", 2)
+
+def test_prefix_hits_rank_before_substring_hits():
+    snapshot = _snapshot()
+    assert [user.username for user in snapshot.search("doe", 10)] == ["adoe", "jdoe"]
+    assert [user.username for user in snapshot.search("mut", 10)] == ["Amutoni"]
+    assert [user.username for user in snapshot.search("a", 10)] == ["adoe", "Amutoni"]
@@ -0,0 +1,33 @@
+"""Event streams register their subscriber only once the body is being sent."""
+
+import asyncio
+
+from app import events
+
+def _subscribers() -> int:
+    with events._lock:
+        return len(events._subscribers)
+
+def test_unstarted_stream_leaves_no_subscriber():
+    async def abandon():
+        # What the endpoint hands to StreamingResponse for a client that hangs up at once
+        body = events.stream(events.latest_id())
+        await body.aclose()
+
+    asyncio.run(abandon())
+    assert _subscribers() == 0
+
+def test_stream_replays_what_came_before_it_started():
+    async def connect():
+        body = events.stream(events.latest_id())
+        events.publish("registration", {"account_number": "1234567890"})
+        chunks = [await body.__anext__(), await body.__anext__()]
+        subscribed = _subscribers()
+        await body.aclose()
+        return chunks, subscribed
+
+    chunks, subscribed = asyncio.run(connect())
+    assert chunks[0].startswith(b"retry:")
+    assert b"event: registration" in chunks[1]
+    assert subscribed == 1
+    assert _subscribers() == 0
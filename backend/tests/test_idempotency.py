@@ -0,0 +1,107 @@
+"""Concurrent duplicate registrations against SQLite: one winner, and Idempotency-Key replays."""
+
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+import httpx
+
+from app import idempotency
+from app.async_db import AsyncDB
+from app.auth import create_access_token
+from app.database import get_db_connection
+from app.main import app
+
+CLIENTS = 20
+
+HEADERS = {"Authorization": f"Bearer {create_access_token({'sub': 'hammer'})}"}
+
+def _body() -> dict:
+    return {
+        "account_number": str(uuid.uuid4().int)[:12],
+        "full_name": "Hammer Test",
+        "phone_number": "0788000000",
+    }
+
+async def _register_concurrently(body: dict, keys) -> tuple:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=HEADERS) as client:
+        before = (await client.get("/api/registrations/stats")).json()
+        responses = await asyncio.gather(*(
+            client.post("/api/registrations/", json=body, headers={"Idempotency-Key": key}) for key in keys
+        ))
+        after = (await client.get("/api/registrations/stats")).json()
+    return responses, before, after
+
+def _count_rows(account_number: str) -> int:
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM registrations WHERE account_number = ?", (account_number,))
+        return cursor.fetchone()[0]
+    finally:
+        conn.close()
+
+def _issuer_count(stats: dict) -> int:
+    return next((stat["count"] for stat in stats["branch_stats"] if stat["branch"] == "hammer"), 0)
+
+def _assert_counted_once(before: dict, after: dict):
+    for field in ("total_registrations", "issued_registrations", "todays_registrations"):
+        assert after[field] - before[field] == 1, field
+    assert _issuer_count(after) - _issuer_count(before) == 1
+
+def test_distinct_keys_register_once(schema):
+    body = _body()
+    responses, before, after = asyncio.run(
+        _register_concurrently(body, [uuid.uuid4().hex for _ in range(CLIENTS)])
+    )
+
+    statuses = sorted(response.status_code for response in responses)
+    assert statuses == [200] + [400] * (CLIENTS - 1)
+    assert _count_rows(body["account_number"]) == 1
+    _assert_counted_once(before, after)
+
+def test_shared_key_replays_the_winner(schema):
+    body = _body()
+    responses, before, after = asyncio.run(_register_concurrently(body, [uuid.uuid4().hex] * CLIENTS))
+
+    assert [response.status_code for response in responses] == [200] * CLIENTS
+    assert len({response.content for response in responses}) == 1
+    assert _count_rows(body["account_number"]) == 1
+    _assert_counted_once(before, after)
+
+def test_expired_keys_are_purged_while_running(schema, monkeypatch):
+    monkeypatch.setattr(idempotency.settings, "idempotency_purge_interval", 0.05)
+    key = uuid.uuid4().hex
+
+    def insert_expired(conn):
+        cursor = conn.cursor()
+        created_at = datetime.now() - timedelta(seconds=idempotency.settings.idempotency_key_ttl + 60)
+        cursor.execute("""
+            INSERT INTO idempotency_keys (idempotency_key, issued_by, request_hash, response_body, created_at)
+            VALUES (?, 'hammer', '', '{}', ?)
+        """, (key, created_at))
+        conn.commit()
+        cursor.close()
+
+    def stored(conn):
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM idempotency_keys WHERE idempotency_key = ?", (key,))
+        count = cursor.fetchone()[0]
+        cursor.close()
+        return count
+
+    async def run():
+        db = AsyncDB()
+        purger = asyncio.ensure_future(idempotency.keep_purged(db))
+        try:
+            # Let the startup purge go by, then expire a key behind its back
+            await asyncio.sleep(0.02)
+            await db.run(insert_expired)
+            assert await db.run(stored) == 1
+            await asyncio.sleep(0.2)
+            return await db.run(stored)
+        finally:
+            purger.cancel()
+
+    assert asyncio.run(run()) == 0
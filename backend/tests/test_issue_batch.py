@@ -0,0 +1,61 @@
+"""POST /api/registrations/issue-batch: per-key results over several chunked UPDATE ... RETURNING statements."""
+
+import uuid
+
+from app.database import get_db_connection
+from app.routers import registrations
+
+def _register_pending(client, count: int):
+    """Bulk-register `count` pending rows; returns their (id, account number) pairs."""
+    accounts = [str(uuid.uuid4().int)[:12] for _ in range(count)]
+    response = client.post("/api/registrations/bulk", json={"registrations": [
+        {"account_number": account_number, "full_name": "Batch Row", "phone_number": "0788000000"}
+        for account_number in accounts
+    ]})
+    assert response.json()["success"] == count
+    return [(result["id"], result["account_number"]) for result in response.json()["results"]]
+
+def _issued(ids) -> dict:
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT id, is_issued FROM registrations WHERE id IN ({', '.join('?' * len(ids))})", ids)
+        return {registration_id: bool(is_issued) for registration_id, is_issued in cursor.fetchall()}
+    finally:
+        conn.close()
+
+def test_each_key_is_classified(client, monkeypatch):
+    # Several UPDATEs per list, with keys of every kind split across them
+    monkeypatch.setattr(registrations, "LOOKUP_CHUNK_SIZE", 2)
+    rows = _register_pending(client, 6)
+    ids = [registration_id for registration_id, _ in rows]
+    accounts = [account_number for _, account_number in rows]
+    assert client.patch(f"/api/registrations/{ids[1]}/issue").status_code == 200
+    assert client.patch(f"/api/registrations/{ids[4]}/issue").status_code == 200
+    missing_id, missing_account = str(uuid.uuid4()), "000000000000"
+    before = client.get("/api/registrations/stats").json()["issued_registrations"]
+
+    response = client.post("/api/registrations/issue-batch", json={
+        # Repeats and padding are dropped, first occurrence wins the order
+        "ids": [ids[0], ids[1], missing_id, f" {ids[2]} ", ids[0]],
+        "account_numbers": [accounts[3], missing_account, accounts[4], accounts[5], ""],
+    })
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "issued": [ids[0], ids[2], accounts[3], accounts[5]],
+        "already_issued": [ids[1], accounts[4]],
+        "not_found": [missing_id, missing_account],
+    }
+    assert _issued(ids) == dict.fromkeys(ids, True)
+    assert client.get("/api/registrations/stats").json()["issued_registrations"] - before == 4
+
+    # A retry issues nothing more
+    retry = client.post("/api/registrations/issue-batch", json={"ids": [ids[0]], "account_numbers": [accounts[5]]})
+    assert retry.json() == {"issued": [], "already_issued": [ids[0], accounts[5]], "not_found": []}
+
+def test_empty_and_oversized_batches_are_rejected(client, monkeypatch):
+    assert client.post("/api/registrations/issue-batch", json={"ids": [" "], "account_numbers": []}).status_code == 400
+    monkeypatch.setattr(registrations.settings, "issue_batch_max_size", 2)
+    response = client.post("/api/registrations/issue-batch", json={"ids": ["a", "b"], "account_numbers": ["c"]})
+    assert response.status_code == 413
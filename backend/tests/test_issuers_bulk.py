@@ -0,0 +1,51 @@
+"""Bulk issuer inserts through the cursor the pool hands out while metrics are enabled."""
+
+from app import metrics
+from app.database import PooledConnection
+from app.models import IssuerCreate
+from app.routers import issuers
+
+class FakePyodbcCursor:
+    """Just enough of a pyodbc cursor: the fast_executemany flag and executemany()."""
+
+    def __init__(self):
+        self.fast_executemany = False
+        self.batches = []
+
+    def executemany(self, sql, params):
+        # pyodbc only sends the batch in one round trip if the flag is set by now
+        self.batches.append((self.fast_executemany, list(params)))
+
+    def close(self):
+        pass
+
+class FakePyodbcConnection:
+    def __init__(self):
+        self.cursors = []
+        self.committed = False
+
+    def cursor(self):
+        cursor = FakePyodbcCursor()
+        self.cursors.append(cursor)
+        return cursor
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        pass
+
+def test_bulk_insert_through_instrumented_cursor(monkeypatch):
+    monkeypatch.setattr(metrics, "enabled", True)
+    raw = FakePyodbcConnection()
+    conn = PooledConnection(None, raw)
+    assert isinstance(conn.cursor(), metrics.InstrumentedCursor)
+
+    batch = [IssuerCreate(name=f"user{n}", branch_id="001") for n in range(3)]
+    ids = issuers._create_issuers(conn, batch)
+
+    assert raw.committed
+    (fast, params), = raw.cursors[-1].batches
+    assert fast
+    assert [row[0] for row in params] == ids
+    assert [row[1] for row in params] == ["user0", "user1", "user2"]
@@ -0,0 +1,73 @@
+"""With several workers, a Bloom negative is only trusted while no other worker has written since the last sync."""
+
+import os
+import uuid
+from datetime import datetime
+
+import pytest
+
+from app import registration_cache, versions
+from app.database import get_db_connection
+
+@pytest.fixture
+def shared_versions(tmp_path, monkeypatch):
+    for name in ("_shared", "_shared_fd", "_boot"):
+        monkeypatch.setattr(versions, name, getattr(versions, name))
+    path = str(tmp_path / "versions")
+    versions.create_shared(path)
+    versions.share(path)
+    yield
+    os.close(versions._shared_fd)
+
+def _register_elsewhere(conn, account_number: str):
+    """A registration committed by another worker whose bus message never arrived."""
+    now = datetime.now()
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO registrations (id, account_number, full_name, phone_number, registration_date,"
+        " created_at, issued_by, is_issued) VALUES (?, ?, 'Other Worker', '0788000000', ?, ?, 'bob', 0)",
+        (str(uuid.uuid4()), account_number, now, now)
+    )
+    conn.commit()
+    cursor.close()
+    versions.bump("registrations")
+
+def test_missed_registration_is_not_reported_unregistered(schema, shared_versions):
+    account_number = "7" + uuid.uuid4().hex[:11].translate(str.maketrans("abcdef", "123456"))
+    conn = get_db_connection()
+    try:
+        registration_cache.load_registered_accounts(conn)
+        assert registration_cache.lookup(account_number)[:2] == (True, None)
+
+        _register_elsewhere(conn, account_number)
+        # Out of sync: verify has to ask the DB
+        assert registration_cache.lookup(account_number)[0] is False
+
+        registration_cache.refresh_registered_accounts(conn)
+        assert registration_cache.cache_stats()["bloom_in_sync"]
+        assert account_number in registration_cache.registered_accounts
+    finally:
+        conn.close()
+
+def _account_number() -> str:
+    return "7" + uuid.uuid4().hex[:11].translate(str.maketrans("abcdef", "123456"))
+
+def test_own_writes_keep_the_filter_trusted(schema, shared_versions):
+    conn = get_db_connection()
+    try:
+        registration_cache.load_registered_accounts(conn)
+    finally:
+        conn.close()
+    unregistered = _account_number()
+    negatives = registration_cache.bloom_negatives
+
+    # What the register route does after its commit
+    registration_cache.remember(_account_number(), ("Own Worker", "0788000000", datetime.now(), True))
+    registration_cache.bump_version()
+    assert registration_cache.lookup(unregistered)[:2] == (True, None)
+    assert registration_cache.bloom_negatives == negatives + 1
+
+    # A bump from another worker in between still stops the filter being trusted
+    versions.bump("registrations")
+    registration_cache.bump_version()
+    assert registration_cache.lookup(unregistered)[0] is False
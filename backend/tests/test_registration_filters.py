@@ -0,0 +1,100 @@
+"""Server-side filters of GET /api/registrations/: prefix ranges, escaped LIKE, date ranges and totals."""
+
+import uuid
+from datetime import datetime
+
+import pytest
+
+from app.database import get_db_connection
+from app.routers import registrations
+
+@pytest.fixture
+def seeded(schema):
+    """
+    Rows under an issuer of their own, so other tests' rows never match:
+    returns (issuer, account prefix).
+    """
+    issuer = f"filters-{uuid.uuid4().hex[:8]}"
+    prefix = "8" + str(uuid.uuid4().int)[:7]
+    # The next prefix up must not match
+    neighbour = str(int(prefix) + 1)
+    rows = [
+        (prefix + "01", "50% Off", datetime(2024, 3, 1, 23, 59, 59), 1, issuer),
+        (prefix + "02", "50X Off", datetime(2024, 3, 2, 0, 0, 0), 0, issuer),
+        (prefix + "03", "a_b Traders", datetime(2024, 3, 2, 12, 0, 0), 0, issuer),
+        (prefix + "04", "AxB Traders", datetime(2024, 3, 3, 0, 0, 0), 1, issuer),
+        (neighbour + "01", "50% Neighbour", datetime(2024, 3, 2, 6, 0, 0), 0, issuer + "-other"),
+    ]
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.executemany("""
+            INSERT INTO registrations (id, account_number, full_name, phone_number, registration_date,
+                                       created_at, issued_by, is_issued)
+            VALUES (?, ?, ?, '0788000000', ?, ?, ?, ?)
+        """, [(str(uuid.uuid4()), account, name, day, day, issued_by, issued)
+              for account, name, day, issued, issued_by in rows])
+        conn.commit()
+    finally:
+        conn.close()
+    return issuer, prefix
+
+def _names(client, **params):
+    response = client.get("/api/registrations/", params=params)
+    assert response.status_code == 200, response.text
+    return [row["full_name"] for row in response.json()]
+
+def test_account_prefix_is_a_key_range(client, seeded):
+    issuer, prefix = seeded
+    assert _names(client, account_prefix=prefix) == ["AxB Traders", "a_b Traders", "50X Off", "50% Off"]
+    assert _names(client, account_prefix=prefix + "0", issued_by=issuer, status="pending") == [
+        "a_b Traders", "50X Off",
+    ]
+    assert _names(client, account_prefix=prefix + "05") == []
+    assert client.get("/api/registrations/", params={"account_prefix": "12a"}).status_code == 422
+
+def test_name_wildcards_are_matched_literally(client, seeded):
+    issuer, _ = seeded
+    # % and _ are data, not LIKE wildcards; case is ignored
+    assert _names(client, issued_by=issuer, name="50%") == ["50% Off"]
+    assert _names(client, issued_by=issuer, name="A_B") == ["a_b Traders"]
+    assert _names(client, issued_by=issuer, name="axb") == ["AxB Traders"]
+    assert _names(client, issued_by=issuer, name="50") == ["50X Off", "50% Off"]
+
+def test_date_range_includes_both_days(client, seeded):
+    issuer, _ = seeded
+    assert _names(client, issued_by=issuer, date_from="2024-03-02", date_to="2024-03-02") == [
+        "a_b Traders", "50X Off",
+    ]
+    assert _names(client, issued_by=issuer, date_to="2024-03-01") == ["50% Off"]
+    assert _names(client, issued_by=issuer, date_from="2024-03-03") == ["AxB Traders"]
+    response = client.get("/api/registrations/", params={"date_from": "2024-03-03", "date_to": "2024-03-02"})
+    assert response.status_code == 400
+
+def _total(client, **params):
+    response = client.get("/api/registrations/", params={**params, "with_total": "true"})
+    assert response.status_code == 200, response.text
+    return int(response.headers["X-Total-Count"]), response.headers["X-Total-Count-Exact"] == "true"
+
+def test_totals_are_exact_or_flagged_as_capped(client, seeded, monkeypatch):
+    issuer, prefix = seeded
+    # Prefix filters are counted exactly while choosing their plan
+    assert _total(client, account_prefix=prefix) == (4, True)
+    # No counter answers issuer + status: a capped COUNT(*)
+    assert _total(client, issued_by=issuer, status="pending") == (2, True)
+    monkeypatch.setattr(registrations.settings, "registrations_count_limit", 1)
+    assert _total(client, issued_by=issuer, status="pending") == (1, False)
+
+def test_broad_prefix_walks_the_date_index(client, seeded, monkeypatch):
+    issuer, prefix = seeded
+    monkeypatch.setattr(registrations.settings, "registrations_sort_limit", 2)
+    monkeypatch.setattr(registrations.settings, "registrations_count_limit", 3)
+    response = client.get("/api/registrations/", params={"account_prefix": prefix, "limit": 3, "with_total": "true"})
+    # Same rows in the same order as the sorted plan, and the count falls back to the capped one
+    assert [row["full_name"] for row in response.json()] == ["AxB Traders", "a_b Traders", "50X Off"]
+    assert (response.headers["X-Total-Count"], response.headers["X-Total-Count-Exact"]) == ("3", "false")
+
+    next_page = client.get("/api/registrations/", params={
+        "account_prefix": prefix, "limit": 3, "after": response.headers["X-Next-Cursor"],
+    })
+    assert [row["full_name"] for row in next_page.json()] == ["50% Off"]
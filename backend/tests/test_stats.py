@@ -0,0 +1,99 @@
+"""The counter rows behind /stats stay equal to COUNT(*) over registrations through every write path."""
+
+import uuid
+from collections import Counter
+
+from app import stats
+from app.database import get_db_connection
+
+def _account_number() -> str:
+    return str(uuid.uuid4().int)[:12]
+
+def _query(sql: str, params=()):
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+    finally:
+        conn.close()
+
+def _query_commit(sql: str):
+    conn = get_db_connection()
+    try:
+        conn.execute(sql)
+        conn.commit()
+    finally:
+        conn.close()
+
+def _counted() -> dict:
+    """Every counter, straight from COUNT(*) over registrations."""
+    expected = Counter()
+    (total, issued), = _query("SELECT COUNT(*), COALESCE(SUM(is_issued), 0) FROM registrations")
+    expected["total"], expected["issued"] = total, issued
+    for day, count in _query("SELECT date(registration_date), COUNT(*) FROM registrations GROUP BY date(registration_date)"):
+        expected[stats.day_key(day)] = count
+    for issued_by, count in _query("SELECT issued_by, COUNT(*) FROM registrations GROUP BY issued_by"):
+        expected[stats.issuer_key(issued_by)] = count
+    return {key: value for key, value in expected.items() if value}
+
+def _counters() -> dict:
+    return {key: value for key, value in _query("SELECT counter_key, counter_value FROM registration_counters") if value}
+
+def _rebuild():
+    conn = get_db_connection()
+    try:
+        stats.rebuild_counters(conn)
+    finally:
+        conn.close()
+
+def test_write_paths_keep_counters_exact(client):
+    # Other tests insert rows behind the counters' back; start from a clean slate
+    _rebuild()
+    assert _counters() == _counted()
+
+    # Register: a new, issued registration
+    response = client.post("/api/registrations/", json={
+        "account_number": _account_number(), "full_name": "Counted Once", "phone_number": "0788000001",
+    })
+    assert response.status_code == 200
+    assert _counters() == _counted()
+
+    # Bulk: pending registrations
+    bulk = [_account_number() for _ in range(4)]
+    response = client.post("/api/registrations/bulk", json={"registrations": [
+        {"account_number": account_number, "full_name": "Bulk Row", "phone_number": "0788000002"}
+        for account_number in bulk
+    ]})
+    assert response.json()["success"] == 4
+    ids = [result["id"] for result in response.json()["results"]]
+    assert _counters() == _counted()
+
+    # Register over a pending row moves it to today's date and this issuer
+    response = client.post("/api/registrations/", json={
+        "account_number": bulk[0], "full_name": "Bulk Row", "phone_number": "0788000002",
+    })
+    assert response.status_code == 200
+    assert _counters() == _counted()
+
+    # Issue one, then a batch that includes it again
+    assert client.patch(f"/api/registrations/{ids[1]}/issue").status_code == 200
+    assert _counters() == _counted()
+    response = client.post("/api/registrations/issue-batch", json={"ids": ids[1:3], "account_numbers": [bulk[3]]})
+    assert response.status_code == 200
+    assert _counters() == _counted()
+
+def test_rebuild_reproduces_the_counters(client, capsys):
+    client.post("/api/registrations/bulk", json={"registrations": [
+        {"account_number": _account_number(), "full_name": "Bulk Row", "phone_number": "0788000003"}
+    ]})
+    _rebuild()
+    maintained = _counters()
+
+    # Lose and skew some counters, then rebuild from the command line
+    _query_commit("DELETE FROM registration_counters WHERE counter_key LIKE 'day:%'")
+    _query_commit("UPDATE registration_counters SET counter_value = counter_value + 5 WHERE counter_key = 'total'")
+    assert stats.main(["app.stats", "rebuild"]) == 0
+    assert "Rebuilt" in capsys.readouterr().out
+
+    assert _counters() == maintained == _counted()
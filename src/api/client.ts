@@ -1,6 +1,6 @@
 import axios from 'axios';
 import { formatDateForSQL, isValidDate } from '../utils/dateUtils';
-import { ADUser, Registrant, AccountVerification } from '../types';
+import { ADUser, Registrant, AccountVerification, DashboardStats, IssuerCreate } from '../types';
 
 const API_URL = import.meta.env.VITE_API_URL || 'http://10.24.37.99:9000';
 
@@ -78,8 +78,8 @@ api.interceptors.request.use((config) => {
     config.headers.Authorization = `Bearer ${token}`;
   }
   
-  // Format dates for SQL if present in request body
-  if (config.data && typeof config.data === 'object') {
+  // Format dates for SQL if present in request body (file uploads pass through untouched)
+  if (config.data && typeof config.data === 'object' && !(config.data instanceof FormData)) {
     // Create a shallow copy of the data to avoid modifying the original
     const processedData = { ...config.data };
     
@@ -114,6 +114,18 @@ export const login = async (username: string, password: string) => {
   }
 };
 
+// Revoke the current token server-side; the caller clears local state either way
+export const logout = async (token: string) => {
+  try {
+    // Plain axios: the token is about to leave localStorage, and a 401 here must not redirect
+    await axios.post(`${API_URL}/logout`, null, {
+      headers: { Authorization: `Bearer ${token}` },
+    });
+  } catch (error) {
+    console.error('Error logging out:', error);
+  }
+};
+
 // Verify account and check if already registered
 export const verifyAccount = async (accountNumber: string): Promise<AccountVerification> => {
   try {
@@ -131,7 +143,7 @@ export const registerAccount = async (registrationData: {
   phoneNumber: string;
   email?: string;
   idNumber?: string;
-}): Promise<Registrant> => {
+}, idempotencyKey?: string): Promise<Registrant> => {
   try {
     const response = await api.post('/api/registrations/', {
       account_number: registrationData.accountNumber,
@@ -139,6 +151,9 @@ export const registerAccount = async (registrationData: {
       phone_number: registrationData.phoneNumber,
       email: registrationData.email,
       id_number: registrationData.idNumber
+    }, {
+      // Retries of the same submission get the original result back
+      headers: idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : undefined
     });
 
     return {
@@ -159,7 +174,7 @@ export const registerAccount = async (registrationData: {
 };
 
 // Get dashboard stats
-export const getDashboardStats = async () => {
+export const getDashboardStats = async (): Promise<DashboardStats> => {
   try {
     const response = await api.get('/api/registrations/stats');
     return response.data;
@@ -168,38 +183,180 @@ export const getDashboardStats = async () => {
   }
 };
 
-// Get all registrations
-export const getRegistrations = async (issuedOnly: boolean = false): Promise<Registrant[]> => {
+// Change to the /stats figures carried by every registration event
+export interface StatsDelta {
+  total_registrations?: number;
+  todays_registrations?: number;
+  issued_registrations?: number;
+  issuers: Record<string, number>;
+}
+
+export interface RegistrationEvent {
+  type: 'registration' | 'registrations' | 'issued' | 'reset';
+  data: { stats?: StatsDelta; [key: string]: any };
+}
+
+export const applyStatsDelta = (stats: DashboardStats, delta: StatsDelta): DashboardStats => {
+  const counts = new Map(stats.branch_stats.map(({ branch, count }) => [branch, count]));
+  Object.entries(delta.issuers).forEach(([branch, change]) => {
+    counts.set(branch, (counts.get(branch) || 0) + change);
+  });
+  return {
+    total_registrations: stats.total_registrations + (delta.total_registrations || 0),
+    todays_registrations: stats.todays_registrations + (delta.todays_registrations || 0),
+    issued_registrations: (stats.issued_registrations || 0) + (delta.issued_registrations || 0),
+    branch_stats: Array.from(counts, ([branch, count]) => ({ branch, count }))
+      .filter(({ count }) => count > 0)
+      .sort((a, b) => b.count - a.count)
+  };
+};
+
+/**
+ * Follow GET /api/registrations/events until the returned function is called.
+ * EventSource can't send the Authorization header, so the stream is read with
+ * fetch; reconnects send Last-Event-ID so missed events are replayed.
+ */
+export const subscribeToRegistrationEvents = (onEvent: (event: RegistrationEvent) => void) => {
+  const controller = new AbortController();
+  let lastEventId: string | null = null;
+  let retryMs = 3000;
+
+  const dispatch = (block: string) => {
+    let id: string | null = null;
+    let type = 'message';
+    const data: string[] = [];
+    for (const line of block.split('\n')) {
+      if (!line || line.startsWith(':')) continue;  // heartbeat comments
+      const separator = line.indexOf(':');
+      const field = separator < 0 ? line : line.slice(0, separator);
+      const value = separator < 0 ? '' : line.slice(separator + 1).replace(/^ /, '');
+      if (field === 'id') id = value;
+      else if (field === 'event') type = value;
+      else if (field === 'data') data.push(value);
+      else if (field === 'retry' && Number(value) > 0) retryMs = Number(value);
+    }
+    if (id !== null) lastEventId = id;
+    if (data.length) onEvent({ type, data: JSON.parse(data.join('\n')) } as RegistrationEvent);
+  };
+
+  const follow = async () => {
+    while (!controller.signal.aborted) {
+      try {
+        const headers: Record<string, string> = { Accept: 'text/event-stream' };
+        const token = localStorage.getItem('token');
+        if (token) headers.Authorization = `Bearer ${token}`;
+        if (lastEventId) headers['Last-Event-ID'] = lastEventId;
+        const response = await fetch(`${API_URL}/api/registrations/events`, { headers, signal: controller.signal });
+        if (response.status === 401) return;
+        if (response.ok && response.body) {
+          const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+          let buffer = '';
+          for (;;) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += value;
+            let end;
+            while ((end = buffer.indexOf('\n\n')) >= 0) {
+              dispatch(buffer.slice(0, end));
+              buffer = buffer.slice(end + 2);
+            }
+          }
+        }
+      } catch (err) {
+        if (controller.signal.aborted) return;
+      }
+      // The server closed the stream or couldn't be reached: try again shortly
+      await new Promise(resolve => setTimeout(resolve, retryMs));
+    }
+  };
+
+  follow();
+  return () => controller.abort();
+};
+
+export interface RegistrationQuery {
+  accountPrefix?: string;
+  name?: string;
+  issuedBy?: string;
+  dateFrom?: string;
+  dateTo?: string;
+  status?: 'all' | 'issued' | 'pending';
+  limit?: number;
+  after?: string | null;
+  withTotal?: boolean;
+}
+
+export interface RegistrationPage {
+  items: Registrant[];
+  nextCursor: string | null;
+  // Null unless withTotal was asked for; when not exact it is a lower bound
+  total: number | null;
+  totalExact: boolean;
+}
+
+const toRegistrant = (reg: any): Registrant => ({
+  id: reg.id || '',
+  accountNumber: reg.account_number || '',
+  fullName: reg.full_name || '',
+  phoneNumber: reg.phone_number || '',
+  email: reg.email || null,
+  idNumber: reg.id_number || null,
+  registrationDate: reg.registration_date || new Date().toISOString(),
+  issuedBy: reg.issued_by || '',
+  branch: 'Head Office',
+  hasStatement: 0,
+  isIssued: reg.is_issued === true || reg.is_issued === 1
+});
+
+// Digits search account numbers, anything else customer names
+export const searchFilter = (term: string): Pick<RegistrationQuery, 'accountPrefix' | 'name'> => {
+  const trimmed = term.trim();
+  if (!trimmed) return {};
+  return /^\d+$/.test(trimmed) ? { accountPrefix: trimmed } : { name: trimmed };
+};
+
+// One page of registrations, filtered and counted on the server
+export const searchRegistrations = async (query: RegistrationQuery = {}): Promise<RegistrationPage> => {
   try {
     const response = await api.get('/api/registrations/', {
-      params: issuedOnly ? { issued_only: true } : undefined
+      params: {
+        account_prefix: query.accountPrefix || undefined,
+        name: query.name || undefined,
+        issued_by: query.issuedBy || undefined,
+        date_from: query.dateFrom || undefined,
+        date_to: query.dateTo || undefined,
+        status: query.status || 'all',
+        limit: query.limit || undefined,
+        after: query.after || undefined,
+        with_total: query.withTotal || undefined
+      }
     });
-    
+
     // Check if response.data is an array
     if (!Array.isArray(response.data)) {
       console.error('Expected an array of registrations, got:', response.data);
-      return [];
+      return { items: [], nextCursor: null, total: null, totalExact: true };
     }
-    
-    return response.data.map((reg: any) => ({
-      id: reg.id || '',
-      accountNumber: reg.account_number || '',
-      fullName: reg.full_name || '',
-      phoneNumber: reg.phone_number || '',
-      email: reg.email || null,
-      idNumber: reg.id_number || null,
-      registrationDate: reg.registration_date || new Date().toISOString(),
-      issuedBy: reg.issued_by || '',
-      branch: 'Head Office',
-      hasStatement: 0,
-      isIssued: reg.is_issued === true || reg.is_issued === 1
-    }));
+
+    const total = response.headers['x-total-count'];
+    return {
+      items: response.data.map(toRegistrant),
+      nextCursor: response.headers['x-next-cursor'] || null,
+      total: total !== undefined ? Number(total) : null,
+      totalExact: response.headers['x-total-count-exact'] !== 'false'
+    };
   } catch (error: any) {
     console.error('Error fetching registrations:', error);
-    throw new Error(error.response?.data?.detail || 'Failed to fetch registrations');
+    throw new Error(error.response?.data?.detail || error.message || 'Failed to fetch registrations');
   }
 };
 
+// Get the newest page of registrations
+export const getRegistrations = async (issuedOnly: boolean = false): Promise<Registrant[]> => {
+  const page = await searchRegistrations({ status: issuedOnly ? 'issued' : 'all' });
+  return page.items;
+};
+
 // Get AD users
 export const getADUsers = async (searchTerm?: string): Promise<ADUser[]> => {
   try {
@@ -212,47 +369,153 @@ export const getADUsers = async (searchTerm?: string): Promise<ADUser[]> => {
   }
 };
 
-// For implementing bulk registration 
+// Register many pending accounts in one set-based request
 export const createBulkRegistrations = async (
   data: Array<{
     accountNumber: string;
     customerName: string;
     phoneNumber: string;
-  }>,
-  branchId: string,
-  issuerId: string
+  }>
 ) => {
   try {
-    // This endpoint is not implemented in the backend yet
-    // This is a placeholder implementation
-    console.log("Would send bulk registration data:", { data, branchId, issuerId });
-    
-    // Mock successful response
+    const response = await api.post('/api/registrations/bulk', {
+      registrations: data.map(row => ({
+        account_number: row.accountNumber,
+        full_name: row.customerName,
+        phone_number: row.phoneNumber
+      }))
+    });
+
     return {
-      success: data.length,
-      failed: 0,
-      errors: []
+      success: response.data.success,
+      failed: response.data.failed,
+      errors: response.data.results
+        .filter((result: any) => result.status !== 'created')
+        .map((result: any) => `Row ${result.row} (${result.account_number}): ${result.detail}`)
     };
   } catch (error: any) {
     throw new Error(error.response?.data?.detail || 'Failed to process bulk registrations');
   }
 };
 
+export interface BulkUploadJob {
+  id: string;
+  filename: string;
+  status: 'queued' | 'running' | 'completed' | 'failed';
+  rows_processed: number;
+  success: number;
+  failed: number;
+  errors: string[];
+  detail?: string | null;
+}
+
+// Upload a raw CSV/XLSX file; the server parses and registers it in the background
+export const uploadBulkRegistrations = async (file: File): Promise<BulkUploadJob> => {
+  try {
+    const formData = new FormData();
+    formData.append('file', file);
+    const response = await api.post('/api/registrations/upload', formData, {
+      headers: { 'Content-Type': 'multipart/form-data' }
+    });
+    return response.data;
+  } catch (error: any) {
+    throw new Error(error.response?.data?.detail || error.message || 'Failed to upload file');
+  }
+};
+
+export const getBulkUploadJob = async (jobId: string): Promise<BulkUploadJob> => {
+  try {
+    const response = await api.get(`/api/registrations/upload/${jobId}`);
+    return response.data;
+  } catch (error: any) {
+    throw new Error(error.response?.data?.detail || error.message || 'Failed to fetch upload status');
+  }
+};
+
+export interface RegistrationExportFilters
+  extends Omit<RegistrationQuery, 'limit' | 'after' | 'withTotal'> {
+  format?: 'csv' | 'xlsx';
+}
+
+// Download a server-generated report; the server streams it, so any size works
+export const exportRegistrations = async (filters: RegistrationExportFilters = {}) => {
+  const format = filters.format || 'csv';
+  try {
+    const response = await api.get('/api/registrations/export', {
+      params: {
+        format,
+        account_prefix: filters.accountPrefix || undefined,
+        name: filters.name || undefined,
+        date_from: filters.dateFrom || undefined,
+        date_to: filters.dateTo || undefined,
+        issued_by: filters.issuedBy || undefined,
+        status: filters.status || 'all'
+      },
+      responseType: 'blob'
+    });
+
+    const disposition: string = response.headers['content-disposition'] || '';
+    const filename = /filename="([^"]+)"/.exec(disposition)?.[1] || `registrations.${format}`;
+    const url = URL.createObjectURL(response.data);
+    const link = document.createElement('a');
+    link.href = url;
+    link.download = filename;
+    document.body.appendChild(link);
+    link.click();
+    link.remove();
+    URL.revokeObjectURL(url);
+  } catch (error: any) {
+    throw new Error(error.message || 'Failed to export registrations');
+  }
+};
+
 export const getPendingRegistrations = async (): Promise<Registrant[]> => {
-  const response = await api.get('/api/registrations/', {
-    params: { issued_only: false, pending_only: true }
-  });
-  return response.data;
+  const page = await searchRegistrations({ status: 'pending' });
+  return page.items;
 };
 
 export const issueRegistration = async (registrationId: string) => {
   await api.patch(`/api/registrations/${registrationId}/issue`);
 };
 
-const handleRegister = async (registrationData) => {
-  await registerAccount(registrationData);
-  await issueRegistration(registrationData.id); // Mark as issued after registration
-  // Refresh or redirect as needed
+export interface IssueBatchResult {
+  issued: string[];
+  already_issued: string[];
+  not_found: string[];
+}
+
+// Mark a stack of pending registrations issued in one request and one transaction
+export const issueRegistrations = async (
+  batch: { ids?: string[]; accountNumbers?: string[] }
+): Promise<IssueBatchResult> => {
+  try {
+    const response = await api.post('/api/registrations/issue-batch', {
+      ids: batch.ids || [],
+      account_numbers: batch.accountNumbers || []
+    });
+    return response.data;
+  } catch (error: any) {
+    throw new Error(error.message || 'Failed to issue registrations');
+  }
+};
+
+export interface IssuerBulkResult {
+  name: string;
+  status: 'created' | 'exists' | 'duplicate' | 'not_found' | 'invalid_branch';
+  id?: string;
+  detail?: string;
+}
+
+// Provision a branch's tellers in one request; each username gets its own result
+export const createIssuers = async (
+  issuers: IssuerCreate[]
+): Promise<{ success: number; failed: number; results: IssuerBulkResult[] }> => {
+  try {
+    const response = await api.post('/api/issuers/bulk', { issuers });
+    return response.data;
+  } catch (error: any) {
+    throw new Error(error.message || 'Failed to create issuers');
+  }
 };
 
 export default api;
\ No newline at end of file
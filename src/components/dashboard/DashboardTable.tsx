@@ -1,55 +1,47 @@
-import React from 'react';
+import React, { useState } from 'react';
 import { Download, Search } from 'lucide-react';
 import { formatDate } from '../../utils/dateUtils';
 import { Registrant } from '../../types';
 import { useAuth } from '../../context/AuthContext';
-import * as XLSX from 'xlsx';
+import { exportRegistrations, RegistrationExportFilters } from '../../api/client';
 
 interface DashboardTableProps {
+  // One page, already filtered by the server
   registrations: Registrant[];
-  currentPage: number;
-  recordsPerPage: number;
   searchTerm: string;
   onSearchChange: (term: string) => void;
-  onPageChange: (page: number) => void;
+  // Filters behind the rows, so Export downloads every match rather than this page
+  exportFilters: RegistrationExportFilters;
+  total?: number | null;
+  totalExact?: boolean;
+  offset?: number;
+  onNextPage?: () => void;
+  onPreviousPage?: () => void;
 }
 
 const DashboardTable: React.FC<DashboardTableProps> = ({
   registrations,
-  currentPage,
-  recordsPerPage,
   searchTerm,
   onSearchChange,
-  onPageChange,
+  exportFilters,
+  total = null,
+  totalExact = true,
+  offset = 0,
+  onNextPage,
+  onPreviousPage,
 }) => {
   const { user } = useAuth();
-  
-  const filteredRegistrations = registrations.filter(r => 
-    (r.accountNumber?.toLowerCase() || '').includes(searchTerm.toLowerCase()) ||
-    (r.fullName?.toLowerCase() || '').includes(searchTerm.toLowerCase())
-  );
-  
-  const totalPages = Math.ceil(filteredRegistrations.length / recordsPerPage);
-  const indexOfLastRecord = currentPage * recordsPerPage;
-  const indexOfFirstRecord = indexOfLastRecord - recordsPerPage;
-  const currentRecords = filteredRegistrations.slice(indexOfFirstRecord, indexOfLastRecord);
-
-  const handleExport = () => {
-    // Export all issued registrations, not just current page
-    const exportData = registrations.map(reg => ({
-      'Account Number': reg.accountNumber,
-      'Full Name': reg.fullName,
-      'Phone Number': reg.phoneNumber,
-      'Issue Date': formatDate(reg.registrationDate),
-      'Branch': reg.branch,
-      'Issued By': reg.issuedBy,
-      'Status': reg.isIssued ? 'Issued' : 'Pending'
-    }));
+  const [isExporting, setIsExporting] = useState(false);
 
-    const worksheet = XLSX.utils.json_to_sheet(exportData);
-    const workbook = XLSX.utils.book_new();
-    XLSX.utils.book_append_sheet(workbook, worksheet, 'Issued Statements');
-    XLSX.writeFile(workbook, 'issued_statements.xlsx');
+  const handleExport = async () => {
+    setIsExporting(true);
+    try {
+      await exportRegistrations({ ...exportFilters, format: 'xlsx' });
+    } catch (err) {
+      console.error('Error exporting registrations:', err);
+    } finally {
+      setIsExporting(false);
+    }
   };
 
   return (
@@ -73,9 +65,10 @@ const DashboardTable: React.FC<DashboardTableProps> = ({
             <button
               className="mt-2 sm:mt-0 btn-secondary text-sm py-2 flex items-center rounded-lg"
               onClick={handleExport}
+              disabled={isExporting}
             >
               <Download size={16} className="mr-1" />
-              Export Records
+              {isExporting ? 'Exporting...' : 'Export Records'}
             </button>
           </div>
         </div>
@@ -106,8 +99,8 @@ const DashboardTable: React.FC<DashboardTableProps> = ({
             </tr>
           </thead>
           <tbody className="bg-white divide-y divide-gray-200">
-            {currentRecords.length > 0 ? (
-              currentRecords.map((registrant) => (
+            {registrations.length > 0 ? (
+              registrations.map((registrant) => (
                 <tr 
                   key={registrant.id}
                   className="hover:bg-gray-50 transition-colors duration-150"
@@ -160,17 +153,40 @@ const DashboardTable: React.FC<DashboardTableProps> = ({
         </table>
       </div>
 
-      {filteredRegistrations.length > 0 && (
+      {registrations.length > 0 && (
         <div className="px-6 py-4 flex items-center justify-between border-t border-gray-200">
           <div>
             <p className="text-sm text-gray-700">
-              Showing <span className="font-medium">{indexOfFirstRecord + 1}</span> to{' '}
-              <span className="font-medium">
-                {Math.min(indexOfLastRecord, filteredRegistrations.length)}
-              </span>{' '}
-              of <span className="font-medium">{filteredRegistrations.length}</span> results
+              Showing <span className="font-medium">{offset + 1}</span> to{' '}
+              <span className="font-medium">{offset + registrations.length}</span>
+              {total !== null && (
+                <>
+                  {' '}of <span className="font-medium">
+                    {total.toLocaleString()}{totalExact ? '' : '+'}
+                  </span>
+                </>
+              )}{' '}
+              results
             </p>
           </div>
+          {(onPreviousPage || onNextPage) && (
+            <div className="flex space-x-2">
+              <button
+                className="btn-secondary text-sm py-1.5"
+                onClick={onPreviousPage}
+                disabled={!onPreviousPage}
+              >
+                Previous
+              </button>
+              <button
+                className="btn-secondary text-sm py-1.5"
+                onClick={onNextPage}
+                disabled={!onNextPage}
+              >
+                Next
+              </button>
+            </div>
+          )}
         </div>
       )}
     </div>
@@ -1,14 +1,7 @@
 import React, { useState } from 'react';
 import { Upload, Download, AlertCircle, CheckCircle, X, Loader } from 'lucide-react';
 import Papa from 'papaparse';
-import * as XLSX from 'xlsx';
-import { createBulkRegistrations } from '../../api/client';
-
-interface BulkUploadData {
-  accountNumber: string;
-  customerName: string;
-  phoneNumber: string;
-}
+import { uploadBulkRegistrations, getBulkUploadJob } from '../../api/client';
 
 const BulkRegistration: React.FC = () => {
   const [uploadStatus, setUploadStatus] = useState<{
@@ -19,109 +12,48 @@ const BulkRegistration: React.FC = () => {
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
 
-  const validateRow = (row: any): string[] => {
-    const errors: string[] = [];
-    
-    // Check if the required fields exist with the correct names
-    if (!row.accountNumber && !row['Account Number']) {
-      errors.push('Account number is required');
-    }
-    if (!row.customerName && !row['Customer Name']) {
-      errors.push('Customer name is required');
-    }
-    if (!row.phoneNumber && !row['Phone Number']) {
-      errors.push('Phone number is required');
+  const pollUploadJob = async (jobId: string) => {
+    // Progress is reported by the server while it works through the file
+    for (;;) {
+      const job = await getBulkUploadJob(jobId);
+      setUploadStatus({
+        success: job.success,
+        failed: job.failed,
+        errors: job.errors
+      });
+      if (job.status === 'completed') {
+        return;
+      }
+      if (job.status === 'failed') {
+        throw new Error(job.detail || 'Failed to process registrations');
+      }
+      await new Promise(resolve => setTimeout(resolve, 1000));
     }
-    
-    return errors;
   };
 
-  const processUploadedData = async (data: any[]) => {
+  const handleFileUpload = async (event: React.ChangeEvent<HTMLInputElement>) => {
+    const file = event.target.files?.[0];
+    if (!file) return;
+
+    const fileExtension = file.name.split('.').pop()?.toLowerCase();
+    if (!['csv', 'xlsx'].includes(fileExtension || '')) {
+      setError('Invalid file format. Please upload a CSV or Excel (.xlsx) file.');
+      return;
+    }
+
     setIsLoading(true);
     setError(null);
     setUploadStatus(null);
 
     try {
-      // Transform the data to match the expected format
-      const formattedData = data.map(row => ({
-        accountNumber: row.accountNumber || row['Account Number'] || '',
-        customerName: row.customerName || row['Customer Name'] || '',
-        phoneNumber: row.phoneNumber || row['Phone Number'] || ''
-      }));
-
-      // Validate all rows first
-      const validationErrors: string[] = [];
-      formattedData.forEach((row, index) => {
-        const rowErrors = validateRow(row);
-        if (rowErrors.length > 0) {
-          validationErrors.push(`Row ${index + 1}: ${rowErrors.join(', ')}`);
-        }
-      });
-
-      if (validationErrors.length > 0) {
-        setUploadStatus({
-          success: 0,
-          failed: formattedData.length,
-          errors: validationErrors
-        });
-        return;
-      }
-
-      // Send data to API
-      const response = await createBulkRegistrations(formattedData, 'default-branch', 'default-issuer');
-      
-      setUploadStatus({
-        success: response.success || 0,
-        failed: response.failed || 0,
-        errors: response.errors || []
-      });
+      const job = await uploadBulkRegistrations(file);
+      await pollUploadJob(job.id);
     } catch (error: any) {
       console.error('Failed to process registrations:', error);
       setError(error.message || 'Failed to process registrations');
-      setUploadStatus({
-        success: 0,
-        failed: data.length,
-        errors: [error.message || 'Failed to process registrations']
-      });
     } finally {
       setIsLoading(false);
-    }
-  };
-
-  const handleFileUpload = (event: React.ChangeEvent<HTMLInputElement>) => {
-    const file = event.target.files?.[0];
-    if (!file) return;
-
-    const fileExtension = file.name.split('.').pop()?.toLowerCase();
-
-    if (fileExtension === 'csv') {
-      Papa.parse(file, {
-        header: true,
-        skipEmptyLines: true,
-        complete: (results) => {
-          processUploadedData(results.data);
-        },
-        error: (error) => {
-          setError(`Failed to parse CSV: ${error.message}`);
-        }
-      });
-    } else if (['xlsx', 'xls'].includes(fileExtension || '')) {
-      const reader = new FileReader();
-      reader.onload = (e) => {
-        try {
-          const data = e.target?.result;
-          const workbook = XLSX.read(data, { type: 'binary' });
-          const sheetName = workbook.SheetNames[0];
-          const worksheet = workbook.Sheets[sheetName];
-          const jsonData = XLSX.utils.sheet_to_json(worksheet);
-          processUploadedData(jsonData);
-        } catch (error) {
-          setError('Failed to parse Excel file');
-        }
-      };
-      reader.readAsBinaryString(file);
-    } else {
-      setError('Invalid file format. Please upload CSV or Excel file.');
+      event.target.value = '';
     }
   };
 
@@ -203,7 +135,7 @@ const BulkRegistration: React.FC = () => {
                     name="bulk-upload"
                     type="file"
                     className="sr-only"
-                    accept=".csv,.xlsx,.xls"
+                    accept=".csv,.xlsx"
                     onChange={handleFileUpload}
                     disabled={isLoading}
                   />
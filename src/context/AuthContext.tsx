@@ -1,6 +1,6 @@
 import React, { createContext, useContext, useState, ReactNode, useEffect } from 'react';
 import { User } from '../types';
-import { login as apiLogin } from '../api/client';
+import { login as apiLogin, logout as apiLogout } from '../api/client';
 
 interface AuthContextType {
   user: User | null;
@@ -60,6 +60,10 @@ export const AuthProvider = ({ children }: { children: ReactNode }) => {
   };
 
   const logout = () => {
+    const token = localStorage.getItem('token');
+    if (token) {
+      apiLogout(token);
+    }
     localStorage.removeItem('token');
     localStorage.removeItem('user');
     setUser(null);
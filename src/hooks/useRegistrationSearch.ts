@@ -0,0 +1,78 @@
+import { useState, useEffect, useCallback } from 'react';
+import { Registrant } from '../types';
+import { RegistrationQuery, searchFilter, searchRegistrations } from '../api/client';
+
+type SearchOptions = Omit<RegistrationQuery, 'accountPrefix' | 'name' | 'after' | 'withTotal'>;
+
+// Server-side search with keyset paging: only the page on screen is transferred
+export const useRegistrationSearch = (options: SearchOptions, debounceMs = 300) => {
+  const [searchTerm, setSearchTerm] = useState('');
+  const [cursors, setCursors] = useState<Array<string | null>>([null]);
+  const [registrations, setRegistrations] = useState<Registrant[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [total, setTotal] = useState<number | null>(null);
+  const [totalExact, setTotalExact] = useState(true);
+  const [isLoading, setIsLoading] = useState(true);
+  const [error, setError] = useState<string | null>(null);
+  const [revision, setRevision] = useState(0);
+
+  const optionsKey = JSON.stringify(options);
+  const after = cursors[cursors.length - 1];
+
+  // A new search or filter starts again from the first page
+  useEffect(() => {
+    setCursors([null]);
+  }, [searchTerm, optionsKey]);
+
+  useEffect(() => {
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      setIsLoading(true);
+      setError(null);
+      try {
+        const page = await searchRegistrations({
+          ...options,
+          ...searchFilter(searchTerm),
+          after,
+          // The total only changes with the filters, not with the page
+          withTotal: after === null
+        });
+        if (cancelled) return;
+        setRegistrations(page.items);
+        setNextCursor(page.nextCursor);
+        if (after === null) {
+          setTotal(page.total);
+          setTotalExact(page.totalExact);
+        }
+      } catch (err: any) {
+        if (!cancelled) setError(err.message);
+      } finally {
+        if (!cancelled) setIsLoading(false);
+      }
+    }, after === null ? debounceMs : 0);
+
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [searchTerm, optionsKey, after, revision]);
+
+  // Fetch the current page again; calls in quick succession share one request
+  const refresh = useCallback(() => setRevision(current => current + 1), []);
+
+  const limit = options.limit || 100;
+
+  return {
+    registrations,
+    searchTerm,
+    setSearchTerm,
+    total,
+    totalExact,
+    isLoading,
+    error,
+    refresh,
+    offset: (cursors.length - 1) * limit,
+    nextPage: nextCursor ? () => setCursors([...cursors, nextCursor]) : undefined,
+    previousPage: cursors.length > 1 ? () => setCursors(cursors.slice(0, -1)) : undefined,
+  };
+};
@@ -2,27 +2,20 @@ import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { Search, CheckCircle, XCircle, X, AlertCircle, UserPlus, FileText } from 'lucide-react';
 import { useApp } from '../context/AppContext';
-import { getDashboardStats, getRegistrations } from '../api/client';
-import DashboardStats from '../components/dashboard/DashboardStats';
+import { applyStatsDelta, getDashboardStats, searchRegistrations, subscribeToRegistrationEvents } from '../api/client';
+import { DashboardStats } from '../types';
 import DashboardTable from '../components/dashboard/DashboardTable';
+import { useRegistrationSearch } from '../hooks/useRegistrationSearch';
 
 const Dashboard: React.FC = () => {
-  const { state, verifyAccount, setRegistrants } = useApp();
+  const { verifyAccount } = useApp();
   const navigate = useNavigate();
 
   // Dashboard states
-  const [stats, setStats] = useState<{
-    total_registrations: number;
-    todays_registrations: number;
-    branch_stats: Array<{ branch: string; count: number }>;
-  } | null>(null);
+  const [stats, setStats] = useState<DashboardStats | null>(null);
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
   
-  // Pagination states
-  const [currentPage, setCurrentPage] = useState(1);
-  const recordsPerPage = 10;
-  
   // Account verification states
   const [accountNumber, setAccountNumber] = useState('');
   const [verificationResult, setVerificationResult] = useState<{
@@ -32,18 +25,17 @@ const Dashboard: React.FC = () => {
   } | null>(null);
   const [showModal, setShowModal] = useState(false);
   
-  // Filter states
-  const [searchTerm, setSearchTerm] = useState('');
+  // The ten newest issued statements, searched on the server
+  const latestIssued = useRegistrationSearch({ status: 'issued', limit: 10 });
 
-  // Fetch dashboard stats and registrations only once on mount
+  // Fetch dashboard stats only once on mount
   useEffect(() => {
     const fetchData = async () => {
       setIsLoading(true);
       setError(null);
       try {
-        // Fetch all registrations for total accounts
-        const allRegistrations = await getRegistrations(false);
-        setRegistrants(allRegistrations);
+        // Totals come from the server's counters, not from downloading every row
+        setStats(await getDashboardStats());
       } catch (err: any) {
         setError("Failed to load dashboard data.");
       } finally {
@@ -53,9 +45,27 @@ const Dashboard: React.FC = () => {
     fetchData();
   }, []); // Only run once on mount
 
-  // Calculate total accounts and total issued statements
-  const totalAccounts = state.registrants.length;
-  const totalIssuedStatements = state.registrants.filter(r => r.isIssued).length;
+  // Keep the totals and the latest list current from the server's event stream
+  const refreshLatestIssued = latestIssued.refresh;
+  useEffect(() => subscribeToRegistrationEvents(event => {
+    if (event.type === 'reset') {
+      // Events were missed: start again from the server's figures
+      getDashboardStats().then(setStats).catch(() => undefined);
+      refreshLatestIssued();
+      return;
+    }
+    const delta = event.data.stats;
+    if (delta) {
+      setStats(current => current && applyStatsDelta(current, delta));
+    }
+    if (event.type !== 'registrations') {
+      // Bulk registrations are pending, so only these change the issued list
+      refreshLatestIssued();
+    }
+  }), [refreshLatestIssued]);
+
+  const totalAccounts = stats?.total_registrations ?? 0;
+  const totalIssuedStatements = stats?.issued_registrations ?? 0;
 
   const handleAccountVerification = async () => {
     if (!accountNumber.trim()) {
@@ -70,8 +80,9 @@ const Dashboard: React.FC = () => {
       const result = await verifyAccount(accountNumber);
 
       if (result.isRegistered && result.isIssued) {
-        // Try to find the registrant in state to get issuedBy and registrationDate
-        const registrant = state.registrants.find(
+        // Look the registration up to get issuedBy and registrationDate
+        const page = await searchRegistrations({ accountPrefix: result.accountNumber, limit: 10 });
+        const registrant = page.items.find(
           r => r.accountNumber === result.accountNumber
         );
         setVerificationResult({
@@ -89,6 +100,14 @@ const Dashboard: React.FC = () => {
           }
         });
         setShowModal(true);
+      } else if (!result.accountDetails) {
+        // Nothing to register with: unknown to core banking, or it isn't answering
+        setVerificationResult({
+          isEligible: false,
+          message: result.accountDetailsStatus === 'unavailable'
+            ? 'Account details are unavailable right now. Please try again shortly.'
+            : 'Account not found in the core banking system'
+        });
       } else {
         // Not issued yet: redirect to register page
         setVerificationResult({
@@ -133,12 +152,6 @@ const Dashboard: React.FC = () => {
     );
   }
   
-  // Filter and sort only issued registrations, then take the last 10
-  const issuedRegistrations = state.registrants
-    .filter(r => r.isIssued)
-    .sort((a, b) => new Date(b.registrationDate).getTime() - new Date(a.registrationDate).getTime())
-    .slice(0, 10);
-
   return (
     <div className="animate-fade-in space-y-6">
       {/* Account Verification Modal */}
@@ -253,7 +266,7 @@ const Dashboard: React.FC = () => {
             <UserPlus size={28} />
           </div>
           <div>
-            <div className="text-2xl font-bold text-gray-900">{totalAccounts}</div>
+            <div className="text-2xl font-bold text-gray-900">{totalAccounts.toLocaleString()}</div>
             <div className="text-gray-500 text-sm">Total Accounts</div>
           </div>
         </div>
@@ -262,7 +275,7 @@ const Dashboard: React.FC = () => {
             <FileText size={28} />
           </div>
           <div>
-            <div className="text-2xl font-bold text-gray-900">{totalIssuedStatements}</div>
+            <div className="text-2xl font-bold text-gray-900">{totalIssuedStatements.toLocaleString()}</div>
             <div className="text-gray-500 text-sm">Total Issued Statements</div>
           </div>
         </div>
@@ -270,12 +283,12 @@ const Dashboard: React.FC = () => {
 
       {/* Statement Records */}
       <DashboardTable
-        registrations={issuedRegistrations}
-        currentPage={1} // Always show first page since only 10 records
-        recordsPerPage={10}
-        searchTerm={searchTerm}
-        onSearchChange={setSearchTerm}
-        onPageChange={setCurrentPage}
+        registrations={latestIssued.registrations}
+        searchTerm={latestIssued.searchTerm}
+        onSearchChange={latestIssued.setSearchTerm}
+        exportFilters={{ status: 'issued' }}
+        total={latestIssued.total}
+        totalExact={latestIssued.totalExact}
       />
     </div>
   );
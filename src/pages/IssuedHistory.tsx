@@ -1,28 +1,30 @@
-import React, { useState } from 'react';
-import { useApp } from '../context/AppContext';
+import React from 'react';
 import DashboardTable from '../components/dashboard/DashboardTable';
+import { useRegistrationSearch } from '../hooks/useRegistrationSearch';
 
 const IssuedHistory: React.FC = () => {
-  const { state } = useApp();
-  const [currentPage, setCurrentPage] = useState(1);
-  const [searchTerm, setSearchTerm] = useState('');
-
-  // Filter only issued statements
-  const issuedRegistrations = state.registrants.filter(r => r.isIssued);
+  // Issued statements only, searched and paged on the server
+  const issued = useRegistrationSearch({ status: 'issued', limit: 10 });
 
   return (
     <div className="space-y-6">
       <h1 className="text-2xl font-bold mb-4">Issued Statements History</h1>
+      {issued.error && (
+        <p className="text-sm text-red-600">{issued.error}</p>
+      )}
       <DashboardTable
-        registrations={issuedRegistrations}
-        currentPage={currentPage}
-        recordsPerPage={10}
-        searchTerm={searchTerm}
-        onSearchChange={setSearchTerm}
-        onPageChange={setCurrentPage}
+        registrations={issued.registrations}
+        searchTerm={issued.searchTerm}
+        onSearchChange={issued.setSearchTerm}
+        exportFilters={{ status: 'issued' }}
+        total={issued.total}
+        totalExact={issued.totalExact}
+        offset={issued.offset}
+        onNextPage={issued.nextPage}
+        onPreviousPage={issued.previousPage}
       />
     </div>
   );
 };
 
-export default IssuedHistory;
\ No newline at end of file
+export default IssuedHistory;
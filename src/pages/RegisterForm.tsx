@@ -11,6 +11,8 @@ const RegisterForm: React.FC = () => {
   const [submitted, setSubmitted] = useState(false);
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
+  // One key per form: double-clicks and resubmits are replayed, not re-registered
+  const [idempotencyKey] = useState(() => crypto.randomUUID());
   
   // Get account details from location state
   const accountDetails = location.state?.accountDetails;
@@ -32,7 +34,7 @@ const RegisterForm: React.FC = () => {
         accountNumber,
         fullName: accountDetails.fullName,
         phoneNumber: accountDetails.phoneNumber
-      });
+      }, idempotencyKey);
       
       setSubmitted(true);
       setTimeout(() => {
@@ -1,22 +1,53 @@
-import React from 'react';
+import React, { useState, useEffect } from 'react';
 import { Download, FileTextIcon, Clock } from 'lucide-react';
-import { useApp } from '../context/AppContext';
+import { useAuth } from '../context/AuthContext';
+import { exportRegistrations, searchRegistrations } from '../api/client';
+import { Registrant } from '../types';
 import StatCard from '../components/StatCard';
 import { formatDate } from '../utils/dateUtils';
 
 const Reports: React.FC = () => {
-  const { state } = useApp();
-  const { registrants } = state;
+  const { user } = useAuth();
+  const [exportFormat, setExportFormat] = useState<'csv' | 'xlsx'>('csv');
+  const [isExporting, setIsExporting] = useState(false);
+  const [exportError, setExportError] = useState<string | null>(null);
   
-  // Filter registrants for current user (using 'Admin User' as example)
-  const currentUser = 'Admin User';
-  const userRegistrants = registrants.filter(r => r.issuedBy === currentUser);
-  
-  // Calculate metrics for user's registrations
-  const totalRegistrations = userRegistrants.length;
-  const todayRegistrations = userRegistrants.filter(r => 
-    new Date(r.registrationDate).toDateString() === new Date().toDateString()
-  ).length;
+  const [userRegistrants, setUserRegistrants] = useState<Registrant[]>([]);
+  const [totalRegistrations, setTotalRegistrations] = useState(0);
+  const [todayRegistrations, setTodayRegistrations] = useState(0);
+
+  // The server filters by issuer and counts; only the nine previews are transferred
+  useEffect(() => {
+    if (!user) return;
+    const fetchReports = async () => {
+      const today = new Date().toLocaleDateString('en-CA');
+      try {
+        const [recent, todays] = await Promise.all([
+          searchRegistrations({ issuedBy: user.username, limit: 9, withTotal: true }),
+          searchRegistrations({ issuedBy: user.username, dateFrom: today, dateTo: today, limit: 1, withTotal: true })
+        ]);
+        setUserRegistrants(recent.items);
+        setTotalRegistrations(recent.total ?? recent.items.length);
+        setTodayRegistrations(todays.total ?? todays.items.length);
+      } catch (err) {
+        console.error('Error loading reports:', err);
+      }
+    };
+    fetchReports();
+  }, [user]);
+
+  // The report covers everything the signed-in user issued, not just what is loaded here
+  const handleExport = async () => {
+    setIsExporting(true);
+    setExportError(null);
+    try {
+      await exportRegistrations({ format: exportFormat, issuedBy: user?.username });
+    } catch (err: any) {
+      setExportError(err.message);
+    } finally {
+      setIsExporting(false);
+    }
+  };
   
   return (
     <div className="animate-fade-in">
@@ -44,16 +75,33 @@ const Reports: React.FC = () => {
         <div className="p-4 sm:p-6 border-b border-gray-200">
           <div className="flex items-center justify-between">
             <h2 className="text-lg font-semibold text-gray-900">Recent Registrations</h2>
-            <button className="btn-secondary text-sm py-1.5 flex items-center">
-              <Download size={16} className="mr-1" />
-              Export
-            </button>
+            <div className="flex items-center space-x-2">
+              <select
+                className="form-input text-sm py-1.5"
+                value={exportFormat}
+                onChange={(e) => setExportFormat(e.target.value as 'csv' | 'xlsx')}
+              >
+                <option value="csv">CSV</option>
+                <option value="xlsx">Excel</option>
+              </select>
+              <button
+                className="btn-secondary text-sm py-1.5 flex items-center"
+                onClick={handleExport}
+                disabled={isExporting}
+              >
+                <Download size={16} className="mr-1" />
+                {isExporting ? 'Exporting...' : 'Export'}
+              </button>
+            </div>
           </div>
+          {exportError && (
+            <p className="mt-2 text-sm text-red-600">{exportError}</p>
+          )}
         </div>
         <div className="p-4 sm:p-6">
           {userRegistrants.length > 0 ? (
             <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-4">
-              {userRegistrants.slice(0, 9).map((registrant) => (
+              {userRegistrants.map((registrant) => (
                 <div key={registrant.id} className="bg-gray-50 rounded-lg overflow-hidden">
                   {registrant.statementUrl ? (
                     <div className="aspect-video w-full overflow-hidden">
@@ -9,6 +9,7 @@ export interface Registrant {
   issuedBy: string;
   branch: string;
   hasStatement: number; // 0 = no statement, 1 = has statement
+  isIssued?: boolean;
   statementUrl?: string; // URL to download the statement
   statementPeriod?: string; // e.g. "3 months"
   notes?: string; // Additional notes
@@ -18,10 +19,12 @@ export interface AccountVerification {
   accountNumber: string;
   isRegistered: boolean;
   registrationDate?: string;
+  // Unregistered accounts only: whether core banking could supply the details
+  accountDetailsStatus?: 'found' | 'not_found' | 'unavailable';
   accountDetails?: {
     fullName: string;
     phoneNumber: string;
-  };
+  } | null;
 }
 
 export interface User {
@@ -35,6 +38,7 @@ export interface User {
 export interface DashboardStats {
   total_registrations: number;
   todays_registrations: number;
+  issued_registrations?: number;
   branch_stats: Array<{ branch: string; count: number }>;
 }
 